@@ -0,0 +1,406 @@
+import os
+import json
+import math
+import time
+import shutil
+import logging
+import argparse
+import threading
+import pandas as pd
+from abc import ABC, abstractmethod
+from datetime import date
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+from global1_output_writer import write_csv
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing requests at most ``rate`` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next request slot."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BackfillJournal:
+    """Append-only checkpoint journal of completed chunks."""
+
+    def __init__(self, stage_dir: Path):
+        self.path = stage_dir / "journal.jsonl"
+        self._lock = threading.Lock()
+
+    def entries(self) -> List[Dict]:
+        if not self.path.exists():
+            return []
+        with open(self.path) as f:
+            # A torn last line from an interrupted write is ignored
+            entries = []
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+            return entries
+
+    def completed(self) -> Dict[str, Dict]:
+        """Completed chunk entries by chunk id."""
+        return {entry['chunk']: entry for entry in self.entries() if 'chunk' in entry}
+
+    def record(self, entry: Dict):
+        """Durably append one entry."""
+        with self._lock, open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class BackfillSource(ABC):
+    """One domain's chunk plan, fetcher and history schema."""
+
+    name: str = None
+    history_file: str = None
+    keys: List[str] = None
+
+    def __init__(self, processor, start: date, end: date,
+                 sites: Optional[List[str]] = None):
+        self.processor = processor
+        self.setup = processor.setup
+        self.stores = processor.stores
+        self.start, self.end = start, end
+        self.sites = sites
+        self.history_path = self.setup.data_dir / self.history_file
+
+    @abstractmethod
+    def chunks(self) -> List[Dict]:
+        """The fetch plan, one entry with a unique ``id`` per chunk."""
+
+    @abstractmethod
+    def fetch(self, chunk: Dict) -> pd.DataFrame:
+        """Raw rows of one chunk."""
+
+    @abstractmethod
+    def prepare(self, staged: pd.DataFrame) -> pd.DataFrame:
+        """Turn staged raw rows into rows of the history file."""
+
+    def load_history(self) -> pd.DataFrame:
+        if not self.history_path.exists():
+            return pd.DataFrame()
+        history = pd.read_csv(self.history_path, dtype={self.keys[0]: str})
+        history['date'] = pd.to_datetime(history['date'])
+        return history
+
+    def _in_range(self, df: pd.DataFrame) -> pd.DataFrame:
+        dates = pd.to_datetime(df['date'])
+        return df[(dates >= pd.Timestamp(self.start)) & (dates <= pd.Timestamp(self.end))]
+
+
+class StreamflowBackfill(BackfillSource):
+    """NWIS daily discharge, one chunk per gauge and calendar year."""
+
+    name = 'streamflow'
+    history_file = 'streamflow/historic_stream_data.csv'
+    keys = ['site', 'date']
+
+    def chunks(self) -> List[Dict]:
+        sites = self.sites or list(self.processor.sites['site'].unique())
+        chunks = []
+        for site in sites:
+            for year in range(self.start.year, self.end.year + 1):
+                chunks.append({
+                    'id': f"{site}_{year}",
+                    'site': site,
+                    'start': max(self.start, date(year, 1, 1)).isoformat(),
+                    'end': min(self.end, date(year, 12, 31)).isoformat()
+                })
+        return chunks
+
+    def fetch(self, chunk: Dict) -> pd.DataFrame:
+        data = self.processor._fetch_nwis_data(chunk['site'], chunk['start'], chunk['end'])
+        if data.empty:
+            return pd.DataFrame(columns=['site', 'date', 'flow', 'qualifiers'])
+        return pd.DataFrame({
+            'site': data['site'],
+            'date': data['datetime'].dt.normalize(),
+            'flow': data['value'],
+            'qualifiers': data['qualifiers'].astype(str) if 'qualifiers' in data else ''
+        })
+
+    def prepare(self, staged: pd.DataFrame) -> pd.DataFrame:
+        df = staged.copy()
+        df['julian'] = df['date'].dt.dayofyear
+        return df[['site', 'date', 'julian', 'flow']]
+
+
+class ReservoirBackfill(BackfillSource):
+    """USACE storage and elevation, one chunk per reservoir.
+
+    The USACE report only serves a trailing window, so each chunk asks for
+    enough weeks to reach back to the start date.
+    """
+
+    name = 'reservoirs'
+    history_file = 'reservoirs/usace_dams.csv'
+    keys = ['NIDID', 'date']
+
+    def chunks(self) -> List[Dict]:
+        sites = self.processor.sites
+        sites = sites[sites['District'].isin(self.processor.tx_districts)
+                      & sites['NIDID'].str.contains('TX')]
+        if self.sites:
+            sites = sites[sites['NIDID'].isin(self.sites)]
+        weeks = math.ceil((date.today() - self.start).days / 7)
+        return [{'id': row['NIDID'], 'loc_id': str(row['Loc_ID']), 'weeks': weeks}
+                for _, row in sites.iterrows()]
+
+    def fetch(self, chunk: Dict) -> pd.DataFrame:
+        sites = self.processor.sites
+        site = sites[sites['Loc_ID'].astype(str) == chunk['loc_id']].iloc[0]
+        return self._in_range(self.processor._fetch_site_data(site, chunk['weeks']))
+
+    def prepare(self, staged: pd.DataFrame) -> pd.DataFrame:
+        df = self.setup.add_julian_dates(staged.copy())
+        df = self.processor._attach_operating_targets(df)
+        df['percentStorage'] = (df['storage_AF'] / df['OT_AF'] * 100).round(2)
+        return df
+
+
+class GroundwaterBackfill(BackfillSource):
+    """District well depths, one chunk per well worksheet."""
+
+    name = 'groundwater'
+    history_file = 'gw/historic_gw_depth.csv'
+    keys = ['site', 'date']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sheet = None
+        self._sheet_lock = threading.Lock()
+
+    def _open_sheet(self):
+        with self._sheet_lock:
+            if self._sheet is None:
+                gc = self.setup.authorize_sheets()
+                self._sheet = gc.open_by_key("1QoaOhrpz6vrSMBc0yc5-i7nhwj2lmsBHZFYOBJc0KVU")
+            return self._sheet
+
+    def chunks(self) -> List[Dict]:
+        return [{'id': f"sheet{n}", 'sheet': n} for n in range(1, 43)]
+
+    def fetch(self, chunk: Dict) -> pd.DataFrame:
+        worksheet = self._open_sheet()[chunk['sheet'] - 1]
+        _, data = self.processor._fetch_well_sheet(worksheet)
+        data = self.processor.process_groundwater_data(data)
+        return self._in_range(data)
+
+    def prepare(self, staged: pd.DataFrame) -> pd.DataFrame:
+        return staged
+
+
+def _load_processor(domain: str):
+    """Import and build the processor whose fetchers a source reuses."""
+    if domain == 'streamflow':
+        from use1_streamflow_data import StreamflowProcessor
+        return StreamflowBackfill, StreamflowProcessor()
+    if domain == 'reservoirs':
+        from use1_reservoir_data import ReservoirDataProcessor
+        return ReservoirBackfill, ReservoirDataProcessor()
+    if domain == 'groundwater':
+        from use1_groundwater_data import GroundwaterProcessor
+        return GroundwaterBackfill, GroundwaterProcessor()
+    raise ValueError(f"No backfill source for {domain}")
+
+
+class HistoryBackfill:
+    """Chunked, resumable rebuild of one domain's history file.
+
+    The date range x site list is split into chunks that are fetched
+    concurrently under a shared rate limit. Each finished chunk is written
+    to a Parquet file in the stage directory and recorded in a checkpoint
+    journal, so an interrupted run resumes with the chunks still missing.
+    Once every chunk is staged, the rows are merged into the history file
+    in a single atomic replace.
+    """
+
+    def __init__(self, source: BackfillSource, workers: int = 4,
+                 rate: float = 2.0, retries: int = 3):
+        if retries < 1:
+            raise ValueError(f"retries must be at least 1, got {retries}")
+        self.source = source
+        self.setup = source.setup
+        self.stores = source.stores
+        self.logger = logging.getLogger(__name__)
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+
+        self.stage_dir = self.setup.data_dir / "backfill" / source.name
+        self.chunk_dir = self.stage_dir / "chunks"
+        self.plan_path = self.stage_dir / "plan.json"
+        self.journal = BackfillJournal(self.stage_dir)
+
+    def _check_plan(self, chunks: List[Dict], restart: bool):
+        """Start a new stage, or confirm a resumed one has the same plan."""
+        plan = {
+            'domain': self.source.name,
+            'start': self.source.start.isoformat(),
+            'end': self.source.end.isoformat(),
+            'chunks': [chunk['id'] for chunk in chunks]
+        }
+        if restart and self.stage_dir.exists():
+            shutil.rmtree(self.stage_dir)
+        if self.plan_path.exists():
+            if json.loads(self.plan_path.read_text()) != plan:
+                raise ValueError(
+                    f"A different backfill is staged in {self.stage_dir}; "
+                    f"rerun with --restart to discard it"
+                )
+            return
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+        self.plan_path.write_text(json.dumps(plan))
+
+    def _run_chunk(self, chunk: Dict) -> Dict:
+        """Fetch one chunk with retries and stage it."""
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.limiter.wait()
+                df = self.source.fetch(chunk)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                self.logger.warning(
+                    f"Chunk {chunk['id']} attempt {attempt} failed: {e}"
+                )
+                time.sleep(2 ** attempt)
+
+        entry = {'chunk': chunk['id'], 'rows': len(df), 'file': None}
+        if len(df):
+            path = self.chunk_dir / f"{chunk['id']}.parquet"
+            tmp_path = path.with_name(path.name + '.tmp')
+            df.reset_index(drop=True).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            entry['file'] = path.name
+        self.journal.record(entry)
+        return entry
+
+    def run(self, restart: bool = False) -> bool:
+        """Fetch every chunk not yet staged; True once all are staged."""
+        try:
+            chunks = self.source.chunks()
+            self._check_plan(chunks, restart)
+
+            done = self.journal.completed()
+            pending = [chunk for chunk in chunks if chunk['id'] not in done]
+            self.logger.info(
+                f"Backfill {self.source.name}: {len(chunks)} chunks, "
+                f"{len(done)} already staged, {len(pending)} to fetch"
+            )
+
+            failed = []
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self._run_chunk, chunk): chunk for chunk in pending}
+                for i, future in enumerate(as_completed(futures), 1):
+                    chunk = futures[future]
+                    try:
+                        entry = future.result()
+                        self.logger.info(
+                            f"Staged {chunk['id']} ({entry['rows']} rows, "
+                            f"{i}/{len(pending)})"
+                        )
+                    except Exception as e:
+                        self.logger.error(f"Chunk {chunk['id']} failed: {e}")
+                        failed.append(chunk['id'])
+
+            if failed:
+                self.logger.warning(
+                    f"{len(failed)} chunks failed; rerun to resume them"
+                )
+            return not failed
+
+        except Exception as e:
+            self.logger.error(f"Error running {self.source.name} backfill: {e}")
+            raise
+
+    def merge(self):
+        """Merge staged rows into the history file and clear the stage."""
+        try:
+            files = [entry['file'] for entry in self.journal.completed().values()
+                     if entry['file']]
+            if not files:
+                self.logger.info("Nothing staged to merge")
+                return
+
+            staged = pd.concat(
+                [pd.read_parquet(self.chunk_dir / name) for name in files],
+                ignore_index=True
+            )
+            new_rows = self.source.prepare(staged)
+            keys = self.source.keys
+            new_rows[keys[0]] = new_rows[keys[0]].astype(str)
+
+            # Backfilled rows replace history rows with the same key
+            history = self.source.load_history()
+            merged = pd.concat([history, new_rows], ignore_index=True)
+            if not history.empty:
+                merged = merged.reindex(columns=history.columns)
+            merged = (merged.drop_duplicates(subset=keys, keep='last')
+                      .sort_values(keys)
+                      .reset_index(drop=True))
+
+            write_csv(merged, self.source.history_path)
+            warehouse = self.stores.warehouse
+            if warehouse is not None:
+                warehouse.upsert(f"{self.source.name}_observations", merged, keys)
+
+            self.logger.info(
+                f"Merged {len(new_rows)} backfilled rows into "
+                f"{self.source.history_path} ({len(merged)} rows)"
+            )
+            shutil.rmtree(self.stage_dir)
+
+        except Exception as e:
+            self.logger.error(f"Error merging {self.source.name} backfill: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Chunked, resumable rebuild of a domain's history file."
+    )
+    parser.add_argument('domain', choices=['streamflow', 'reservoirs', 'groundwater'])
+    parser.add_argument('--start', default=None,
+                        help="first date (default: GlobalSetup.start_date)")
+    parser.add_argument('--end', default=None, help="last date (default: today)")
+    parser.add_argument('--sites', nargs='*', default=None,
+                        help="limit to these sites or NIDIDs")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=2.0,
+                        help="maximum requests per second")
+    parser.add_argument('--restart', action='store_true',
+                        help="discard any staged chunks and start over")
+    parser.add_argument('--no-merge', action='store_true',
+                        help="stage chunks only")
+    args = parser.parse_args()
+
+    source_cls, processor = _load_processor(args.domain)
+    start = date.fromisoformat(args.start or processor.setup.start_date)
+    end = date.fromisoformat(args.end) if args.end else processor.setup.today
+    backfill = HistoryBackfill(
+        source_cls(processor, start, end, args.sites),
+        workers=args.workers,
+        rate=args.rate
+    )
+
+    if backfill.run(restart=args.restart) and not args.no_merge:
+        backfill.merge()
@@ -1,174 +1,235 @@
-import os
-import sys
-import pandas as pd
-import numpy as np
-import datetime
-from datetime import date
-import geopandas as gpd
-from pathlib import Path
-import json
-import requests
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-import logging
-from typing import List, Union
-import warnings
-
-class GlobalSetup:
-    """Initialize global settings and utilities for Boerne Water Dashboard."""
-    
-    def __init__(self):
-        # Configure logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        self.logger = logging.getLogger(__name__)
-        
-        # Disable scientific notation
-        pd.set_option('display.float_format', lambda x: '%.5f' % x)
-        
-        # Set working directory and paths
-        self.setup_paths()
-        
-        # State information
-        self.state_abb = "TX"
-        self.state_fips = 48
-        
-        # Date settings
-        self.setup_dates()
-        
-        # Create update date file
-        self.create_update_date()
-        
-        # Create julian calendar reference
-        self.julian_ref = self.create_julian_reference()
-        # In global0_set_apis_libraries.py
-        print(f"Julian calendar file location: {self.data_dir / 'julian-daymonth.csv'}")
-        print("Does file exist?", (self.data_dir / 'julian-daymonth.csv').exists())
-        
-        # Required packages - equivalent to R libraries
-        self.required_packages = [
-            "pandas", "geopandas", "requests", "numpy", "google-auth",
-            "google-auth-oauthlib", "google-api-python-client",
-            "shapely", "pyproj", "rasterio", "folium", "beautifulsoup4",
-            "noaa-sdk", "hydrodata"  # Python equivalents for R packages
-        ]
-        
-        # Install required packages
-        self.install_required_packages()
-
-    def setup_paths(self):
-        """Set up working directory and data paths."""
-        try:
-            self.source_path = os.getcwd()
-            self.data_dir = Path("boerne-water-supply/data/")
-            self.data_dir.mkdir(parents=True, exist_ok=True)
-            self.logger.info(f"Working directory: {self.source_path}")
-            self.logger.info(f"Data directory: {self.data_dir}")
-        except Exception as e:
-            self.logger.error(f"Error setting up paths: {e}")
-            raise
-
-    def setup_dates(self):
-        """Initialize date-related variables."""
-        self.today = date.today()
-        self.current_year = self.today.year
-        self.start_date = "1990-01-01"
-        self.end_date = f"{self.current_year}-12-31"
-        self.months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", 
-                      "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-
-    def create_update_date(self):
-        """Create update date CSV file."""
-        try:
-            update_date = pd.DataFrame({
-                "today_date": [f"{self.months[self.today.month - 1]} "
-                             f"{self.today.day}, {self.today.year}"]
-            })
-            update_date.to_csv(self.data_dir / "update_date.csv", index=False)
-            self.logger.info("Update date file created successfully")
-        except Exception as e:
-            self.logger.error(f"Error creating update date file: {e}")
-            raise
-
-    @staticmethod
-    def moving_average(data: Union[List, np.ndarray], window: int = 7) -> np.ndarray:
-        """Calculate moving average with specified window size."""
-        return pd.Series(data).rolling(window=window, min_periods=1).mean().to_numpy()
-
-    @staticmethod
-    def notin(x: list, y: list) -> list:
-        """Python equivalent of R's %notin% function."""
-        return [item for item in x if item not in y]
-    
-    
-
-    def create_julian_reference(self) -> pd.DataFrame:
-        """Create standardized julian date reference."""
-        try:
-            # Create date range for non-leap year
-            jan1 = datetime.date(2021, 1, 1)
-            dec31 = datetime.date(2021, 12, 31)
-            all_dates = pd.date_range(jan1, dec31)
-            
-            # Create initial DataFrame for non-leap year
-            julian_df = pd.DataFrame({
-                'day_month': all_dates.strftime('%m-%d'),
-                'julian_index': range(1, len(all_dates) + 1)
-            })
-            
-            # Create leap year data
-            leap_dates = pd.date_range(
-                datetime.date(2020, 1, 1),  # 2020 was a leap year
-                datetime.date(2020, 12, 31)
-            )
-            leap_day_month = leap_dates.strftime('%m-%d')
-            
-            # Add leap year columns
-            julian_df['day_month_leap'] = julian_df['day_month'].copy()
-            julian_df['julian_index_leap'] = julian_df['julian_index'].copy()
-            
-            # Insert Feb 29 for leap year
-            feb29_entry = pd.DataFrame({
-                'day_month': ['02-29'],
-                'julian_index': [np.nan],
-                'day_month_leap': ['02-29'],
-                'julian_index_leap': [60]
-            })
-            
-            # Concatenate properly
-            julian_df = pd.concat([
-                julian_df.iloc[:59],
-                feb29_entry,
-                julian_df.iloc[59:]
-            ]).reset_index(drop=True)
-            
-            # Adjust julian_index_leap after Feb 29
-            julian_df.loc[60:, 'julian_index_leap'] = range(61, 367)
-
-            
-            self.logger.info("Julian reference created successfully")
-
-            return julian_df
-
-        
-            
-        except Exception as e:
-            self.logger.error(f"Error creating julian reference: {e}")
-            raise
-
-    def install_required_packages(self):
-        """Check and install required packages."""
-        for package in self.required_packages:
-            try:
-                __import__(package.replace("-", "_"))
-                self.logger.info(f"Package {package} is already installed")
-            except ImportError:
-                self.logger.warning(f"Installing {package}...")
-                os.system(f"{sys.executable} -m pip install {package}")
-
-if __name__ == "__main__":
-    setup = GlobalSetup()
-    print("Global setup completed successfully")
+import os
+import sys
+import pandas as pd
+import numpy as np
+import datetime
+from datetime import date
+import geopandas as gpd
+from pathlib import Path
+import json
+import requests
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+import logging
+from typing import List, Union
+import warnings
+
+# API roots the Google Sheets client calls, rewritten for a local stand-in
+GOOGLE_API_ROOTS = ['https://sheets.googleapis.com/', 'https://www.googleapis.com/']
+
+class GlobalSetup:
+    """Initialize global settings and utilities for Boerne Water Dashboard."""
+    
+    def __init__(self):
+        # Configure logging
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        self.logger = logging.getLogger(__name__)
+        
+        # Disable scientific notation
+        pd.set_option('display.float_format', lambda x: '%.5f' % x)
+        
+        # Set working directory and paths
+        self.setup_paths()
+        
+        # State information
+        self.state_abb = "TX"
+        self.state_fips = 48
+        
+        # Date settings
+        self.setup_dates()
+        
+        # Worker processes for site-sharded statistics (1 runs in-process)
+        self.stat_workers = int(os.environ.get('BOERNE_STAT_WORKERS', '1'))
+        
+        # Threads writing independent output files
+        self.output_workers = int(os.environ.get('BOERNE_OUTPUT_WORKERS', '4'))
+        
+        # Memory ceiling for streaming rebuilds of the full history
+        self.rebuild_memory_mb = float(os.environ.get('BOERNE_REBUILD_MEMORY_MB', '512'))
+        
+        # External services; point these at serve1_fake_services for
+        # offline runs and benchmarks
+        self.nwis_url = os.environ.get(
+            'BOERNE_NWIS_URL', 'https://waterservices.usgs.gov/nwis/')
+        self.usace_url = os.environ.get(
+            'BOERNE_USACE_URL', 'https://water.usace.army.mil/a2w/')
+        self.sheets_url = os.environ.get('BOERNE_SHEETS_URL')
+        
+        # Create update date file
+        self.create_update_date()
+        
+        # Create julian calendar reference
+        self.julian_ref = self.create_julian_reference()
+        # In global0_set_apis_libraries.py
+        print(f"Julian calendar file location: {self.data_dir / 'julian-daymonth.csv'}")
+        print("Does file exist?", (self.data_dir / 'julian-daymonth.csv').exists())
+        
+        # Required packages - equivalent to R libraries
+        self.required_packages = [
+            "pandas", "geopandas", "requests", "numpy", "google-auth",
+            "google-auth-oauthlib", "google-api-python-client",
+            "shapely", "pyproj", "rasterio", "folium", "beautifulsoup4",
+            "noaa-sdk", "hydrodata"  # Python equivalents for R packages
+        ]
+        
+        # Install required packages
+        self.install_required_packages()
+
+    def setup_paths(self):
+        """Set up working directory and data paths."""
+        try:
+            self.source_path = os.getcwd()
+            self.data_dir = Path("boerne-water-supply/data/")
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            self.logger.info(f"Working directory: {self.source_path}")
+            self.logger.info(f"Data directory: {self.data_dir}")
+        except Exception as e:
+            self.logger.error(f"Error setting up paths: {e}")
+            raise
+
+    def setup_dates(self):
+        """Initialize date-related variables."""
+        self.today = date.today()
+        self.current_year = self.today.year
+        self.start_date = "1990-01-01"
+        self.end_date = f"{self.current_year}-12-31"
+        self.months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", 
+                      "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+    def create_update_date(self):
+        """Create update date CSV file."""
+        try:
+            update_date = pd.DataFrame({
+                "today_date": [f"{self.months[self.today.month - 1]} "
+                             f"{self.today.day}, {self.today.year}"]
+            })
+            update_date.to_csv(self.data_dir / "update_date.csv", index=False)
+            self.logger.info("Update date file created successfully")
+        except Exception as e:
+            self.logger.error(f"Error creating update date file: {e}")
+            raise
+
+    @staticmethod
+    def moving_average(data: Union[List, np.ndarray], window: int = 7) -> np.ndarray:
+        """Calculate moving average with specified window size."""
+        return pd.Series(data).rolling(window=window, min_periods=1).mean().to_numpy()
+
+    @staticmethod
+    def parse_dates(dates: pd.Series) -> pd.Series:
+        """Parse dates, including day counts since 1970 written out by R."""
+        day_counts = pd.to_numeric(dates, errors='coerce')
+        parsed = pd.to_datetime(dates.where(day_counts.isna()), errors='coerce')
+        return parsed.fillna(pd.to_datetime(day_counts, unit='D', errors='coerce'))
+
+    @staticmethod
+    def add_julian_dates(df: pd.DataFrame) -> pd.DataFrame:
+        """Add year, day_month and julian columns from the date column."""
+        df['date'] = pd.to_datetime(df['date'])
+        df['year'] = df['date'].dt.year
+        df['day_month'] = df['date'].dt.strftime('%m-%d')
+
+        # The julian reference indexes leap years through Feb 29, which is
+        # the day of the year
+        df['julian'] = df['date'].dt.dayofyear
+        return df
+
+    @staticmethod
+    def notin(x: list, y: list) -> list:
+        """Python equivalent of R's %notin% function."""
+        return [item for item in x if item not in y]
+    
+    
+
+    def create_julian_reference(self) -> pd.DataFrame:
+        """Create standardized julian date reference."""
+        try:
+            # Create date range for non-leap year
+            jan1 = datetime.date(2021, 1, 1)
+            dec31 = datetime.date(2021, 12, 31)
+            all_dates = pd.date_range(jan1, dec31)
+            
+            # Create initial DataFrame for non-leap year
+            julian_df = pd.DataFrame({
+                'day_month': all_dates.strftime('%m-%d'),
+                'julian_index': range(1, len(all_dates) + 1)
+            })
+            
+            # Create leap year data
+            leap_dates = pd.date_range(
+                datetime.date(2020, 1, 1),  # 2020 was a leap year
+                datetime.date(2020, 12, 31)
+            )
+            leap_day_month = leap_dates.strftime('%m-%d')
+            
+            # Add leap year columns
+            julian_df['day_month_leap'] = julian_df['day_month'].copy()
+            julian_df['julian_index_leap'] = julian_df['julian_index'].copy()
+            
+            # Insert Feb 29 for leap year
+            feb29_entry = pd.DataFrame({
+                'day_month': ['02-29'],
+                'julian_index': [np.nan],
+                'day_month_leap': ['02-29'],
+                'julian_index_leap': [60]
+            })
+            
+            # Concatenate properly
+            julian_df = pd.concat([
+                julian_df.iloc[:59],
+                feb29_entry,
+                julian_df.iloc[59:]
+            ]).reset_index(drop=True)
+            
+            # Adjust julian_index_leap after Feb 29
+            julian_df.loc[60:, 'julian_index_leap'] = range(61, 367)
+
+            
+            self.logger.info("Julian reference created successfully")
+
+            return julian_df
+
+        
+            
+        except Exception as e:
+            self.logger.error(f"Error creating julian reference: {e}")
+            raise
+
+    def authorize_sheets(self):
+        """Google Sheets client, using the local stand-in when BOERNE_SHEETS_URL is set."""
+        import pygsheets
+        if not self.sheets_url:
+            return pygsheets.authorize(service_account_env_var='GSHEET_SERVICE_ACCOUNT')
+        
+        import httplib2
+        from google.auth.credentials import AnonymousCredentials
+        
+        base_url = self.sheets_url.rstrip('/') + '/'
+        
+        class RoutedHttp(httplib2.Http):
+            def request(self, uri, *args, **kwargs):
+                for root in GOOGLE_API_ROOTS:
+                    if uri.startswith(root):
+                        uri = base_url + uri[len(root):]
+                return super().request(uri, *args, **kwargs)
+        
+        return pygsheets.authorize(
+            custom_credentials=AnonymousCredentials(), http=RoutedHttp()
+        )
+
+    def install_required_packages(self):
+        """Check and install required packages."""
+        for package in self.required_packages:
+            try:
+                __import__(package.replace("-", "_"))
+                self.logger.info(f"Package {package} is already installed")
+            except ImportError:
+                self.logger.warning(f"Installing {package}...")
+                os.system(f"{sys.executable} -m pip install {package}")
+
+if __name__ == "__main__":
+    setup = GlobalSetup()
+    print("Global setup completed successfully")
@@ -0,0 +1,242 @@
+import os
+import json
+import math
+import logging
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+from global0_set_apis_libraries import GlobalSetup
+
+# Site layers carrying each domain's current status: candidate files (the
+# first present is used), site column and the properties kept per site,
+# plus any per-site CSV whose columns fill in further fields; names and
+# geometry stay in the map layers
+STATUS_LAYERS = {
+    'streamflow': {
+        'paths': ['streamflow/all_stream_gauge_sites.geojson'],
+        'site': 'site',
+        'fields': ['status', 'flow', 'date', 'ws_watershed']
+    },
+    'groundwater': {
+        'paths': ['gw/all_gw_sites.geojson'],
+        'site': 'site',
+        'fields': ['status', 'depth_ft', 'date']
+    },
+    'reservoirs': {
+        'paths': ['reservoirs/all_reservoir_sites.geojson',
+                  'reservoirs/all_canyon_lake_site.geojson'],
+        'site': 'NIDID',
+        'fields': ['status', 'percent_storage', 'date']
+    },
+    'precipitation': {
+        'paths': ['pcp/all_pcp_sites.geojson'],
+        'site': 'id',
+        'fields': ['status', 'pcp_in', 'spi_1', 'date'],
+        'join': 'pcp/current_pcp_spi.csv'
+    }
+}
+
+# Heavier files each tab loads after first paint
+TAB_FILES = {
+    'demand': ['demand/all_total_demand.csv', 'demand/all_demand_cum.csv'],
+    'reclaimed': ['demand/all_reclaimed_water.csv',
+                  'demand/all_reclaimed_percent_of_total.csv'],
+    'population': ['demand/all_pop.csv'],
+    'streamflow': ['streamflow/all_stream_stats.csv', 'streamflow/all_stream_data.csv'],
+    'groundwater': ['gw/all_gw_stats.csv', 'gw/all_gw_status.csv',
+                    'gw/all_gw_annual.csv', 'gw/all_monthly_avg.csv'],
+    'reservoirs': ['reservoirs/all_reservoir_data.csv', 'reservoirs/all_reservoir_stats.csv'],
+    'precipitation': ['pcp/all_pcp_months_total.csv', 'pcp/all_pcp_cum_total.csv',
+                      'pcp/all_pcp_spi.csv', 'pcp/current_pcp_spi.csv'],
+    'drought': ['drought/all_percentAreaHUC.csv'],
+    'quality': ['quality/all_water_quality.csv'],
+    'utility': ['water_shortage_responses.csv']
+}
+
+BUNDLE_FILE = 'bootstrap.json'
+
+
+def _clean(value):
+    """JSON-safe scalar: NaN as null, numpy numbers as Python numbers."""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class BootstrapBundle:
+    """One small JSON document holding everything the dashboard paints first.
+
+    The bundle carries the last update date, the utility list, each
+    domain's current status per site, a few headline numbers per tab and
+    a manifest of the heavier files the tabs load later, with their size
+    and modification time so the page can fetch them lazily and bust
+    caches. Everything is read from published processor outputs; a
+    missing output only leaves its section out.
+    """
+
+    def __init__(self, data_dir: Union[str, Path]):
+        self.logger = logging.getLogger(__name__)
+        self.data_dir = Path(data_dir)
+        self.path = self.data_dir / BUNDLE_FILE
+
+    def _read_csv(self, filename: str, **kwargs) -> Optional[pd.DataFrame]:
+        path = self.data_dir / filename
+        if not path.exists():
+            return None
+        # Hand-edited files carry a byte order mark
+        return pd.read_csv(path, encoding='utf-8-sig', **kwargs)
+
+    @staticmethod
+    def _latest(df: pd.DataFrame, date_col: str, columns: List[str],
+                by: Optional[str] = None) -> Dict:
+        """Latest row (per ``by`` when given) restricted to ``columns``."""
+        # Older quality rows hold R day counts rather than ISO dates
+        df = df.assign(_date=GlobalSetup.parse_dates(df[date_col]))
+        df = df.dropna(subset=['_date']).sort_values('_date')
+        columns = [col for col in columns if col in df.columns]
+        if by is None:
+            return {col: _clean(df[col].iloc[-1]) for col in columns} if len(df) else {}
+        latest = df.groupby(by).tail(1)
+        return {
+            str(key): {col: _clean(row[col]) for col in columns}
+            for key, row in latest.set_index(by).iterrows()
+        }
+
+    def site_status(self) -> Dict[str, Dict]:
+        """Current status of every site, per domain, as field names and rows."""
+        status = {}
+        for domain, layer in STATUS_LAYERS.items():
+            path = next((self.data_dir / p for p in layer['paths']
+                         if (self.data_dir / p).exists()), None)
+            if path is None:
+                continue
+            with open(path) as f:
+                properties = [feature['properties'] for feature in json.load(f)['features']]
+            joined = self._read_csv(layer['join'], dtype={layer['site']: str}) \
+                if 'join' in layer else None
+            # Fields the layer's own pipeline doesn't write come per site from a CSV
+            if joined is not None:
+                by_site = joined.set_index(layer['site']).to_dict('index')
+                properties = [dict(props, **by_site.get(str(props[layer['site']]), {}))
+                              for props in properties]
+            fields = ['site'] + layer['fields']
+            status[domain] = {
+                'fields': fields,
+                'rows': [[str(props[layer['site']])]
+                         + [_clean(props.get(field)) for field in layer['fields']]
+                         for props in properties]
+            }
+        return status
+
+    def headlines(self, status: Dict[str, Dict]) -> Dict[str, Dict]:
+        """A few numbers per tab for the first view."""
+        headlines = {}
+
+        demand = self._read_csv('demand/all_total_demand.csv', dtype={'pwsid': str})
+        if demand is not None:
+            headlines['demand'] = self._latest(
+                demand, 'date2', ['date2', 'demand_mgd', 'mean_demand', 'peak_demand'],
+                by='pwsid'
+            )
+        reclaimed = self._read_csv('demand/all_reclaimed_percent_of_total.csv',
+                                   dtype={'pwsid': str})
+        if reclaimed is not None:
+            headlines['reclaimed'] = self._latest(
+                reclaimed, 'date2', ['date2', 'reclaimed', 'mean_reclaimed', 'percent_of_total'],
+                by='pwsid'
+            )
+        pop = self._read_csv('demand/all_pop.csv')
+        if pop is not None:
+            headlines['population'] = self._latest(pop, 'date', ['year', 'clb_pop', 'wsb_pop'])
+
+        reservoir = self._read_csv('reservoirs/all_reservoir_data.csv')
+        if reservoir is not None:
+            headlines['reservoirs'] = self._latest(
+                reservoir, 'date', ['name', 'date', 'elev_Ft', 'storage_AF', 'percentStorage']
+            )
+        quality = self._read_csv('quality/all_water_quality.csv', usecols=['site_id', 'date'])
+        if quality is not None:
+            quality['date'] = GlobalSetup.parse_dates(quality['date']).dt.strftime('%Y-%m-%d')
+            headlines['quality'] = {'sites': int(quality['site_id'].nunique()),
+                                    **self._latest(quality, 'date', ['date'])}
+
+        # Site counts by status for the domains with a status layer
+        for domain, table in status.items():
+            column = table['fields'].index('status')
+            counts = pd.Series(
+                [row[column] or 'unknown' for row in table['rows']], dtype=object
+            ).value_counts()
+            headlines.setdefault(domain, {}).update({
+                'sites': len(table['rows']),
+                'status_counts': {key: int(value) for key, value in counts.items()}
+            })
+        return headlines
+
+    def file_manifest(self) -> Dict[str, Dict]:
+        """Size and modification time of each tab's heavier files."""
+        manifest = {}
+        for tab, filenames in TAB_FILES.items():
+            files = {}
+            for filename in filenames:
+                path = self.data_dir / filename
+                if path.exists():
+                    stat = path.stat()
+                    files[filename] = {
+                        'bytes': stat.st_size,
+                        'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(
+                            timespec='seconds')
+                    }
+            if files:
+                manifest[tab] = files
+        return manifest
+
+    def build(self) -> Dict:
+        """Assemble the bundle from the current outputs."""
+        try:
+            bundle = {'generated': datetime.now().isoformat(timespec='seconds')}
+
+            update_date = self._read_csv('update_date.csv')
+            if update_date is not None:
+                bundle['today_date'] = update_date['today_date'].iloc[0]
+
+            utilities = self._read_csv('basic_info.csv', dtype=str)
+            if utilities is not None:
+                bundle['utilities'] = json.loads(utilities.to_json(orient='records'))
+            watersheds = self._read_csv('link_pwsid_watershed.csv', dtype=str)
+            if watersheds is not None:
+                bundle['watersheds'] = json.loads(watersheds.to_json(orient='records'))
+
+            status = self.site_status()
+            bundle['status'] = status
+            bundle['headlines'] = self.headlines(status)
+            bundle['files'] = self.file_manifest()
+
+            # Version clients compare against deltas/manifest.json
+            deltas = self.data_dir / "deltas" / "manifest.json"
+            if deltas.exists():
+                bundle['delta_version'] = json.loads(deltas.read_text()).get('version')
+            return bundle
+
+        except Exception as e:
+            self.logger.error(f"Error building bootstrap bundle: {e}")
+            raise
+
+    def write(self) -> int:
+        """Write the bundle atomically; returns its size in bytes."""
+        body = json.dumps(self.build(), separators=(',', ':'))
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        tmp_path.write_text(body)
+        os.replace(tmp_path, self.path)
+        self.logger.info(f"Wrote {self.path} ({len(body)} bytes)")
+        return len(body)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    BootstrapBundle(Path("boerne-water-supply/data/")).write()
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+# Statistic layout shared by the streamflow, groundwater and reservoir stats files
+STAT_COLUMNS = ['Nobs', 'min', 'flow10', 'flow25', 'flow50', 'flow75', 'flow90', 'max']
+N_JULIAN = 366
+
+
+class ClimatologyTable:
+    """Memory-mapped (site x julian x statistic) percentile lookup table.
+
+    The table is stored as a fixed-layout float64 ``.npy`` array of shape
+    ``(n_sites, 366, 8)`` with a JSON sidecar holding the site index. Julian
+    day ``j`` (1-366) lives in slot ``j - 1``; days without statistics are NaN.
+    Any process can open the table read-only and look up a (site, julian)
+    envelope without loading or joining the stats CSVs.
+
+    Each build writes its array under a new versioned name beside ``path``
+    (``<stem>.<version>.npy``) and the sidecar names the array it indexes,
+    so replacing the sidecar is the single commit point: readers see the
+    old index and array or the new ones, never a mix.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Open an existing table read-only as a memory map."""
+        self.path = Path(path)
+        self.index_path = self.index_path_for(self.path)
+
+        meta = json.loads(self.index_path.read_text())
+        self.sites = meta['sites']
+        self.fingerprint = meta['fingerprint']
+        self.site_index = {site: i for i, site in enumerate(self.sites)}
+
+        self.values = np.load(self.array_path_for(self.path, meta), mmap_mode='r')
+
+    @staticmethod
+    def index_path_for(path: Union[str, Path]) -> Path:
+        """Return the JSON sidecar path for a table path."""
+        return Path(path).with_suffix('.json')
+
+    @staticmethod
+    def array_path_for(path: Union[str, Path], meta: dict) -> Path:
+        """Return the array an index points to; older indexes use ``path``."""
+        path = Path(path)
+        return path.with_name(meta['array']) if 'array' in meta else path
+
+    @staticmethod
+    def fingerprint_stats(stats: pd.DataFrame, site_col: str = 'site') -> str:
+        """Content hash of the columns that make up the table."""
+        hashed = pd.util.hash_pandas_object(
+            stats[[site_col, 'julian'] + STAT_COLUMNS].astype(str),
+            index=False
+        )
+        return hashlib.sha1(hashed.values.tobytes()).hexdigest()
+
+    @staticmethod
+    def fingerprint_file(path: Union[str, Path]) -> str:
+        """Cheap change marker for a stats file on disk."""
+        stat = Path(path).stat()
+        return f"file:{stat.st_size}:{stat.st_mtime_ns}"
+
+    @classmethod
+    def build(
+        cls,
+        stats: pd.DataFrame,
+        path: Union[str, Path],
+        site_col: str = 'site',
+        fingerprint: Optional[str] = None
+    ) -> 'ClimatologyTable':
+        """Write a table from a long-format stats DataFrame and open it."""
+        path = Path(path)
+        if fingerprint is None:
+            fingerprint = cls.fingerprint_stats(stats, site_col)
+
+        sites = sorted(stats[site_col].astype(str).unique())
+        site_codes = pd.Categorical(
+            stats[site_col].astype(str), categories=sites
+        ).codes
+        julian = pd.to_numeric(stats['julian'], errors='coerce').to_numpy()
+
+        # Only julian days 1-366 have a slot in the table
+        valid = (julian >= 1) & (julian <= N_JULIAN)
+
+        # A new array name per build; the array is complete before any
+        # index points to it
+        version = hashlib.sha1(f"{fingerprint}:{time.time_ns()}".encode()).hexdigest()[:12]
+        array_path = path.with_name(f"{path.stem}.{version}{path.suffix}")
+        tmp_path = array_path.with_name(array_path.name + '.tmp')
+        table = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=np.float64,
+            shape=(len(sites), N_JULIAN, len(STAT_COLUMNS))
+        )
+        table[:] = np.nan
+        table[site_codes[valid], julian[valid].astype(int) - 1, :] = (
+            stats.loc[valid, STAT_COLUMNS]
+            .apply(pd.to_numeric, errors='coerce')
+            .to_numpy(dtype=np.float64)
+        )
+        table.flush()
+        del table
+        os.replace(tmp_path, array_path)
+
+        # Swapping the index in commits the build
+        index_path = cls.index_path_for(path)
+        previous = (cls.array_path_for(path, json.loads(index_path.read_text())).name
+                    if index_path.exists() else None)
+        tmp_index = index_path.with_name(index_path.name + '.tmp')
+        tmp_index.write_text(json.dumps({
+            'sites': sites,
+            'stat_columns': STAT_COLUMNS,
+            'n_julian': N_JULIAN,
+            'site_col': site_col,
+            'fingerprint': fingerprint,
+            'array': array_path.name
+        }))
+        os.replace(tmp_index, index_path)
+
+        # Keep the previous array for readers that opened the old index
+        # but not yet its array; older ones are unreachable
+        keep = {array_path.name, previous}
+        for stale in [path, *path.parent.glob(f"{path.stem}.*{path.suffix}")]:
+            if stale.name not in keep and stale.exists():
+                stale.unlink()
+
+        return cls(path)
+
+    @classmethod
+    def stored_fingerprint(cls, path: Union[str, Path]) -> Optional[str]:
+        """Fingerprint recorded for an existing table, if any."""
+        index_path = cls.index_path_for(path)
+        if not index_path.exists():
+            return None
+        meta = json.loads(index_path.read_text())
+        if not cls.array_path_for(path, meta).exists():
+            return None
+        return meta.get('fingerprint')
+
+    @classmethod
+    def ensure(
+        cls,
+        stats: pd.DataFrame,
+        path: Union[str, Path],
+        site_col: str = 'site'
+    ) -> 'ClimatologyTable':
+        """Open the table, rebuilding it first if ``stats`` has changed."""
+        fingerprint = cls.fingerprint_stats(stats, site_col)
+        if cls.stored_fingerprint(path) == fingerprint:
+            return cls(path)
+        return cls.build(stats, path, site_col, fingerprint)
+
+    @classmethod
+    def ensure_from_csv(
+        cls,
+        stats_path: Union[str, Path],
+        path: Union[str, Path],
+        site_col: str = 'site'
+    ) -> 'ClimatologyTable':
+        """Open the table, rebuilding it first if the stats CSV has changed."""
+        fingerprint = cls.fingerprint_file(stats_path)
+        if cls.stored_fingerprint(path) == fingerprint:
+            return cls(path)
+
+        stats = pd.read_csv(stats_path, dtype={site_col: str})
+        logging.getLogger(__name__).info(
+            f"Rebuilding climatology table {path} from {stats_path}"
+        )
+        return cls.build(stats, path, site_col, fingerprint)
+
+    def envelope(self, site: str, julian: int) -> Optional[pd.Series]:
+        """Return the statistics for one (site, julian) pair."""
+        i = self.site_index.get(str(site))
+        if i is None or not 1 <= int(julian) <= N_JULIAN:
+            return None
+        return pd.Series(
+            np.array(self.values[i, int(julian) - 1]), index=STAT_COLUMNS
+        )
+
+    def lookup(self, sites: Iterable, julians: Iterable) -> pd.DataFrame:
+        """Vectorized envelope lookup, NaN where a pair has no statistics."""
+        sites = pd.Series(list(sites), dtype=object).astype(str)
+        julian = pd.to_numeric(pd.Series(list(julians)), errors='coerce').to_numpy()
+        site_idx = sites.map(self.site_index).to_numpy(dtype=np.float64)
+
+        valid = (~np.isnan(site_idx) & (julian >= 1) & (julian <= N_JULIAN))
+        out = np.full((len(sites), len(STAT_COLUMNS)), np.nan)
+        out[valid] = self.values[
+            site_idx[valid].astype(int), julian[valid].astype(int) - 1
+        ]
+        return pd.DataFrame(out, columns=STAT_COLUMNS)
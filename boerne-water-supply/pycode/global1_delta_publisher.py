@@ -0,0 +1,176 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+# Append-mostly published files that get delta chains: file -> key columns
+DELTA_FILES = {
+    'streamflow/all_stream_data.csv': ['site', 'date'],
+    'pcp/all_pcp_data.csv': ['id', 'date'],
+    'demand/all_demand_by_source.csv': ['pwsid', 'date'],
+    'gw/all_gw_depth.csv': ['site', 'date'],
+    'reservoirs/all_reservoir_data.csv': ['NIDID', 'date'],
+    'quality/all_water_quality.csv': ['site_id', 'date']
+}
+
+
+class DeltaPublisher:
+    """Publish per-run delta files next to the full published CSVs.
+
+    After a run, each file in ``DELTA_FILES`` is compared with the row
+    hashes kept from its previous publish. Rows added or changed since then
+    are written, byte for byte, to ``deltas/<file>/<version>.csv`` and
+    listed in ``deltas/manifest.json``. A client holding version N of a
+    file applies every delta with ``to > N`` as an upsert on the file's
+    keys, or downloads the full file when N is older than the file's
+    ``base_version``. Chains are compacted back to the full file once they
+    grow too long, or when rows were removed or the header changed.
+    """
+
+    def __init__(
+        self,
+        data_dir: Union[str, Path],
+        max_chain: int = 30,
+        compact_ratio: float = 0.25
+    ):
+        """Set up the delta directory and compaction limits."""
+        self.logger = logging.getLogger(__name__)
+        self.data_dir = Path(data_dir)
+        self.delta_dir = self.data_dir / "deltas"
+        self.manifest_path = self.delta_dir / "manifest.json"
+        self.max_chain = max_chain
+        self.compact_ratio = compact_ratio
+
+    def _load_manifest(self) -> Dict:
+        if self.manifest_path.exists():
+            return json.loads(self.manifest_path.read_text())
+        return {'version': 0, 'updated': None, 'files': {}}
+
+    def _save_manifest(self, manifest: Dict):
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        tmp_path.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _row_hashes(path: Path, keys: List[str]):
+        """Header, raw data lines and per-row key and content hashes."""
+        with open(path, newline='') as f:
+            lines = f.read().splitlines()
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        if len(df) != len(lines) - 1:
+            raise ValueError(f"{path} has multi-line rows")
+        missing = [col for col in keys if col not in df.columns]
+        if missing:
+            raise KeyError(f"{path} is missing key columns {missing}")
+
+        # Number repeated keys so every row has a unique identity
+        key_frame = df[keys].assign(_n=df.groupby(keys).cumcount().astype(str))
+        key_hash = pd.util.hash_pandas_object(key_frame, index=False).to_numpy()
+        row_hash = pd.util.hash_array(np.array(lines[1:], dtype=object))
+        return lines[0], lines[1:], key_hash, row_hash
+
+    def _drop_chain(self, entry: Dict):
+        """Delete a file's delta chain."""
+        for delta in entry['deltas']:
+            (self.data_dir / delta['path']).unlink(missing_ok=True)
+        entry['deltas'] = []
+
+    def _publish_file(self, filename: str, keys: List[str], version: int,
+                      entry: Optional[Dict]) -> Optional[Dict]:
+        """Append this run's delta for one file; None when unchanged."""
+        path = self.data_dir / filename
+        file_dir = self.delta_dir / Path(filename).with_suffix('')
+        state_path = file_dir / "state.npz"
+        header, lines, key_hash, row_hash = self._row_hashes(path, keys)
+
+        rebase = entry is None or not state_path.exists()
+        if not rebase:
+            with np.load(state_path) as state:
+                rebase = str(state['header']) != header
+                order = np.argsort(state['key_hash'])
+                known_keys = state['key_hash'][order]
+                known_rows = state['row_hash'][order]
+        if not rebase:
+            # Row order is irrelevant; match rows on their key hash
+            changed = np.ones(len(key_hash), dtype=bool)
+            if len(known_keys):
+                idx = np.minimum(np.searchsorted(known_keys, key_hash), len(known_keys) - 1)
+                changed = (known_keys[idx] != key_hash) | (known_rows[idx] != row_hash)
+            rebase = bool(np.isin(known_keys, key_hash, invert=True).any())
+            if not rebase and not changed.any():
+                return None
+
+        file_dir.mkdir(parents=True, exist_ok=True)
+        if rebase:
+            if entry is not None:
+                self._drop_chain(entry)
+            entry = {'keys': keys, 'base_version': version, 'deltas': []}
+        else:
+            delta_path = file_dir / f"{version}.csv"
+            with open(delta_path, 'w', newline='') as f:
+                f.write('\n'.join([header] + [lines[i] for i in np.flatnonzero(changed)]))
+                f.write('\n')
+            entry['deltas'].append({
+                'from': entry['version'],
+                'to': version,
+                'rows': int(changed.sum()),
+                'path': delta_path.relative_to(self.data_dir).as_posix()
+            })
+
+            # Compact long chains: clients that far behind refetch the file
+            chain_rows = sum(delta['rows'] for delta in entry['deltas'])
+            if (len(entry['deltas']) > self.max_chain
+                    or chain_rows > self.compact_ratio * len(lines)):
+                self._drop_chain(entry)
+                entry['base_version'] = version
+                self.logger.info(f"Compacted delta chain of {filename}")
+
+        np.savez(state_path.with_suffix('.tmp.npz'), header=np.array(header),
+                 key_hash=key_hash, row_hash=row_hash)
+        os.replace(state_path.with_suffix('.tmp.npz'), state_path)
+        entry.update(version=version, rows=len(lines))
+        return entry
+
+    def publish(self, domain: Optional[str] = None) -> int:
+        """Record deltas for a domain's files (all when None); return the version."""
+        try:
+            self.delta_dir.mkdir(parents=True, exist_ok=True)
+            manifest = self._load_manifest()
+            version = manifest['version'] + 1
+            changed = []
+            for filename, keys in DELTA_FILES.items():
+                if domain and not filename.startswith(f"{domain}/"):
+                    continue
+                if not (self.data_dir / filename).exists():
+                    continue
+                entry = self._publish_file(
+                    filename, keys, version, manifest['files'].get(filename)
+                )
+                if entry is not None:
+                    manifest['files'][filename] = entry
+                    changed.append(filename)
+
+            if changed:
+                manifest['version'] = version
+                manifest['updated'] = datetime.now().isoformat(timespec='seconds')
+                self._save_manifest(manifest)
+                self.logger.info(
+                    f"Published delta version {version} for {', '.join(changed)}"
+                )
+            return manifest['version']
+
+        except Exception as e:
+            self.logger.error(f"Error publishing deltas: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    DeltaPublisher(Path("boerne-water-supply/data/")).publish()
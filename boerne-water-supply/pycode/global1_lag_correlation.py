@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+
+def daily_matrix(
+    df: pd.DataFrame,
+    site_col: str,
+    date_col: str,
+    value_col: str,
+    calendar: pd.DatetimeIndex
+) -> Tuple[np.ndarray, pd.Index]:
+    """Daily values on a shared calendar as a (site, day) array.
+
+    Days without a value are NaN; repeated (site, date) rows are averaged.
+    """
+    df = df.dropna(subset=[value_col])
+    dates = pd.to_datetime(df[date_col])
+    inside = (dates >= calendar[0]) & (dates <= calendar[-1])
+    df, dates = df[inside], dates[inside]
+
+    codes, sites = pd.factorize(df[site_col])
+    days = (dates - calendar[0]).dt.days.to_numpy()
+    cells = codes * len(calendar) + days
+    size = len(sites) * len(calendar)
+    totals = np.bincount(cells, weights=df[value_col].to_numpy(dtype=np.float64),
+                         minlength=size)
+    counts = np.bincount(cells, minlength=size)
+    with np.errstate(invalid='ignore'):
+        values = totals / counts
+    return values.reshape(len(sites), len(calendar)), sites
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    """Zero-mean, unit-variance rows (ignoring NaN) to keep FFT sums well scaled."""
+    with np.errstate(invalid='ignore'):
+        mean = np.nanmean(values, axis=1, keepdims=True)
+        std = np.nanstd(values, axis=1, keepdims=True)
+        return (values - mean) / np.where(std > 0, std, 1)
+
+
+def lagged_correlation(
+    drivers: np.ndarray,
+    responses: np.ndarray,
+    max_lag: int = 180,
+    min_overlap: int = 60
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Pearson correlation of every driver at day t with every response at t + lag.
+
+    ``drivers`` (P, T) and ``responses`` (R, T) share a daily calendar and
+    may contain NaN gaps. The six masked sums behind each correlation are
+    cross-correlations computed with real FFTs, so every pair and every
+    lag in 0..``max_lag`` comes from one transform per series and a few
+    inverse transforms per driver. Returns (P, R, max_lag + 1) arrays of
+    correlations and overlapping day counts; correlations with fewer than
+    ``min_overlap`` overlapping days are NaN.
+    """
+    n_days = drivers.shape[1]
+    n_fft = 1 << int(np.ceil(np.log2(n_days + max_lag)))
+
+    def spectra(values: np.ndarray):
+        valid = ~np.isnan(values)
+        x = np.where(valid, _standardize(values), 0)
+        return [np.fft.rfft(part, n_fft, axis=1)
+                for part in (valid.astype(np.float64), x, x * x)]
+
+    d_mask, d_x, d_xx = spectra(drivers)
+    r_mask, r_y, r_yy = spectra(responses)
+
+    def xcorr(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        # sum_t a[t] * b[t + lag] for lag = 0..max_lag
+        return np.fft.irfft(np.conj(a)[None, :] * b, n_fft, axis=1)[:, :max_lag + 1]
+
+    shape = (len(drivers), len(responses), max_lag + 1)
+    corr, overlap = np.full(shape, np.nan), np.zeros(shape, dtype=np.int64)
+    for p in range(len(drivers)):
+        n = np.rint(xcorr(d_mask[p], r_mask))
+        sx = xcorr(d_x[p], r_mask)
+        sy = xcorr(d_mask[p], r_y)
+        sxx = xcorr(d_xx[p], r_mask)
+        syy = xcorr(d_mask[p], r_yy)
+        sxy = xcorr(d_x[p], r_y)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = n * sxy - sx * sy
+            variance = (n * sxx - sx ** 2) * (n * syy - sy ** 2)
+            r = covariance / np.sqrt(np.where(variance > 0, variance, np.nan))
+        r[n < min_overlap] = np.nan
+        corr[p] = np.clip(r, -1, 1)
+        overlap[p] = n.astype(np.int64)
+
+    return corr, overlap
+
+
+def lag_response_table(
+    corr: np.ndarray,
+    overlap: np.ndarray,
+    drivers: pd.Index,
+    responses: pd.Index,
+    report_lags: Tuple[int, ...] = (0, 1, 7, 30, 90, 180)
+) -> pd.DataFrame:
+    """One row per driver/response pair summarizing the lag response.
+
+    ``peak_lag`` is the lag (days) of the strongest positive correlation
+    and ``decay_lag`` the first later lag where it falls below half of
+    the peak.
+    """
+    n_drivers, n_responses, n_lags = corr.shape
+    filled = np.where(np.isnan(corr), -np.inf, corr)
+    peak_lag = filled.argmax(axis=2)
+    peak_r = np.take_along_axis(corr, peak_lag[..., None], axis=2)[..., 0]
+    peak_n = np.take_along_axis(overlap, peak_lag[..., None], axis=2)[..., 0]
+
+    lags = np.arange(n_lags)
+    with np.errstate(invalid='ignore'):
+        below = (corr < peak_r[..., None] / 2) & (lags > peak_lag[..., None])
+    decay_lag = np.where(below.any(axis=2), below.argmax(axis=2), -1)
+
+    table = pd.DataFrame({
+        'driver': np.repeat(drivers.to_numpy(), n_responses),
+        'response': np.tile(responses.to_numpy(), n_drivers),
+        'peak_lag': peak_lag.ravel(),
+        'peak_r': peak_r.ravel(),
+        'n_overlap': peak_n.ravel(),
+        'decay_lag': decay_lag.ravel()
+    })
+    table['decay_lag'] = table['decay_lag'].where(table['decay_lag'] >= 0).astype('Int64')
+    for lag in report_lags:
+        if lag < n_lags:
+            table[f'r_{lag}'] = corr[:, :, lag].ravel()
+
+    # Pairs that never overlap have nothing to report
+    return table.dropna(subset=['peak_r']).reset_index(drop=True)
@@ -0,0 +1,121 @@
+import json
+import pandas as pd
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Iterator, Optional, Sequence, Tuple
+
+from global1_quality_control import QC_RULES
+
+try:
+    import ijson
+except ImportError:  # fall back to parsing the whole response
+    ijson = None
+
+# Event prefixes of the NWIS WaterML-JSON fields that are read
+_SITE_PREFIX = 'value.timeSeries.item.sourceInfo.siteCode.item.value'
+_POINT_PREFIX = 'value.timeSeries.item.values.item.value.item'
+_QUALIFIER_PREFIX = _POINT_PREFIX + '.qualifiers.item'
+
+# (site, local dateTime text, value text, qualifiers)
+IvPoint = Tuple[str, str, str, Tuple[str, ...]]
+
+
+def iter_iv_points(stream: BinaryIO) -> Iterator[IvPoint]:
+    """Yield every observation of an NWIS JSON response one at a time.
+
+    With ijson installed the response is parsed as a stream of events, so
+    only the current observation is held in memory. Without it the whole
+    document is loaded with the json module.
+    """
+    if ijson is None:
+        data = json.load(stream)
+        for series in data['value']['timeSeries']:
+            site = series['sourceInfo']['siteCode'][0]['value']
+            for block in series['values']:
+                for point in block['value']:
+                    yield (site, point['dateTime'], point['value'],
+                           tuple(point.get('qualifiers', ())))
+        return
+
+    site = None
+    point: Dict = {}
+    qualifiers = []
+    for prefix, event, value in ijson.parse(stream):
+        if prefix == _SITE_PREFIX:
+            site = value
+        elif prefix == _QUALIFIER_PREFIX:
+            qualifiers.append(value)
+        elif prefix == _POINT_PREFIX:
+            if event == 'start_map':
+                point, qualifiers = {}, []
+            elif event == 'end_map':
+                yield site, point['dateTime'], point['value'], tuple(qualifiers)
+        elif prefix.startswith(_POINT_PREFIX + '.') and event in ('string', 'number'):
+            point[prefix[len(_POINT_PREFIX) + 1:]] = value
+
+
+class IvDownsampler:
+    """Downsample streamed 15-minute values to daily and hourly means.
+
+    Observations are folded into running (sum, count) pairs keyed by
+    site and local day or hour, so memory depends on the number of gauges
+    and days requested, never on the number of raw observations. Only the
+    most recent ``hourly_hours`` hours are kept for each site. NWIS
+    no-data values and unusable qualifiers are skipped.
+    """
+
+    def __init__(self, hourly_hours: int = 72, rules: Optional[Dict] = None):
+        rules = rules or QC_RULES['streamflow']
+        self.hourly_hours = hourly_hours
+        self.sentinels = set(rules['sentinels'])
+        self.bad_codes = set(rules['bad_codes'])
+        self.n_points = 0
+        self._daily: Dict[Tuple[str, str], list] = {}
+        self._hourly: Dict[str, OrderedDict] = {}
+
+    def add(self, site: str, date_time: str, value: str,
+            qualifiers: Sequence[str] = ()):
+        """Fold one observation into the running means."""
+        self.n_points += 1
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        if value in self.sentinels or self.bad_codes.intersection(qualifiers):
+            return
+
+        # dateTime is local time with an offset, e.g. 2024-05-01T13:15:00.000-05:00
+        day = self._daily.setdefault((site, date_time[:10]), [0.0, 0])
+        day[0] += value
+        day[1] += 1
+
+        hours = self._hourly.setdefault(site, OrderedDict())
+        hour = hours.get(date_time[:13])
+        if hour is None:
+            hour = hours[date_time[:13]] = [0.0, 0]
+            if len(hours) > self.hourly_hours:
+                hours.popitem(last=False)
+        hour[0] += value
+        hour[1] += 1
+
+    def consume(self, stream: BinaryIO) -> 'IvDownsampler':
+        """Fold every observation of an NWIS JSON response."""
+        for point in iter_iv_points(stream):
+            self.add(*point)
+        return self
+
+    def daily(self) -> pd.DataFrame:
+        """Daily mean flow by site and local date."""
+        rows = [(site, day, total / count, count)
+                for (site, day), (total, count) in self._daily.items()]
+        daily = pd.DataFrame(rows, columns=['site', 'datetime', 'value', 'n_obs'])
+        daily['datetime'] = pd.to_datetime(daily['datetime'])
+        return daily.sort_values(['site', 'datetime']).reset_index(drop=True)
+
+    def hourly(self) -> pd.DataFrame:
+        """Hourly mean flow for the most recent hours of each site."""
+        rows = [(site, hour, total / count, count)
+                for site, hours in self._hourly.items()
+                for hour, (total, count) in hours.items()]
+        hourly = pd.DataFrame(rows, columns=['site', 'datetime', 'flow', 'n_obs'])
+        hourly['datetime'] = pd.to_datetime(hourly['datetime'], format='%Y-%m-%dT%H')
+        return hourly.sort_values(['site', 'datetime']).reset_index(drop=True)
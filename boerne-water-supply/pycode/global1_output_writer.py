@@ -0,0 +1,300 @@
+import os
+import json
+import logging
+import shapely
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # fall back to the pandas writer
+    pa = None
+
+# Formats shared by every published CSV and GeoJSON
+DATE_FORMAT = '%Y-%m-%d'
+FLOAT_PRECISION = 6
+COORD_PRECISION = 7
+
+# Missing values in published CSVs, as R's write.csv writes them
+NA_STRING = 'NA'
+
+
+def _atomic_write(path: Union[str, Path], write: Callable[[Path], None]):
+    """Write to a temporary sibling, then rename it over ``path``."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def format_frame(
+    df: pd.DataFrame,
+    precision: Union[int, Dict[str, int]] = FLOAT_PRECISION,
+    date_format: str = DATE_FORMAT
+) -> pd.DataFrame:
+    """Round floats, render dates as text and stringify mixed columns."""
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime(date_format)
+        elif pd.api.types.is_float_dtype(values):
+            digits = (precision.get(col, FLOAT_PRECISION)
+                      if isinstance(precision, dict) else precision)
+            # Adding 0.0 turns the -0.0 left by rounding into 0.0
+            values = values.round(digits) + 0.0
+        elif values.dtype == object:
+            values = values.where(values.isna(), values.astype(str))
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _csv_field(values: pd.Series, bare: bool) -> pd.Series:
+    """One formatted column as CSV fields, for the writer without pyarrow."""
+    if pd.api.types.is_bool_dtype(values):
+        text = values.map({True: 'true', False: 'false'})
+    elif pd.api.types.is_float_dtype(values):
+        text = values.map('{:.15g}'.format)
+    elif bare or pd.api.types.is_numeric_dtype(values):
+        text = values.astype(str)
+    else:
+        text = '"' + values.astype(str).str.replace('"', '""') + '"'
+    return text.where(values.notna(), NA_STRING)
+
+
+def _write_frame(
+    df: pd.DataFrame,
+    sink,
+    precision: Union[int, Dict[str, int]],
+    date_format: str,
+    header: bool = True
+):
+    """Write a frame to a binary sink in the layout of R's write.csv.
+
+    The header and text are quoted. Numbers are bare, and so are dates
+    written with the plain ``DATE_FORMAT``, as R writes Date columns.
+    Missing values are ``NA``, so the dashboard never reads a gap as 0.
+    """
+    frame = format_frame(df, precision, date_format)
+    dates = [] if date_format != DATE_FORMAT else [
+        col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])
+    ]
+    if pa is not None:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        for col in dates:
+            values = pc.cast(pa.array(df[col]), pa.date32(), safe=False)
+            table = table.set_column(table.schema.get_field_index(col), col, values)
+        pa_csv.write_csv(table, sink, pa_csv.WriteOptions(
+            include_header=header, quoting_style='needed', null_string=NA_STRING
+        ))
+        return
+
+    fields = [_csv_field(frame[col], col in dates) for col in frame.columns]
+    lines = fields[0].str.cat(fields[1:], sep=',') if fields else pd.Series(dtype=str)
+    text = ''.join(line + '\n' for line in lines)
+    if header:
+        text = ','.join(f'"{col}"' for col in frame.columns) + '\n' + text
+    sink.write(text.encode('utf-8'))
+
+
+def write_csv(
+    df: pd.DataFrame,
+    path: Union[str, Path],
+    precision: Union[int, Dict[str, int]] = FLOAT_PRECISION,
+    date_format: str = DATE_FORMAT
+):
+    """Write a CSV with fixed float precision and date format, atomically.
+
+    The layout follows R's write.csv (see ``_write_frame``). The Arrow CSV
+    writer is used when pyarrow is installed, with a pandas rendering of
+    the same layout as the fallback.
+    """
+    def write(tmp_path: Path):
+        with open(tmp_path, 'wb') as f:
+            _write_frame(df, f, precision, date_format)
+
+    _atomic_write(path, write)
+
+
+def write_point_geojson(
+    gdf: gpd.GeoDataFrame,
+    path: Union[str, Path],
+    precision: Union[int, Dict[str, int]] = FLOAT_PRECISION,
+    coord_precision: int = COORD_PRECISION,
+    date_format: str = DATE_FORMAT
+):
+    """Serialize a point layer straight to compact GeoJSON, atomically."""
+    geometry = gdf.geometry
+    if not geometry.dropna().geom_type.eq('Point').all():
+        raise ValueError(f"{path} has non-point geometries")
+
+    properties = format_frame(
+        pd.DataFrame(gdf.drop(columns=gdf.geometry.name)), precision, date_format
+    )
+    records = json.loads(properties.to_json(orient='records'))
+    missing = geometry.isna().to_numpy()
+    xs = geometry.x.round(coord_precision).tolist()
+    ys = geometry.y.round(coord_precision).tolist()
+
+    features = [
+        {
+            'type': 'Feature',
+            'properties': props,
+            'geometry': None if empty else {'type': 'Point', 'coordinates': [x, y]}
+        }
+        for props, x, y, empty in zip(records, xs, ys, missing)
+    ]
+
+    def write(tmp_path: Path):
+        with open(tmp_path, 'w') as f:
+            json.dump(
+                {'type': 'FeatureCollection', 'features': features},
+                f, separators=(',', ':')
+            )
+
+    _atomic_write(path, write)
+
+
+def write_shape_geojson(
+    gdf: gpd.GeoDataFrame,
+    path: Union[str, Path],
+    precision: Union[int, Dict[str, int]] = FLOAT_PRECISION,
+    coord_precision: int = COORD_PRECISION,
+    date_format: str = DATE_FORMAT
+):
+    """Serialize a layer of any geometry type to compact GeoJSON, atomically."""
+    properties = format_frame(
+        pd.DataFrame(gdf.drop(columns=gdf.geometry.name)), precision, date_format
+    )
+    records = json.loads(properties.to_json(orient='records'))
+    geometries = shapely.transform(
+        gdf.geometry.to_numpy(), lambda coords: np.round(coords, coord_precision)
+    )
+
+    features = [
+        {
+            'type': 'Feature',
+            'properties': props,
+            'geometry': None if geom is None else json.loads(shapely.to_geojson(geom))
+        }
+        for props, geom in zip(records, geometries)
+    ]
+
+    def write(tmp_path: Path):
+        with open(tmp_path, 'w') as f:
+            json.dump(
+                {'type': 'FeatureCollection', 'features': features},
+                f, separators=(',', ':')
+            )
+
+    _atomic_write(path, write)
+
+
+class CsvAppender:
+    """Write a CSV one frame at a time, atomically.
+
+    Use as a context manager. Frames are formatted like ``write_csv`` and
+    appended to a temporary sibling that replaces ``path`` only when the
+    block exits cleanly. Columns follow the first frame appended.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        precision: Union[int, Dict[str, int]] = FLOAT_PRECISION,
+        date_format: str = DATE_FORMAT
+    ):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self.precision = precision
+        self.date_format = date_format
+        self.columns: Optional[List[str]] = None
+        self.rows = 0
+        self._file = None
+
+    def append(self, df: pd.DataFrame):
+        """Format and append one frame."""
+        header = self.columns is None
+        if header:
+            self.columns = list(df.columns)
+        _write_frame(df[self.columns], self._file, self.precision,
+                     self.date_format, header)
+        self.rows += len(df)
+
+    def __enter__(self) -> 'CsvAppender':
+        self._file = open(self.tmp_path, 'wb')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None and self.columns is not None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+
+
+class OutputWriter:
+    """Write independent output files concurrently on a thread pool.
+
+    Use as a context manager; every queued file is written when the block
+    exits and the first failure is re-raised. Frames handed to the writer
+    must not be modified until the block has exited.
+    """
+
+    def __init__(self, workers: int = 4):
+        self.logger = logging.getLogger(__name__)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(workers, 1), thread_name_prefix='boerne_output'
+        )
+        self._futures: Dict[str, Future] = {}
+
+    def csv(self, df: pd.DataFrame, path: Union[str, Path], **kwargs):
+        """Queue a CSV file."""
+        self._futures[str(path)] = self._pool.submit(write_csv, df, path, **kwargs)
+
+    def geojson(self, gdf: gpd.GeoDataFrame, path: Union[str, Path], **kwargs):
+        """Queue a point GeoJSON file."""
+        self._futures[str(path)] = self._pool.submit(
+            write_point_geojson, gdf, path, **kwargs
+        )
+
+    def shapes(self, gdf: gpd.GeoDataFrame, path: Union[str, Path], **kwargs):
+        """Queue a GeoJSON file of any geometry type."""
+        self._futures[str(path)] = self._pool.submit(
+            write_shape_geojson, gdf, path, **kwargs
+        )
+
+    def wait(self):
+        """Block until every queued file is written."""
+        error: Optional[Exception] = None
+        for path, future in self._futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                self.logger.error(f"Error writing {path}: {e}")
+                error = error or e
+        written = len(self._futures)
+        self._futures = {}
+        if error is not None:
+            raise error
+        self.logger.info(f"Wrote {written} output files")
+
+    def __enter__(self) -> 'OutputWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            self._pool.shutdown(wait=True)
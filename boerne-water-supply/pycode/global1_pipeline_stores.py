@@ -0,0 +1,43 @@
+import os
+import logging
+from pathlib import Path
+from typing import Optional, Union
+from global1_warehouse import Warehouse
+from global1_delta_publisher import DeltaPublisher
+from global1_watermark_catalog import WatermarkCatalog
+
+
+class PipelineStores:
+    """The stores a processor reads history from and publishes through.
+
+    ``warehouse`` is the SQLite warehouse when ``BOERNE_WAREHOUSE`` is set
+    (None otherwise), ``deltas`` the per-run delta publisher and
+    ``watermarks`` the per-source watermark catalog, all for one data
+    directory. Kept apart from ``GlobalSetup`` so global settings never
+    depend on the components built on top of them.
+    """
+
+    def __init__(self, data_dir: Union[str, Path]):
+        self.logger = logging.getLogger(__name__)
+        self.data_dir = Path(data_dir)
+
+        # Optional embedded warehouse shared by all processors
+        self.warehouse = self._open_warehouse()
+
+        # Per-run delta files and manifest for returning browsers
+        self.deltas = DeltaPublisher(self.data_dir)
+
+        # Last ingested date and revision per source and site
+        self.watermarks = WatermarkCatalog(self.data_dir / "watermarks")
+
+    def _open_warehouse(self) -> Optional[Warehouse]:
+        """Open the SQLite warehouse when BOERNE_WAREHOUSE is set."""
+        if not os.environ.get('BOERNE_WAREHOUSE'):
+            return None
+        try:
+            warehouse = Warehouse(self.data_dir / "warehouse.sqlite")
+            self.logger.info(f"Using warehouse: {warehouse.path}")
+            return warehouse
+        except Exception as e:
+            self.logger.error(f"Error opening warehouse: {e}")
+            raise
@@ -0,0 +1,301 @@
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Bits set in the qc_flag column; 0 means the row passed every check
+QC_MISSING = 1
+QC_RANGE = 2
+QC_CODE = 4
+QC_DUPLICATE = 8
+QC_OUTLIER = 16
+QC_FLAG_NAMES = {
+    QC_MISSING: 'missing',
+    QC_RANGE: 'out_of_range',
+    QC_CODE: 'invalid_code',
+    QC_DUPLICATE: 'duplicate',
+    QC_OUTLIER: 'outlier'
+}
+
+# Per-domain schema and screening rules
+QC_RULES = {
+    'streamflow': {
+        'site_col': 'site',
+        'date_col': 'date',
+        'value_col': 'flow',
+        'min': 0,
+        'max': None,
+        # NWIS no-data value and daily-value qualifiers for unusable days
+        'sentinels': [-999999],
+        'code_col': 'qualifiers',
+        'bad_codes': ['Ice', 'Eqp', 'Bkw', 'Dis', 'Mnt', 'Ssn', '***'],
+        # Flows span orders of magnitude within days, so screen log flows
+        'log_scale': True,
+        # Storm peaks are real; only flag jumps far beyond any hydrograph rise
+        'min_mad': 0.5,
+        'window': 15,
+        'threshold': 8.0
+    },
+    'groundwater': {
+        'site_col': 'site',
+        'date_col': 'date',
+        'value_col': 'depth_ft',
+        'min': 0,
+        'max': 1500,
+        'sentinels': [],
+        'code_col': None,
+        'bad_codes': [],
+        'window': 9,
+        'threshold': 6.0
+    },
+    'reservoirs': {
+        'site_col': 'NIDID',
+        'date_col': 'date',
+        'value_col': 'percentStorage',
+        'min': 0,
+        'max': 200,
+        'sentinels': [],
+        'code_col': None,
+        'bad_codes': [],
+        'window': 15,
+        'threshold': 6.0
+    },
+    'demand': {
+        'site_col': 'pwsid',
+        'date_col': 'date',
+        'value_col': 'total',
+        'min': 0,
+        'max': 50,
+        # Zeros are placeholders for days not yet entered in the sheet
+        'sentinels': [0],
+        'code_col': None,
+        'bad_codes': [],
+        'window': 15,
+        'threshold': 6.0
+    }
+}
+
+# Normal-consistent scale factor for the median absolute deviation
+MAD_SCALE = 1.4826
+
+
+def rolling_median_mad(
+    values: np.ndarray,
+    groups: np.ndarray,
+    window: int,
+    min_periods: int = 5,
+    chunk_size: int = 100_000
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Centered rolling median and MAD within contiguous groups.
+
+    ``values`` must already be sorted by group and date. Windows never
+    cross a group boundary and ignore NaN values; positions with fewer
+    than ``min_periods`` valid neighbours get NaN.
+    """
+    n = len(values)
+    half = window // 2
+    if n == 0:
+        return np.full(0, np.nan), np.full(0, np.nan)
+
+    # Lay the groups out with NaN gaps between them, so a plain sliding
+    # window over the gapped array never mixes two sites
+    group_number = np.r_[0, np.cumsum(groups[1:] != groups[:-1])]
+    positions = np.arange(n) + half * (group_number + 1)
+    gapped = np.full(n + half * (group_number[-1] + 2), np.nan)
+    gapped[positions] = values
+    width = 2 * half + 1
+    all_windows = sliding_window_view(gapped, width)
+
+    # Window i of the view is centred on gapped[i + half]
+    n_windows = len(all_windows)
+    median = np.full(n_windows, np.nan)
+    mad = np.full(n_windows, np.nan)
+    for start in range(0, n_windows, chunk_size):
+        stop = min(start + chunk_size, n_windows)
+        windows = all_windows[start:stop]
+
+        # NaNs sort last, so the median sits at the middle of the valid count
+        count = width - np.isnan(windows).sum(axis=1)
+        rows = np.arange(stop - start)
+        lo, hi = np.maximum(count - 1, 0) // 2, count // 2
+        ordered = np.sort(windows, axis=1)
+        chunk_median = (ordered[rows, lo] + ordered[rows, hi]) / 2
+
+        ordered = np.sort(np.abs(windows - chunk_median[:, None]), axis=1)
+        chunk_mad = (ordered[rows, lo] + ordered[rows, hi]) / 2
+
+        enough = count >= min_periods
+        median[start:stop] = np.where(enough, chunk_median, np.nan)
+        mad[start:stop] = np.where(enough, chunk_mad, np.nan)
+
+    median, mad = median[positions - half], mad[positions - half]
+    return median, mad
+
+
+class QualityControl:
+    """Flag-don't-drop screening run before each domain's statistics.
+
+    Every row gets a ``qc_flag`` bitmask (see ``QC_FLAG_NAMES``) from the
+    domain's schema and range rules, sentinel and qualifier codes,
+    duplicate (site, date) keys and a per-site rolling median/MAD outlier
+    test. Rows are never removed; statistics use ``passed`` rows only, and
+    are skipped when no row passed (see ``any_passed``). A per-site
+    summary is written to ``<domain>_qa_report.csv``.
+    """
+
+    def __init__(
+        self,
+        domain: str,
+        report_dir: Union[str, Path],
+        rules: Optional[Dict] = None
+    ):
+        """Set up screening with the domain's rules from ``QC_RULES``."""
+        self.logger = logging.getLogger(__name__)
+        self.domain = domain
+        self.rules = dict(QC_RULES[domain], **(rules or {}))
+        self.report_path = Path(report_dir) / f"{domain}_qa_report.csv"
+
+    def screen(self, df: pd.DataFrame, save_report: bool = True) -> pd.DataFrame:
+        """Return a copy of ``df`` with a ``qc_flag`` column set."""
+        try:
+            rules = self.rules
+            site_col, date_col = rules['site_col'], rules['date_col']
+            df = df.drop(columns='qc_flag', errors='ignore').reset_index(drop=True)
+
+            missing = [col for col in (site_col, date_col, rules['value_col'])
+                       if col not in df.columns]
+            if missing:
+                raise KeyError(f"{self.domain} data is missing columns {missing}")
+
+            values = pd.to_numeric(df[rules['value_col']], errors='coerce').to_numpy(
+                dtype=np.float64
+            )
+            dates = pd.to_datetime(df[date_col], errors='coerce').to_numpy(
+                dtype='datetime64[ns]'
+            )
+            codes, sites = pd.factorize(df[site_col])
+            flags = np.zeros(len(df), dtype=np.int64)
+
+            # Schema: a usable site, date and numeric value
+            flags |= np.where(np.isnan(values) | np.isnat(dates) | (codes < 0),
+                              QC_MISSING, 0)
+
+            # Sentinel values and unusable qualifier codes
+            invalid = np.isin(values, rules['sentinels'])
+            code_col = rules['code_col']
+            if code_col and code_col in df.columns and rules['bad_codes']:
+                pattern = '|'.join(code.replace('*', r'\*') for code in rules['bad_codes'])
+                invalid |= df[code_col].astype(str).str.contains(pattern).to_numpy()
+            flags |= np.where(invalid, QC_CODE, 0)
+
+            # Physical range
+            out_of_range = np.zeros(len(df), dtype=bool)
+            if rules['min'] is not None:
+                out_of_range |= values < rules['min']
+            if rules['max'] is not None:
+                out_of_range |= values > rules['max']
+            flags |= np.where(out_of_range & ~invalid, QC_RANGE, 0)
+
+            # One (site, date) ordering shared by the remaining checks
+            order = np.lexsort((dates.view(np.int64), codes))
+            sorted_codes = codes[order]
+            sorted_dates = dates[order]
+
+            # Repeated (site, date) keys: the last row wins
+            repeated = np.zeros(len(df), dtype=bool)
+            repeated[order[:-1]] = ((sorted_codes[1:] == sorted_codes[:-1])
+                                    & (sorted_dates[1:] == sorted_dates[:-1]))
+            flags |= np.where(repeated, QC_DUPLICATE, 0)
+
+            # Rolling median/MAD outliers among rows that passed so far
+            screened = self._outlier_scale(np.where(flags == 0, values, np.nan))[order]
+            median, mad = rolling_median_mad(screened, sorted_codes, rules['window'])
+            # Flat windows would make every change an outlier, so floor the MAD
+            scale = MAD_SCALE * np.maximum.reduce([
+                mad, 0.01 * np.abs(median), np.full_like(mad, rules.get('min_mad', 0))
+            ])
+            with np.errstate(invalid='ignore'):
+                outlier = ((np.abs(screened - median) > rules['threshold'] * scale)
+                           & (scale > 0))
+            flags[order] |= np.where(outlier, QC_OUTLIER, 0)
+
+            df['qc_flag'] = flags
+            if save_report:
+                self.report(sites, codes, dates, flags).to_csv(
+                    self.report_path, index=False
+                )
+
+            n_flagged = int((flags != 0).sum())
+            self.logger.info(
+                f"QA/QC flagged {n_flagged} of {len(df)} {self.domain} rows"
+            )
+            return df
+
+        except Exception as e:
+            self.logger.error(f"Error screening {self.domain} data: {e}")
+            raise
+
+    def _outlier_scale(self, values: np.ndarray) -> np.ndarray:
+        """Values on the scale the outlier test runs on."""
+        if self.rules.get('log_scale'):
+            return np.log1p(np.maximum(values, 0))
+        return values
+
+    def report(
+        self,
+        sites: pd.Index,
+        codes: np.ndarray,
+        dates: np.ndarray,
+        flags: np.ndarray
+    ) -> pd.DataFrame:
+        """Per-site row counts, flag counts and date coverage."""
+        valid = codes >= 0
+        codes, dates, flags = codes[valid], dates[valid], flags[valid]
+        n_sites = len(sites)
+
+        report = pd.DataFrame({
+            self.rules['site_col']: sites,
+            'n_obs': np.bincount(codes, minlength=n_sites),
+            'n_passed': np.bincount(codes, weights=flags == 0, minlength=n_sites)
+        })
+        for bit, name in QC_FLAG_NAMES.items():
+            report[f'n_{name}'] = np.bincount(
+                codes, weights=(flags & bit) != 0, minlength=n_sites
+            )
+
+        coverage = (pd.Series(dates).groupby(codes).agg(['min', 'max'])
+                    .reindex(range(n_sites)))
+        report['first_date'] = coverage['min'].dt.strftime('%Y-%m-%d').to_numpy()
+        report['last_date'] = coverage['max'].dt.strftime('%Y-%m-%d').to_numpy()
+        count_cols = [col for col in report.columns if col.startswith('n_')]
+        report[count_cols] = report[count_cols].astype(int)
+        return report.sort_values(self.rules['site_col']).reset_index(drop=True)
+
+    def summarize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Report rows for a frame ``screen`` has already flagged."""
+        codes, sites = pd.factorize(df[self.rules['site_col']])
+        dates = pd.to_datetime(df[self.rules['date_col']], errors='coerce').to_numpy(
+            dtype='datetime64[ns]'
+        )
+        return self.report(sites, codes, dates, df['qc_flag'].to_numpy(dtype=np.int64))
+
+    @staticmethod
+    def passed(df: pd.DataFrame) -> pd.DataFrame:
+        """Rows that passed every check."""
+        return df[df['qc_flag'] == 0]
+
+    def any_passed(self, df: pd.DataFrame) -> bool:
+        """Whether any row passed; warns when screening passed none.
+
+        Processors then publish the flagged data but skip statistics and
+        current status, which would otherwise run on nothing.
+        """
+        if (df['qc_flag'] == 0).any():
+            return True
+        self.logger.warning(
+            f"QA/QC passed none of {len(df)} {self.domain} rows; "
+            f"skipping statistics and status"
+        )
+        return False
@@ -0,0 +1,163 @@
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Tuple, Union
+
+# Aggregates kept at every resolution of the cube
+ROLLUP_STATS = ['mean', 'min', 'max', 'median', 'p98', 'count']
+
+
+class RollupCube:
+    """Incrementally maintained daily -> monthly -> annual aggregates.
+
+    Daily observations are rolled up per key (site or pwsid) into monthly
+    and annual periods holding mean, min, max, median, 98th percentile and
+    count. Each monthly period stores a checksum of its daily rows, so an
+    update only recomputes the months (and the years containing them)
+    whose daily data changed. The cube is persisted next to the domain's
+    other outputs as ``<name>_rollup_monthly.csv`` and
+    ``<name>_rollup_annual.csv``.
+    """
+
+    def __init__(
+        self,
+        cube_dir: Union[str, Path],
+        name: str,
+        key: str = 'site',
+        value: str = 'value',
+        date_col: str = 'date'
+    ):
+        """Load the persisted cube for ``name`` if it exists."""
+        self.logger = logging.getLogger(__name__)
+        self.key = key
+        self.value = value
+        self.date_col = date_col
+
+        cube_dir = Path(cube_dir)
+        self.monthly_path = cube_dir / f"{name}_rollup_monthly.csv"
+        self.annual_path = cube_dir / f"{name}_rollup_annual.csv"
+
+        self.monthly = self._read(
+            self.monthly_path,
+            [key, 'year', 'month'] + ROLLUP_STATS + ['checksum']
+        )
+        self.annual = self._read(self.annual_path, [key, 'year'] + ROLLUP_STATS)
+
+    def _read(self, path: Path, columns: list) -> pd.DataFrame:
+        """Read a persisted cube level, or an empty frame on first run."""
+        if path.exists():
+            return pd.read_csv(path, dtype={self.key: str})
+        return pd.DataFrame(columns=columns)
+
+    def _prepare(self, daily: pd.DataFrame) -> pd.DataFrame:
+        """Reduce input to key, year, month, date and numeric value."""
+        dates = pd.to_datetime(daily[self.date_col])
+        df = pd.DataFrame({
+            self.key: daily[self.key].astype(str).to_numpy(),
+            'year': dates.dt.year.to_numpy(),
+            'month': dates.dt.month.to_numpy(),
+            'date': dates.to_numpy(),
+            'value': pd.to_numeric(daily[self.value], errors='coerce').to_numpy()
+        })
+        return df.dropna(subset=['value'])
+
+    def _checksums(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Order-independent checksum of the daily rows in each month."""
+        row_hash = pd.util.hash_pandas_object(
+            df[['date', 'value']], index=False
+        ).to_numpy()
+        sums = (pd.Series(row_hash, index=df.index)
+                .groupby([df[self.key], df['year'], df['month']])
+                .sum())
+        # Keep the checksum representable as a signed CSV integer
+        return (sums.astype(np.uint64) & np.uint64(0x7FFFFFFFFFFFFFFF)).astype(
+            np.int64
+        ).rename('checksum').reset_index()
+
+    def _aggregate(self, df: pd.DataFrame, by: list) -> pd.DataFrame:
+        """Compute every rollup statistic for ``df`` in one grouped pass."""
+        grouped = df.groupby(by, sort=True)['value']
+        out = grouped.agg(['mean', 'min', 'max', 'median', 'count'])
+        out['p98'] = grouped.quantile(0.98)
+        return out[ROLLUP_STATS].reset_index()
+
+    @staticmethod
+    def _splice(kept: pd.DataFrame, fresh: pd.DataFrame, order: list) -> pd.DataFrame:
+        """Combine untouched and recomputed periods in key/period order."""
+        pieces = [piece for piece in (kept, fresh) if not piece.empty]
+        if not pieces:
+            return fresh
+        return (pd.concat(pieces, ignore_index=True)
+                .sort_values(order)
+                .reset_index(drop=True))
+
+    def update(self, daily: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Refresh the cube from daily data and return (monthly, annual)."""
+        try:
+            df = self._prepare(daily)
+            checksums = self._checksums(df)
+            period = [self.key, 'year', 'month']
+
+            # Months that are new or whose daily rows changed
+            previous = self.monthly[period + ['checksum']].astype(
+                {self.key: str, 'year': int, 'month': int, 'checksum': np.int64}
+            )
+            compare = checksums.merge(
+                previous, on=period, how='left', suffixes=('', '_old')
+            )
+            touched = compare.loc[
+                compare['checksum'] != compare['checksum_old'], period
+            ]
+            # Months that no longer have any daily rows
+            current_keys = pd.MultiIndex.from_frame(checksums[period])
+            stale = ~pd.MultiIndex.from_frame(previous[period]).isin(current_keys)
+
+            if touched.empty and not stale.any():
+                self.logger.info("Rollup cube is up to date")
+                return self.monthly, self.annual
+
+            touched_years = pd.concat(
+                [touched[[self.key, 'year']], previous.loc[stale, [self.key, 'year']]]
+            ).drop_duplicates()
+            year_keys = pd.MultiIndex.from_frame(touched_years)
+            in_years = pd.MultiIndex.from_frame(df[[self.key, 'year']]).isin(year_keys)
+            subset = df[in_years]
+
+            monthly = self._aggregate(
+                subset[pd.MultiIndex.from_frame(subset[period]).isin(
+                    pd.MultiIndex.from_frame(touched)
+                )],
+                period
+            ).merge(checksums, on=period, how='left')
+            annual = self._aggregate(subset, [self.key, 'year'])
+
+            # Swap the recomputed periods into the persisted cube
+            replaced_months = pd.MultiIndex.from_frame(previous[period]).isin(
+                pd.MultiIndex.from_frame(touched)
+            ) | stale
+            self.monthly = self._splice(self.monthly[~replaced_months], monthly, period)
+
+            remaining_years = pd.MultiIndex.from_frame(
+                checksums[[self.key, 'year']].drop_duplicates()
+            )
+            annual_keys = pd.MultiIndex.from_frame(
+                self.annual[[self.key, 'year']].astype({self.key: str, 'year': int})
+            )
+            keep_years = ~annual_keys.isin(year_keys) & annual_keys.isin(remaining_years)
+            self.annual = self._splice(
+                self.annual[keep_years], annual, [self.key, 'year']
+            )
+
+            self.monthly.to_csv(self.monthly_path, index=False)
+            self.annual.to_csv(self.annual_path, index=False)
+
+            self.logger.info(
+                f"Rollup cube updated {len(touched)} months "
+                f"across {len(touched_years)} years"
+            )
+            return self.monthly, self.annual
+
+        except Exception as e:
+            self.logger.error(f"Error updating rollup cube: {e}")
+            raise
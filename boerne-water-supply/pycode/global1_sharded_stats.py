@@ -0,0 +1,140 @@
+import zlib
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+# Percentile envelope columns shared by every domain's stats file
+PERCENTILES = {'flow10': 0.10, 'flow25': 0.25, 'flow50': 0.50,
+               'flow75': 0.75, 'flow90': 0.90}
+
+
+def percentile_stats(df: pd.DataFrame, site_col: str, value_col: str) -> pd.DataFrame:
+    """Count, min, percentiles and max of ``value_col`` by (site, julian).
+
+    Without any values (an empty frame, or every value NaN) the result is
+    an empty frame with the stats columns.
+    """
+    columns = [site_col, 'julian', 'Nobs', 'min'] + list(PERCENTILES) + ['max']
+    valid = df.dropna(subset=[value_col])
+    if valid.empty:
+        return pd.DataFrame(columns=columns)
+    grouped = valid.groupby([site_col, 'julian'])[value_col]
+    stats = grouped.agg(['count', 'min', 'max']).rename(columns={'count': 'Nobs'})
+    quantiles = grouped.quantile(list(PERCENTILES.values())).unstack()
+    quantiles.columns = list(PERCENTILES.keys())
+    stats = stats.join(quantiles).reset_index()
+    return stats[columns]
+
+
+def latest_rows(df: pd.DataFrame, site_col: str, date_col: str) -> pd.DataFrame:
+    """Most recent row for each site; sites without a date are left out."""
+    dated = df.dropna(subset=[date_col])
+    return dated.loc[dated.groupby(site_col)[date_col].idxmax()]
+
+
+def shard_ids(sites: pd.Series, n_shards: int) -> np.ndarray:
+    """Stable shard number for each row, from a CRC32 hash of its site."""
+    codes, uniques = pd.factorize(sites.astype(str))
+    site_shards = np.array(
+        [zlib.crc32(site.encode('utf-8')) % n_shards for site in uniques],
+        dtype=np.int64
+    )
+    return site_shards[codes]
+
+
+def _export_columns(df: pd.DataFrame, directory: Path) -> Dict:
+    """Write each column as a .npy file workers can memory-map."""
+    spec = {}
+    for i, col in enumerate(df.columns):
+        path = directory / f"col{i}.npy"
+        values = df[col]
+        if (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)
+                or pd.api.types.is_datetime64_dtype(values)):
+            np.save(path, values.to_numpy())
+            spec[col] = ('array', str(path), None)
+        else:
+            # Strings and mixed objects travel as integer codes plus uniques
+            codes, uniques = pd.factorize(values)
+            np.save(path, codes)
+            spec[col] = ('codes', str(path), list(uniques))
+    return spec
+
+
+def _load_shard(spec: Dict, rows_path: str) -> pd.DataFrame:
+    """Rebuild one shard's DataFrame from the memory-mapped columns."""
+    rows = np.load(rows_path)
+    columns = {}
+    for col, (kind, path, uniques) in spec.items():
+        values = np.load(path, mmap_mode='r')[rows]
+        if kind == 'codes':
+            lookup = np.array(list(uniques) + [None], dtype=object)
+            values = lookup[np.where(values < 0, len(uniques), values)]
+        columns[col] = values
+    return pd.DataFrame(columns, index=rows)
+
+
+def _run_shard(spec: Dict, rows_path: str, func: Callable, kwargs: Dict) -> pd.DataFrame:
+    """Worker entry point: load a shard and apply ``func`` to it."""
+    return func(_load_shard(spec, rows_path), **kwargs)
+
+
+def run_sharded(
+    df: pd.DataFrame,
+    func: Callable,
+    site_col: str,
+    sort_by: List[str],
+    workers: int = 1,
+    n_shards: Optional[int] = None,
+    **kwargs
+) -> pd.DataFrame:
+    """Apply a per-site function over site-hash shards in a process pool.
+
+    ``func`` must be a module-level function that only needs the rows of
+    the sites it is given. Shard outputs are concatenated and sorted by
+    ``sort_by``, so the result does not depend on worker scheduling. With
+    one worker, or an empty frame, the function runs in-process on the
+    whole frame, so ``func`` must accept an empty frame.
+    """
+    logger = logging.getLogger(__name__)
+    if workers <= 1 or df.empty:
+        return (func(df, site_col=site_col, **kwargs)
+                .sort_values(sort_by, kind='mergesort')
+                .reset_index(drop=True))
+
+    n_shards = n_shards or workers * 4
+    # Shards reference rows by position, so drop any custom index first
+    df = df.reset_index(drop=True)
+    shards = shard_ids(df[site_col], n_shards)
+    kwargs = dict(kwargs, site_col=site_col)
+
+    with tempfile.TemporaryDirectory(prefix='boerne_shards_') as tmp:
+        tmp = Path(tmp)
+        spec = _export_columns(df, tmp)
+        row_files = []
+        for shard in range(n_shards):
+            rows = np.flatnonzero(shards == shard)
+            if len(rows):
+                path = tmp / f"rows{shard}.npy"
+                np.save(path, rows)
+                row_files.append(str(path))
+
+        logger.info(
+            f"Running {func.__name__} over {len(row_files)} shards "
+            f"with {workers} workers"
+        )
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                _run_shard,
+                [spec] * len(row_files),
+                row_files,
+                [func] * len(row_files),
+                [kwargs] * len(row_files)
+            ))
+
+    return (pd.concat(results)
+            .sort_values(sort_by, kind='mergesort')
+            .reset_index(drop=True))
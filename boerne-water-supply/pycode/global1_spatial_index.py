@@ -0,0 +1,122 @@
+import logging
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+# Region layers sites are assigned to: layer -> file under the data
+# directory and {source column: output column}
+REGION_LAYERS = {
+    'huc6': {
+        'path': 'huc6.geojson',
+        'columns': {'huc6': 'huc6', 'name': 'huc6_name'}
+    },
+    'huc8': {
+        'path': 'huc8.geojson',
+        'columns': {'huc8': 'huc8', 'name': 'huc8_name'}
+    },
+    'county': {
+        'path': 'county.geojson',
+        'columns': {'GEOID': 'county_fips', 'name': 'county'}
+    },
+    'watershed': {
+        'path': 'streamflow/boerne_ws_watersheds.geojson',
+        'columns': {'ws_watershed': 'ws_watershed'}
+    }
+}
+
+# Dashboard names of the Boerne supply watersheds, by HUC8
+WATERSHED_NAMES = {
+    '12100201': 'Guadalupe River',
+    '12100202': 'Guadalupe River',
+    '12100304': 'Cibolo Creek'
+}
+
+REGION_COLUMNS = [
+    col for spec in REGION_LAYERS.values() for col in spec['columns'].values()
+]
+
+
+class SpatialIndex:
+    """One STRtree over every region polygon for point-in-region lookups.
+
+    Polygons of all ``REGION_LAYERS`` share a single tree, so a batch of
+    sites is assigned to its HUC6, HUC8, county and supply watershed with
+    one vectorized query. A site on a shared boundary takes the first
+    polygon of each layer; a site outside a layer is left empty.
+    """
+
+    def __init__(self, data_dir: Union[str, Path]):
+        """Load the region layers and build the tree."""
+        self.logger = logging.getLogger(__name__)
+        self.data_dir = Path(data_dir)
+
+        # Attribute arrays are per layer; ``offsets`` is where each layer
+        # starts in the tree
+        geometries, layers, offsets = [], [], [0]
+        self.values: Dict[str, np.ndarray] = {}
+        for code, (layer, spec) in enumerate(REGION_LAYERS.items()):
+            regions = self._load_layer(layer, spec['path'])
+            geometries.append(regions.geometry.to_numpy())
+            layers.append(np.full(len(regions), code))
+            offsets.append(offsets[-1] + len(regions))
+            for source_col, out_col in spec['columns'].items():
+                self.values[out_col] = regions[source_col].astype(str).to_numpy(dtype=object)
+
+        self.geometries = np.concatenate(geometries)
+        self.layers = np.concatenate(layers)
+        self.offsets = offsets[:-1]
+        self.tree = shapely.STRtree(self.geometries)
+        # Prepared polygons make the many point tests against each one cheap
+        shapely.prepare(self.geometries)
+        self.logger.info(f"Indexed {len(self.geometries)} region polygons")
+
+    def _load_layer(self, layer: str, path: str) -> gpd.GeoDataFrame:
+        regions = gpd.read_file(self.data_dir / path).to_crs(4326)
+        if layer == 'watershed':
+            regions['ws_watershed'] = regions['HUC_8'].astype(str).map(WATERSHED_NAMES)
+            regions = regions.dropna(subset=['ws_watershed'])
+        return regions.reset_index(drop=True)
+
+    def assign(self, points: gpd.GeoSeries) -> pd.DataFrame:
+        """Region columns for every point, on the points' index."""
+        if points.crs is not None:
+            points = points.to_crs(4326)
+        # Bounding-box candidates from the tree, then an exact test of
+        # each candidate against its prepared polygon
+        geoms = points.to_numpy()
+        site_idx, region_idx = self.tree.query(geoms)
+        hit = shapely.intersects(self.geometries[region_idx], geoms[site_idx])
+        site_idx, region_idx = site_idx[hit], region_idx[hit]
+
+        result = pd.DataFrame(index=points.index, columns=REGION_COLUMNS, dtype=object)
+        for code, spec in enumerate(REGION_LAYERS.values()):
+            in_layer = self.layers[region_idx] == code
+            sites, regions = site_idx[in_layer], region_idx[in_layer]
+            # Matches come back per input point in tree order; keep the
+            # lowest polygon index so boundary sites are assigned stably
+            order = np.lexsort((regions, sites))
+            sites, regions = sites[order], regions[order]
+            sites, first = np.unique(sites, return_index=True)
+            for out_col in spec['columns'].values():
+                result.iloc[sites, result.columns.get_loc(out_col)] = (
+                    self.values[out_col][regions[first] - self.offsets[code]]
+                )
+        return result
+
+
+_INDEX_CACHE: Dict[Tuple, SpatialIndex] = {}
+
+
+def get_spatial_index(data_dir: Union[str, Path]) -> SpatialIndex:
+    """Shared index for a data directory, rebuilt when a region layer changes."""
+    data_dir = Path(data_dir)
+    key = (str(data_dir.resolve()),) + tuple(
+        (data_dir / spec['path']).stat().st_mtime_ns for spec in REGION_LAYERS.values()
+    )
+    if key not in _INDEX_CACHE:
+        _INDEX_CACHE.clear()
+        _INDEX_CACHE[key] = SpatialIndex(data_dir)
+    return _INDEX_CACHE[key]
@@ -0,0 +1,150 @@
+import warnings
+import numpy as np
+import pandas as pd
+from scipy.special import gammainc, ndtri
+from typing import Sequence, Tuple
+
+# Accumulation windows in months
+SPI_SCALES = (1, 3, 6, 12)
+
+# SPI is reported within +/- this bound (probabilities of about 1 in 1000)
+SPI_LIMIT = 3.09
+
+
+def monthly_totals(
+    df: pd.DataFrame,
+    site_col: str,
+    date_col: str,
+    value_col: str,
+    min_coverage: float = 0.8
+) -> Tuple[np.ndarray, pd.Index, pd.Period]:
+    """Monthly totals as a (site, month) array starting in January.
+
+    Months with fewer than ``min_coverage`` of their days reported are NaN.
+    Returns the array, the sites along axis 0 and the first month.
+    """
+    df = df.dropna(subset=[value_col])
+    dates = pd.to_datetime(df[date_col])
+    codes, sites = pd.factorize(df[site_col])
+
+    first = pd.Period(f"{dates.min().year}-01", freq='M')
+    n_months = (dates.max().year - first.year + 1) * 12
+    months = ((dates.dt.year - first.year) * 12 + dates.dt.month - 1).to_numpy()
+    cells = codes * n_months + months
+
+    size = len(sites) * n_months
+    totals = np.bincount(cells, weights=df[value_col].to_numpy(), minlength=size)
+    days = np.bincount(cells, minlength=size)
+    totals, days = totals.reshape(-1, n_months), days.reshape(-1, n_months)
+
+    days_in_month = pd.period_range(first, periods=n_months, freq='M').days_in_month
+    totals[days < min_coverage * days_in_month.to_numpy()] = np.nan
+    return totals, sites, first
+
+
+def window_sums(totals: np.ndarray, scale: int) -> np.ndarray:
+    """Trailing ``scale``-month sums along the last axis.
+
+    Sums come from differences of cumulative sums; a window with any
+    missing month is NaN.
+    """
+    missing = np.isnan(totals)
+    pad = [(0, 0)] * (totals.ndim - 1) + [(1, 0)]
+    cum = np.pad(np.cumsum(np.where(missing, 0, totals), axis=-1), pad)
+    cum_missing = np.pad(np.cumsum(missing, axis=-1), pad)
+
+    sums = np.full(totals.shape, np.nan)
+    sums[..., scale - 1:] = cum[..., scale:] - cum[..., :-scale]
+    gaps = np.ones(totals.shape, dtype=bool)
+    gaps[..., scale - 1:] = (cum_missing[..., scale:] - cum_missing[..., :-scale]) > 0
+    sums[gaps] = np.nan
+    return sums
+
+
+def fit_gamma(
+    samples: np.ndarray,
+    min_years: int = 10
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Gamma shape, scale and zero probability along axis -2 (years).
+
+    Shapes use Thom's maximum-likelihood approximation on the positive
+    values. Fits with fewer than ``min_years`` values are NaN.
+    """
+    valid = ~np.isnan(samples)
+    positive = valid & (samples > 0)
+    n_valid = valid.sum(axis=-2)
+    n_positive = positive.sum(axis=-2)
+
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # Sites with no positive values in a calendar month have no fit
+        warnings.simplefilter('ignore', RuntimeWarning)
+        values = np.where(positive, samples, np.nan)
+        mean = np.nanmean(values, axis=-2)
+        mean_log = np.nanmean(np.log(values), axis=-2)
+        a = np.log(mean) - mean_log
+        alpha = (1 + np.sqrt(1 + 4 * a / 3)) / (4 * a)
+        beta = mean / alpha
+        q_zero = 1 - n_positive / n_valid
+
+    unfit = (n_valid < min_years) | (n_positive < 3) | ~(a > 0)
+    alpha[unfit], beta[unfit], q_zero[unfit] = np.nan, np.nan, np.nan
+    return alpha, beta, q_zero
+
+
+def standardize(
+    sums: np.ndarray,
+    alpha: np.ndarray,
+    beta: np.ndarray,
+    q_zero: np.ndarray
+) -> np.ndarray:
+    """SPI of each value from its mixed (zero + gamma) distribution."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gamma_cdf = gammainc(alpha, np.maximum(sums, 0) / beta)
+        probability = q_zero + (1 - q_zero) * gamma_cdf
+        spi = ndtri(probability)
+    return np.clip(spi, -SPI_LIMIT, SPI_LIMIT)
+
+
+def compute_spi(
+    df: pd.DataFrame,
+    site_col: str = 'id',
+    date_col: str = 'date',
+    value_col: str = 'pcp_in',
+    scales: Sequence[int] = SPI_SCALES,
+    min_coverage: float = 0.8,
+    min_years: int = 10
+) -> pd.DataFrame:
+    """Monthly SPI at every scale for every site from daily values.
+
+    Each (site, calendar month, scale) gets its own gamma fit over all
+    years of record, computed for all sites at once on a
+    (scale, site, year, month) array.
+    """
+    totals, sites, first = monthly_totals(
+        df, site_col, date_col, value_col, min_coverage
+    )
+    n_sites, n_months = totals.shape
+    n_years = n_months // 12
+
+    sums = np.stack([window_sums(totals, scale) for scale in scales])
+    by_month = sums.reshape(len(scales), n_sites, n_years, 12)
+    alpha, beta, q_zero = fit_gamma(by_month, min_years)
+    spi = standardize(
+        by_month, alpha[:, :, None, :], beta[:, :, None, :], q_zero[:, :, None, :]
+    ).reshape(len(scales), n_sites, n_months)
+
+    periods = pd.period_range(first, periods=n_months, freq='M')
+    result = pd.DataFrame({
+        site_col: np.repeat(sites.to_numpy(), n_months),
+        'date': np.tile(periods.to_timestamp(), n_sites),
+        'year': np.tile(periods.year, n_sites),
+        'month': np.tile(periods.month, n_sites),
+        value_col: totals.ravel()
+    })
+    for i, scale in enumerate(scales):
+        result[f'spi_{scale}'] = spi[i].ravel()
+
+    # Keep months inside each site's record
+    spi_cols = [f'spi_{scale}' for scale in scales]
+    has_data = result[[value_col] + spi_cols].notna().any(axis=1)
+    return result[has_data].reset_index(drop=True)
@@ -0,0 +1,120 @@
+import os
+import math
+import logging
+import tempfile
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+from global1_sharded_stats import shard_ids
+
+# Bytes a parsed history frame takes per byte of CSV on disk, including
+# the working columns and copies a rebuild stage adds
+CSV_EXPANSION = 10
+
+# Rows sampled to estimate the average CSV row width
+WIDTH_SAMPLE_BYTES = 1 << 16
+
+
+class MemoryBudget:
+    """Chunk sizes that keep a rebuild stage under a memory ceiling."""
+
+    def __init__(self, ceiling_mb: float):
+        self.ceiling = int(ceiling_mb * 1e6)
+
+    def frame_bytes(self, paths: List[Path]) -> int:
+        """Estimated memory for the files as one processed frame."""
+        return sum(os.path.getsize(path) for path in paths) * CSV_EXPANSION
+
+    def buckets(self, paths: List[Path]) -> int:
+        """Site buckets needed for each bucket to fit the ceiling."""
+        return max(1, math.ceil(self.frame_bytes(paths) / self.ceiling))
+
+    def chunk_rows(self, path: Union[str, Path]) -> int:
+        """Raw rows read per chunk while spilling into buckets."""
+        with open(path, 'rb') as f:
+            lines = f.readlines(WIDTH_SAMPLE_BYTES)[1:]
+        width = sum(map(len, lines)) / len(lines) if lines else 1
+        return max(1000, int(self.ceiling / (width * CSV_EXPANSION)))
+
+
+def site_chunks(
+    paths: Union[str, Path, List[Union[str, Path]]],
+    site_col: str,
+    budget: Optional[MemoryBudget],
+    columns: Optional[List[str]] = None,
+    **read_kwargs
+) -> Iterator[pd.DataFrame]:
+    """Yield the rows of one or more CSVs a group of sites at a time.
+
+    Every frame holds the complete record of its sites, so per-site
+    stages (rolling windows, QA/QC, percentiles) give the same answer as
+    on the whole record. Files are read in order and each frame keeps
+    that order, so a later file's row for a key follows an earlier
+    file's. With ``columns`` every file is cut to (or padded out to)
+    those columns. Files over the budget are read in raw text chunks and
+    spilled into CRC32 site-hash bucket files in a temporary directory;
+    each bucket is then parsed with ``read_kwargs``. Files that fit, or
+    any files when ``budget`` is None, are yielded as one frame.
+    """
+    logger = logging.getLogger(__name__)
+    paths = [Path(path) for path in
+             (paths if isinstance(paths, (list, tuple)) else [paths])]
+    n_buckets = budget.buckets(paths) if budget is not None else 1
+    if n_buckets == 1:
+        frames = [pd.read_csv(path, **read_kwargs) for path in paths]
+        if columns is not None:
+            frames = [frame.reindex(columns=columns) for frame in frames]
+        yield pd.concat(frames, ignore_index=True)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='boerne_rebuild_') as tmp:
+        bucket_paths = [Path(tmp) / f"bucket{i}.csv" for i in range(n_buckets)]
+        written = set()
+        # Text is spilled as read, so buckets parse exactly like the files
+        for path in paths:
+            for chunk in pd.read_csv(path, dtype=str, keep_default_na=False,
+                                     chunksize=budget.chunk_rows(path)):
+                if columns is not None:
+                    chunk = chunk.reindex(columns=columns, fill_value='')
+                elif written and list(chunk.columns) != header:
+                    raise ValueError(f"{path.name} columns differ; pass columns")
+                header = list(chunk.columns)
+                shards = shard_ids(chunk[site_col], n_buckets)
+                for shard, part in chunk.groupby(shards):
+                    part.to_csv(bucket_paths[shard], mode='a',
+                                header=shard not in written, index=False)
+                    written.add(shard)
+
+        names = ', '.join(path.name for path in paths)
+        logger.info(f"Spilled {names} into {len(written)} site buckets")
+        for shard in sorted(written):
+            yield pd.read_csv(bucket_paths[shard], **read_kwargs)
+
+
+class FrameAccumulator:
+    """Collect per-chunk result tables into one table.
+
+    Without ``merge`` the chunks' keys must not overlap (site-complete
+    chunks) and the parts are concatenated. With ``merge``, a mapping of
+    column to a mergeable aggregation ('sum', 'min', 'max'), rows sharing
+    a key are combined, so a site split across chunks still adds up.
+    Either way the result is sorted by ``keys`` like ``run_sharded``.
+    """
+
+    def __init__(self, keys: List[str], merge: Optional[Dict[str, str]] = None):
+        self.keys = keys
+        self.merge = merge
+        self.parts: List[pd.DataFrame] = []
+
+    def add(self, df: pd.DataFrame):
+        if len(df):
+            self.parts.append(df)
+
+    def result(self) -> pd.DataFrame:
+        if not self.parts:
+            return pd.DataFrame(columns=self.keys)
+        df = pd.concat(self.parts, ignore_index=True)
+        if self.merge:
+            columns = list(df.columns)
+            df = df.groupby(self.keys, as_index=False, sort=False).agg(self.merge)[columns]
+        return df.sort_values(self.keys, kind='mergesort').reset_index(drop=True)
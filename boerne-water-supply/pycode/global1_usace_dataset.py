@@ -0,0 +1,210 @@
+import os
+import shutil
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Union
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # xlsx workbooks are skipped
+    load_workbook = None
+
+# Bulk files in the reservoir directory, in conversion order; where files
+# overlap on a reservoir-day the later file wins
+BULK_FILES = ['usace_dams_template.csv', '*_updates.csv', '*.xlsx']
+
+# Column names used across the bulk files -> dataset column
+COLUMN_ALIASES = {
+    'elev_ft': 'elev_Ft',
+    'Elev_Ft': 'elev_Ft',
+    'Storage_ACFT': 'storage_AF',
+    'OT_FT': 'OT_Ft',
+    'OT_ACFT': 'OT_AF',
+    'Name': 'name',
+    'Loc_ID': 'locid',
+    'District': 'district'
+}
+
+NUMERIC_COLUMNS = ['elev_Ft', 'storage_AF', 'fstorage_AF', 'OT_Ft', 'OT_AF', 'percentStorage']
+
+# Dataset schema; district and NIDID are the partition columns
+SCHEMA = pa.schema(
+    [('date', pa.date32()), ('name', pa.string()), ('locid', pa.string())]
+    + [(col, pa.float64()) for col in NUMERIC_COLUMNS]
+    + [('source_rank', pa.int16()), ('district', pa.string()), ('NIDID', pa.string())]
+)
+PARTITIONING = ds.partitioning(
+    pa.schema([('district', pa.string()), ('NIDID', pa.string())]), flavor='hive'
+)
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Dates from US-style strings (8/28/2015), Excel serials or ISO strings."""
+    text = values.astype(str).str.strip()
+    us = pd.to_datetime(text, format='%m/%d/%Y', errors='coerce')
+    serials = pd.to_numeric(values, errors='coerce')
+    excel = pd.to_datetime(serials, unit='D', origin='1899-12-30', errors='coerce')
+    iso = pd.to_datetime(text, format='ISO8601', errors='coerce')
+    return us.fillna(excel).fillna(iso).dt.normalize()
+
+
+class UsaceDatasetConverter:
+    """One-time conversion of the USACE district bulk files to Parquet.
+
+    The district CSVs, the dams template and the xlsx workbooks are read
+    chunk by chunk, normalized to one column set and written to a
+    hive-partitioned dataset under ``usace_dataset/district=<d>/NIDID=<id>/``,
+    so readers load only the reservoirs they need. The dataset is built
+    beside the old one and swapped in once every file has converted.
+    """
+
+    def __init__(self, reservoir_dir: Union[str, Path], chunksize: int = 50000):
+        """Set up paths and the NIDID lookup for files without district columns."""
+        self.logger = logging.getLogger(__name__)
+        self.reservoir_dir = Path(reservoir_dir)
+        self.dataset_dir = self.reservoir_dir / "usace_dataset"
+        self.chunksize = chunksize
+
+        sites = pd.read_csv(
+            self.reservoir_dir / "matchNID_LocID.csv", dtype=str,
+            usecols=['District', 'Loc_ID', 'NIDID']
+        )
+        self.sites = sites.dropna(subset=['NIDID']).drop_duplicates('NIDID').set_index('NIDID')
+
+    def bulk_files(self) -> List[Path]:
+        """Bulk files present, in conversion order."""
+        files = []
+        for pattern in BULK_FILES:
+            files += [path for path in sorted(self.reservoir_dir.glob(pattern))
+                      if path not in files]
+        return files
+
+    def _read_csv(self, path: Path) -> Iterator[pd.DataFrame]:
+        # The template carries cp1252 notes, which are not UTF-8
+        yield from pd.read_csv(path, dtype=str, encoding='latin-1', chunksize=self.chunksize)
+
+    def _read_xlsx(self, path: Path) -> Iterator[pd.DataFrame]:
+        # Cached values of the daily sheet; the hourly report sheets have
+        # no NIDID column and are skipped
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                rows = sheet.iter_rows(values_only=True)
+                header = next(rows, None)
+                if not header or 'NIDID' not in header:
+                    continue
+                columns = [str(col) if col is not None else f"column_{i}"
+                           for i, col in enumerate(header)]
+                chunk = []
+                for row in rows:
+                    chunk.append(row[:len(columns)])
+                    if len(chunk) == self.chunksize:
+                        yield pd.DataFrame(chunk, columns=columns)
+                        chunk = []
+                if chunk:
+                    yield pd.DataFrame(chunk, columns=columns)
+        finally:
+            workbook.close()
+
+    def normalize(self, chunk: pd.DataFrame, rank: int) -> pa.Table:
+        """One chunk of a bulk file in the dataset schema."""
+        df = chunk.rename(columns=COLUMN_ALIASES)
+        df['date'] = parse_dates(df['date'])
+        df['NIDID'] = df['NIDID'].astype('string').str.strip()
+        # Notes and blank rows in the template have no date or NIDID
+        df = df.dropna(subset=['date', 'NIDID'])
+
+        for col, site_col in (('district', 'District'), ('locid', 'Loc_ID')):
+            looked_up = df['NIDID'].map(self.sites[site_col])
+            df[col] = df[col].fillna(looked_up) if col in df else looked_up
+        df = df.dropna(subset=['district'])
+
+        df['date'] = df['date'].dt.date
+        df['locid'] = pd.to_numeric(df['locid'], errors='coerce').astype('Int64').astype('string')
+        df['name'] = df['name'].astype('string') if 'name' in df else pd.NA
+        for col in NUMERIC_COLUMNS:
+            # Spreadsheet errors such as #DIV/0! become missing values
+            df[col] = pd.to_numeric(df[col], errors='coerce') if col in df else np.nan
+        df['source_rank'] = rank
+
+        return pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+    def convert(self) -> int:
+        """Rebuild the dataset from every bulk file; returns the rows written."""
+        tmp_dir = self.dataset_dir.with_name(self.dataset_dir.name + '.tmp')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            total = 0
+            for rank, path in enumerate(self.bulk_files()):
+                if path.suffix == '.xlsx' and load_workbook is None:
+                    self.logger.warning(f"openpyxl is not installed; skipping {path.name}")
+                    continue
+                reader = self._read_xlsx if path.suffix == '.xlsx' else self._read_csv
+
+                rows = 0
+                for number, chunk in enumerate(reader(path)):
+                    table = self.normalize(chunk, rank)
+                    if table.num_rows == 0:
+                        continue
+                    ds.write_dataset(
+                        table, tmp_dir, format='parquet', partitioning=PARTITIONING,
+                        basename_template=f"{path.stem}-{number}-{{i}}.parquet",
+                        existing_data_behavior='overwrite_or_ignore'
+                    )
+                    rows += table.num_rows
+                self.logger.info(f"Converted {rows} rows from {path.name}")
+                total += rows
+
+            shutil.rmtree(self.dataset_dir, ignore_errors=True)
+            os.replace(tmp_dir, self.dataset_dir)
+            self.logger.info(f"Wrote {total} rows to {self.dataset_dir}")
+            return total
+
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            self.logger.error(f"Error converting USACE bulk files: {e}")
+            raise
+
+
+def read_usace_dataset(
+    dataset_dir: Union[str, Path],
+    districts: Optional[Iterable[str]] = None,
+    nidids: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """Daily rows from the partitions of ``districts`` and ``nidids`` only.
+
+    A reservoir-day found in several bulk files keeps the later file's row.
+    """
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning=PARTITIONING)
+    condition = None
+    for field, values in (('district', districts), ('NIDID', nidids)):
+        if values is not None:
+            selected = ds.field(field).isin(list(values))
+            condition = selected if condition is None else condition & selected
+
+    df = dataset.to_table(filter=condition).to_pandas()
+    df['date'] = pd.to_datetime(df['date'])
+    return (df.sort_values(['NIDID', 'date', 'source_rank'])
+            .drop_duplicates(['NIDID', 'date'], keep='last')
+            .drop(columns='source_rank')
+            .reset_index(drop=True))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the USACE district bulk files to a partitioned dataset."
+    )
+    parser.add_argument('--reservoir-dir', default='boerne-water-supply/data/reservoirs/')
+    parser.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    UsaceDatasetConverter(args.reservoir_dir, args.chunksize).convert()
@@ -0,0 +1,302 @@
+import json
+import sqlite3
+import logging
+import pandas as pd
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Union
+from global1_output_writer import write_csv
+
+# Columns indexed on every table that has them
+INDEXED_COLUMNS = ['site', 'site_id', 'NIDID', 'pwsid', 'id', 'date']
+
+# Published water-quality columns (the table adds a 'sample_copy' key)
+QUALITY_COLUMNS = [
+    'site_id', 'name', 'basin', 'county', 'latitude', 'longitude',
+    'stream_segment', 'date', 'sample_depth', 'flow_severity', 'pH',
+    'conductivity', 'dissolved_oxygen', 'air_temp', 'water_temp', 'ecoli_avg',
+    'secchi_disk_transparency', 'nitrate_nitrogen', 'year'
+]
+
+# Published daily streamflow record (the table adds working columns)
+STREAMFLOW_COLUMNS = ['site', 'date', 'julian', 'flow', 'source']
+
+# Tables whose 'date' column is published as text, as R writes quality dates
+TEXT_DATE_TABLES = {'quality_observations'}
+
+# Published files regenerated from the warehouse: file -> (table, columns)
+CSV_EXPORTS = {
+    'streamflow/all_stream_data.csv': ('streamflow_observations', STREAMFLOW_COLUMNS),
+    'streamflow/all_stream_stats.csv': ('streamflow_stats', None),
+    'gw/all_gw_depth.csv': ('groundwater_observations', None),
+    'gw/all_gw_stats.csv': ('groundwater_stats', None),
+    'reservoirs/usace_dams.csv': ('reservoirs_observations', None),
+    'quality/all_water_quality.csv': ('quality_observations', QUALITY_COLUMNS),
+    'demand/all_demand_by_source.csv': ('demand_observations', None)
+}
+GEOJSON_EXPORTS = {
+    'streamflow/all_stream_gauge_sites.geojson': 'streamflow_current',
+    'gw/all_gw_sites.geojson': 'groundwater_current'
+}
+
+
+class Warehouse:
+    """Optional embedded SQLite store shared by every processor.
+
+    Each domain keeps ``<domain>_observations``, ``<domain>_stats``,
+    ``<domain>_current`` and ``<domain>_sites`` tables. Rows are bulk
+    upserted on their natural keys, with indexes on site and date columns,
+    so the next run can load history from here instead of parsing CSVs.
+    Point tables store geometry as ``longitude``/``latitude`` columns.
+    A missing key value is a key value of its own: the unique key treats
+    NULL as equal to NULL, so such rows are stored and upserted like any
+    other instead of being dropped.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Open (or create) the warehouse file."""
+        self.path = Path(path)
+        self.logger = logging.getLogger(__name__)
+        # Autocommit; every write goes through an explicit transaction()
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._depth = 0
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed writes, table changes included, all or nothing.
+
+        Nested blocks join the outermost one, so a caller can group several
+        upserts and replaces into one commit.
+        """
+        if self._depth == 0:
+            self.conn.execute("BEGIN IMMEDIATE")
+        self._depth += 1
+        try:
+            yield self.conn
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("ROLLBACK")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.execute("COMMIT")
+
+    @staticmethod
+    def _key_terms(keys: List[str]) -> str:
+        """Unique key expression; NULLs map to a sentinel so they match."""
+        return ', '.join(f"IFNULL(\"{k}\", '')" for k in keys)
+
+    @staticmethod
+    def _sql_type(dtype) -> str:
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+            return 'INTEGER'
+        if pd.api.types.is_float_dtype(dtype):
+            return 'REAL'
+        return 'TEXT'
+
+    @staticmethod
+    def _to_sql_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """Convert dates, geometry and nested values to SQLite-friendly columns."""
+        # SQLite column names ignore case
+        folded = pd.Index(df.columns).str.lower()
+        if folded.duplicated().any():
+            clashing = list(df.columns[folded.duplicated(keep=False)])
+            raise ValueError(f"Columns differ only in case: {clashing}")
+        df = df.copy()
+        if 'geometry' in df.columns:
+            geometry = df.pop('geometry')
+            df['longitude'] = [g.x if g is not None else None for g in geometry]
+            df['latitude'] = [g.y if g is not None else None for g in geometry]
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = df[col].dt.strftime('%Y-%m-%d')
+            elif df[col].dtype == object:
+                df[col] = df[col].map(
+                    lambda v: json.dumps(v) if isinstance(v, (list, dict)) else v
+                )
+        return df
+
+    def has_table(self, table: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+        ).fetchone()
+        return row is not None
+
+    def _columns(self, table: str) -> List[str]:
+        return [row[1] for row in self.conn.execute(f'PRAGMA table_info("{table}")')]
+
+    def _ensure_key(self, table: str, keys: List[str]):
+        """(Re)create the unique key index when it differs from ``keys``."""
+        sql = f'CREATE UNIQUE INDEX "{table}_key" ON "{table}" ({self._key_terms(keys)})'
+        row = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type='index' AND name=?",
+            (f"{table}_key",)
+        ).fetchone()
+        if row is not None and row[0] == sql:
+            return
+        if row is not None:
+            self.conn.execute(f'DROP INDEX "{table}_key"')
+        self.conn.execute(sql)
+
+    def _ensure_table(self, table: str, df: pd.DataFrame, keys: List[str]):
+        """Create the table and indexes, adding any new columns."""
+        if not self.has_table(table):
+            columns = ', '.join(
+                f'"{col}" {self._sql_type(df[col].dtype)}' for col in df.columns
+            )
+            self.conn.execute(f'CREATE TABLE "{table}" ({columns})')
+            self._ensure_key(table, keys)
+            for col in INDEXED_COLUMNS:
+                if col in df.columns and [col] != keys:
+                    self.conn.execute(
+                        f'CREATE INDEX "{table}_{col}" ON "{table}" ("{col}")'
+                    )
+            return
+
+        existing = {col.lower() for col in self._columns(table)}
+        for col in df.columns:
+            if col.lower() not in existing:
+                self.conn.execute(
+                    f'ALTER TABLE "{table}" ADD COLUMN "{col}" '
+                    f'{self._sql_type(df[col].dtype)}'
+                )
+        self._ensure_key(table, keys)
+
+    def _write_rows(self, table: str, df: pd.DataFrame, keys: List[str]):
+        """Insert rows, updating existing rows with the same keys."""
+        # Later copies of a key win, as they would row by row
+        df = self._to_sql_frame(df).drop_duplicates(subset=keys, keep='last')
+        self._ensure_table(table, df, keys)
+        columns = ', '.join(f'"{col}"' for col in df.columns)
+        placeholders = ', '.join('?' for _ in df.columns)
+        updates = ', '.join(
+            f'"{col}"=excluded."{col}"' for col in df.columns if col not in keys
+        )
+        action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        rows = df.astype(object).where(pd.notna(df), None).itertuples(
+            index=False, name=None
+        )
+        self.conn.executemany(
+            f'INSERT INTO "{table}" ({columns}) VALUES ({placeholders}) '
+            f'ON CONFLICT({self._key_terms(keys)}) {action}',
+            rows
+        )
+        return len(df)
+
+    def upsert(self, table: str, df: pd.DataFrame, keys: List[str]):
+        """Bulk insert rows, updating existing rows with the same keys."""
+        try:
+            if df.empty:
+                return
+            with self.transaction():
+                written = self._write_rows(table, df, keys)
+            self.logger.info(f"Upserted {written} rows into {table}")
+
+        except Exception as e:
+            self.logger.error(f"Error upserting into {table}: {e}")
+            raise
+
+    def replace(self, table: str, df: pd.DataFrame, keys: List[str]):
+        """Replace the contents of a table that is fully recomputed each run.
+
+        The delete and the insert commit together, so a failed write leaves
+        the previous contents in place.
+        """
+        try:
+            with self.transaction():
+                self.clear(table)
+                written = self._write_rows(table, df, keys) if len(df) else 0
+            self.logger.info(f"Replaced {table} with {written} rows")
+
+        except Exception as e:
+            self.logger.error(f"Error replacing {table}: {e}")
+            raise
+
+    def clear(self, table: str):
+        """Delete every row of a table, if it exists."""
+        with self.transaction():
+            if self.has_table(table):
+                self.conn.execute(f'DELETE FROM "{table}"')
+
+    def load(self, table: str, where: Optional[Dict] = None,
+             parse_dates: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read a table (optionally filtered by equality on columns)."""
+        try:
+            query = f'SELECT * FROM "{table}"'
+            params = []
+            if where:
+                query += ' WHERE ' + ' AND '.join(f'"{col}" = ?' for col in where)
+                params = list(where.values())
+            return pd.read_sql_query(query, self.conn, params=params,
+                                     parse_dates=parse_dates)
+        except Exception as e:
+            self.logger.error(f"Error loading {table}: {e}")
+            raise
+
+    def export_csv(self, table: str, path: Union[str, Path],
+                   columns: Optional[List[str]] = None):
+        """Write a table out as a published CSV."""
+        dates = None
+        if 'date' in self._columns(table) and table not in TEXT_DATE_TABLES:
+            dates = ['date']
+        df = self.load(table, parse_dates=dates)
+        if columns is not None:
+            df = df[columns]
+        write_csv(df, path)
+
+    def export_geojson(self, table: str, path: Union[str, Path]):
+        """Write a point table out as a published GeoJSON FeatureCollection."""
+        df = self.load(table)
+        properties = df.drop(columns=['longitude', 'latitude'])
+        features = [
+            {
+                'type': 'Feature',
+                'properties': props,
+                'geometry': {'type': 'Point', 'coordinates': [lon, lat]}
+            }
+            for props, lon, lat in zip(
+                json.loads(properties.to_json(orient='records')),
+                df['longitude'], df['latitude']
+            )
+        ]
+        with open(path, 'w') as f:
+            json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+    def publish(self, data_dir: Union[str, Path], domain: Optional[str] = None):
+        """Regenerate published CSV and GeoJSON files from the store.
+        
+        Processors publish through ``OutputWriter`` only; this restores
+        the files from the warehouse alone when run as a script.
+        """
+        try:
+            data_dir = Path(data_dir)
+            prefix = f"{domain}_" if domain else ''
+            for filename, (table, columns) in CSV_EXPORTS.items():
+                if table.startswith(prefix) and self.has_table(table):
+                    self.export_csv(table, data_dir / filename, columns)
+            for filename, table in GEOJSON_EXPORTS.items():
+                if (table.startswith(prefix) and self.has_table(table)
+                        and 'longitude' in self._columns(table)):
+                    self.export_geojson(table, data_dir / filename)
+            self.logger.info(f"Published {domain or 'all'} warehouse exports")
+
+        except Exception as e:
+            self.logger.error(f"Error publishing warehouse exports: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    data_dir = Path("boerne-water-supply/data/")
+    warehouse = Warehouse(data_dir / "warehouse.sqlite")
+    warehouse.publish(data_dir)
+    warehouse.close()
@@ -0,0 +1,99 @@
+import os
+import json
+import logging
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+# Site key of entries that describe a whole source, such as a workbook
+SOURCE_KEY = '*'
+
+
+class WatermarkCatalog:
+    """Per-source, per-site high-water marks that bound each fetch.
+
+    For every source the catalog keeps, per site, the last complete date
+    ingested (``last_date``) and the last revision seen (``revision``, such
+    as a workbook's modified time), plus any source-specific position such
+    as the last sheet row read. Each source lives in its own
+    ``watermarks/<source>.json``, so processors running side by side never
+    rewrite each other's marks. Processors update their source only after
+    a successful save; a failed run refetches the same window next time.
+    """
+
+    def __init__(self, catalog_dir: Union[str, Path]):
+        self.logger = logging.getLogger(__name__)
+        self.catalog_dir = Path(catalog_dir)
+        self._marks: Dict[str, Dict[str, Dict]] = {}
+
+    def _path(self, source: str) -> Path:
+        return self.catalog_dir / f"{source}.json"
+
+    def marks(self, source: str) -> Dict[str, Dict]:
+        """Every site entry of a source."""
+        if source not in self._marks:
+            path = self._path(source)
+            self._marks[source] = json.loads(path.read_text()) if path.exists() else {}
+        return self._marks[source]
+
+    def get(self, source: str, site: str = SOURCE_KEY) -> Dict:
+        """One site's entry, empty when the site has no mark yet."""
+        return self.marks(source).get(str(site), {})
+
+    def last_date(self, source: str, site: str = SOURCE_KEY) -> Optional[pd.Timestamp]:
+        last_date = self.get(source, site).get('last_date')
+        return pd.Timestamp(last_date) if last_date else None
+
+    def revision(self, source: str, site: str = SOURCE_KEY) -> Optional[str]:
+        return self.get(source, site).get('revision')
+
+    def fetch_start(self, source: str, site: str,
+                    overlap_days: int = 0) -> Optional[pd.Timestamp]:
+        """First date to request for a site, or None without a mark.
+
+        That is the day after the mark, moved back ``overlap_days`` to pick
+        up provisional values the source may since have revised.
+        """
+        last_date = self.last_date(source, site)
+        if last_date is None:
+            return None
+        return last_date + pd.Timedelta(days=1 - overlap_days)
+
+    def update(self, source: str, entries: Dict[str, Dict]):
+        """Merge site entries into a source and persist it atomically."""
+        try:
+            marks = self.marks(source)
+            stamp = datetime.now().isoformat(timespec='seconds')
+            for site, entry in entries.items():
+                marks[str(site)] = dict(marks.get(str(site), {}), **entry, updated=stamp)
+
+            self.catalog_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(source)
+            tmp_path = path.with_name(path.name + '.tmp')
+            tmp_path.write_text(json.dumps(marks, indent=2, sort_keys=True))
+            os.replace(tmp_path, path)
+            self.logger.info(f"Updated {len(entries)} {source} watermarks")
+
+        except Exception as e:
+            self.logger.error(f"Error saving {source} watermarks: {e}")
+            raise
+
+    def update_dates(self, source: str, df: pd.DataFrame, site_col: str,
+                     date_col: str = 'date', **fields):
+        """Mark each site's latest date in ``df``, with any extra ``fields``.
+
+        Marks only move forward, so re-fetched overlap rows never pull a
+        site's mark back.
+        """
+        if df.empty:
+            return
+        latest = pd.to_datetime(df[date_col]).groupby(df[site_col].astype(str)).max()
+        entries = {}
+        for site, last_date in latest.dropna().items():
+            previous = self.last_date(source, site)
+            if previous is not None and previous > last_date:
+                last_date = previous
+            entries[site] = dict(fields, last_date=last_date.strftime('%Y-%m-%d'))
+        if entries:
+            self.update(source, entries)
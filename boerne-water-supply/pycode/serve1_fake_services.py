@@ -0,0 +1,524 @@
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+from typing import Dict, List, Optional, Tuple
+
+# Workbooks the processors open: spreadsheet id -> synthetic workbook kind
+WORKBOOKS = {
+    '1QoaOhrpz6vrSMBc0yc5-i7nhwj2lmsBHZFYOBJc0KVU': 'wells',
+    '1JAQLzSpbU2nMVb4Pe1XUA2lxU3a1XcY4oUYS8UhIaiA': 'quality'
+}
+
+# Row 2 of every well worksheet; the groundwater processor reads
+# longitude, latitude and state number by position (1, 2 and 14)
+WELL_HEADER = [
+    'Location', 'Long_Va', 'Lat_Va', 'Elevation', 'Elevation_at_MP', 'Total_Depth',
+    'Casing_Diameter', 'Casing_Type', 'Casing_Depth', 'Cemented', 'Estimated_GPM',
+    'Aquifer', 'Strata', 'District_ID', 'State_Number', 'Avg_Level', 'Median_Level',
+    'Low', 'High', 'Range', 'Yrs_In_Service', 'Current', 'Month', 'Year'
+]
+
+QUALITY_HEADER = [
+    'Name', 'Description', 'Basin', 'County', 'Latitude', 'Longitude',
+    'TCEQ Stream Segment', 'Sample Date', 'Sample Depth (m)', 'Flow Severity',
+    'pH', 'Conductivity (µs/cm)', 'Dissolved Oxygent (mg/L)', 'Air Temperature (°C)',
+    'Water Temperature (°C)', 'E. Coli Average', 'Secchi Disk Transparency (m)',
+    'Nitrate-Nitrogen (ppm or mg/L)'
+]
+
+# Base record counts at payload_scale 1
+WELL_ROWS = 520
+IV_MINUTES = 15
+USACE_MINUTES = 60
+
+_A1 = re.compile(
+    r"^(?:(?P<sheet>'(?:[^']|'')*'|[^!]+)!)?"
+    r"(?P<c1>[A-Z]*)(?P<r1>\d*)(?::(?P<c2>[A-Z]*)(?P<r2>\d*))?$"
+)
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+class FakeServices:
+    """Local stand-ins for NWIS, USACE CWMS and the Google Sheets/Drive APIs.
+
+    Responses follow the JSON shapes the processors parse: WaterML-JSON
+    from ``/nwis/dv/`` and ``/nwis/iv/``, CWMS reports from ``/a2w/``, and
+    Sheets v4 / Drive v3 documents for the groundwater and water quality
+    workbooks. A file in ``recordings`` (``nwis/<dv|iv>_<sites>.json``,
+    ``usace/<location id>.json`` or ``sheets/<spreadsheet id>.json``)
+    is served in place of the synthetic response. Synthetic values are
+    deterministic for a seed; ``payload_scale`` multiplies the records per
+    response, and every request waits ``latency`` plus up to ``jitter``
+    seconds and fails with a 503 at ``error_rate``. Workbooks gain rows
+    and a new revision time on each ``advance()``.
+    """
+
+    def __init__(
+        self,
+        data_dir: Optional[Path] = None,
+        recordings: Optional[Path] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        payload_scale: float = 1.0,
+        seed: int = 0
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.recordings = Path(recordings) if recordings else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.payload_scale = payload_scale
+        self.seed = seed
+
+        self.started = datetime.now(timezone.utc).replace(microsecond=0)
+        self.revision = 0
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._workbooks: Dict[Tuple[str, int], Dict] = {}
+
+        self.wells, self.quality_sites = self._load_registries(data_dir)
+        self.server = None
+
+    def _load_registries(self, data_dir: Optional[Path]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Wells and quality sites to synthesize, from the data directory if given."""
+        wells = quality = None
+        if data_dir is not None and (Path(data_dir) / "gw/well_metadata.csv").exists():
+            wells = pd.read_csv(Path(data_dir) / "gw/well_metadata.csv").dropna(subset=['state_id'])
+            wells = wells.drop_duplicates('state_id').head(42)
+        if wells is None or len(wells) < 42:
+            rng = self._rng('wells')
+            wells = pd.DataFrame({
+                'location': [f"Well {n}" for n in range(42)],
+                'dec_long_va': rng.uniform(-98.9, -98.5, 42),
+                'dec_lat_va': rng.uniform(29.7, 30.0, 42),
+                'elevation': rng.uniform(1200, 2000, 42).round(),
+                'state_id': np.arange(6800000, 6800042)
+            })
+
+        path = None if data_dir is None else Path(data_dir) / "quality/water_quality_sites.geojson"
+        if path is not None and path.exists():
+            features = json.loads(path.read_text())['features']
+            quality = pd.DataFrame([feature['properties'] for feature in features])
+        if quality is None or quality.empty:
+            quality = pd.DataFrame({
+                'site_id': [12600, 15126, 20823], 'name': ['Site A', 'Site B', 'Site C'],
+                'basin': 'Guadalupe', 'county': 'Kendall',
+                'latitude': [29.9, 29.8, 29.85], 'longitude': [-98.3, -98.7, -98.5]
+            })
+        return wells.reset_index(drop=True), quality
+
+    def _rng(self, *key) -> np.random.Generator:
+        digest = hashlib.sha1(repr((self.seed,) + key).encode()).hexdigest()
+        return np.random.default_rng(int(digest[:12], 16))
+
+    def advance(self):
+        """Publish a new revision: workbooks gain rows and a new modified time."""
+        with self._lock:
+            self.revision += 1
+            self._workbooks.clear()
+
+    def modified_time(self) -> str:
+        stamp = self.started + timedelta(hours=self.revision)
+        return stamp.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+    # Request handling
+
+    def handle(self, path: str) -> Tuple[int, bytes, str]:
+        """Status, body and service name for a GET request path."""
+        url = urlparse(path)
+        # Only batchGet repeats a parameter ('ranges')
+        params = {key: values if key == 'ranges' else values[-1]
+                  for key, values in parse_qs(url.query).items()}
+        route = unquote(url.path)
+
+        service, respond = self._route(route)
+        if self.latency or self.jitter:
+            with self._lock:
+                wait = self.latency + self._random.uniform(0, self.jitter)
+            time.sleep(wait)
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+
+        if respond is None:
+            code, payload = 404, {'error': {'code': 404, 'message': f"Unknown route {route}"}}
+        elif failed:
+            code, payload = 503, {'error': {'code': 503, 'message': "Injected failure"}}
+        else:
+            try:
+                code, payload = respond(route, params)
+            except (KeyError, ValueError) as e:
+                code, payload = 400, {'error': {'code': 400, 'message': str(e)}}
+
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        with self._lock:
+            stats = self.stats.setdefault(service, {'requests': 0, 'errors': 0, 'bytes': 0})
+            stats['requests'] += 1
+            stats['errors'] += int(code >= 400)
+            stats['bytes'] += len(body)
+        return code, body, service
+
+    def _route(self, route: str):
+        if route.startswith('/nwis/'):
+            return 'nwis', self._nwis
+        if route.startswith('/a2w/'):
+            return 'usace', self._usace
+        match = re.match(r'^/(?:v4/spreadsheets|drive/v3/files)/([^/:]+)', route)
+        if match:
+            kind = WORKBOOKS.get(match.group(1), match.group(1))
+            if route.startswith('/drive/'):
+                return f"sheets:{kind}", self._drive
+            return f"sheets:{kind}", self._sheets
+        return 'unknown', None
+
+    def _recorded(self, service: str, key: str) -> Optional[bytes]:
+        if self.recordings is None:
+            return None
+        path = self.recordings / service / f"{key}.json"
+        return path.read_bytes() if path.exists() else None
+
+    # NWIS
+
+    def _flow(self, site: str, times: pd.DatetimeIndex) -> np.ndarray:
+        """Smooth seasonal flow with a site-specific base and phase."""
+        base, phase, wiggle = self._rng('flow', site).uniform([1, 0, 0.1], [500, 365, 0.5])
+        days = times.to_julian_date().to_numpy()
+        flow = base * np.exp(0.8 * np.sin(2 * np.pi * (days + phase) / 365.25)
+                             + wiggle * np.sin(days * 0.37 + phase))
+        return flow.round(2)
+
+    def _nwis(self, route: str, params: Dict[str, str]) -> Tuple[int, object]:
+        kind = 'iv' if route.startswith('/nwis/iv') else 'dv'
+        sites = params['sites'].split(',')
+        recorded = self._recorded('nwis', f"{kind}_{'_'.join(sites)}")
+        if recorded is not None:
+            return 200, recorded
+
+        today = pd.Timestamp(date.today())
+        start = pd.Timestamp(params.get('startDT', today - pd.Timedelta(days=1)))
+        if kind == 'dv':
+            # Daily values are published through yesterday
+            end = min(pd.Timestamp(params.get('endDT', today)), today - pd.Timedelta(days=1))
+            times = pd.date_range(start, end, freq='D')
+            stat, fmt = '00003', '%Y-%m-%dT00:00:00.000'
+        else:
+            minutes = max(int(IV_MINUTES / self.payload_scale), 1)
+            end = pd.Timestamp.now().floor(f'{minutes}min')
+            times = pd.date_range(start, end, freq=f'{minutes}min')
+            stat, fmt = None, '%Y-%m-%dT%H:%M:00.000-06:00'
+
+        provisional_after = today - pd.Timedelta(days=120)
+        series = []
+        for site in sites:
+            flows = self._flow(site, times)
+            points = [
+                {'value': f"{flow:g}",
+                 'qualifiers': ['P'] if when > provisional_after else ['A'],
+                 'dateTime': when.strftime(fmt)}
+                for when, flow in zip(times, flows)
+            ]
+            series.append({
+                'sourceInfo': {'siteName': f"Gauge {site}",
+                               'siteCode': [{'value': site, 'network': 'NWIS',
+                                             'agencyCode': 'USGS'}]},
+                'variable': {'variableCode': [{'value': params.get('parameterCd', '00060')}],
+                             'variableName': "Streamflow, ft&#179;/s",
+                             'unit': {'unitCode': 'ft3/s'},
+                             'noDataValue': -999999.0},
+                'values': [{'value': points, 'qualifier': [], 'method': [{'methodID': 1}]}],
+                'name': ':'.join(filter(None, ['USGS', site, '00060', stat]))
+            })
+        return 200, {'name': 'ns1:timeSeriesResponseType',
+                     'value': {'queryInfo': {'queryURL': route}, 'timeSeries': series}}
+
+    # USACE CWMS
+
+    def _usace(self, route: str, params: Dict[str, str]) -> Tuple[int, object]:
+        location = params['p_location_id']
+        recorded = self._recorded('usace', location)
+        if recorded is not None:
+            return 200, recorded
+
+        unit = {'weeks': 7, 'days': 1}[params.get('p_last_unit', 'weeks')]
+        minutes = max(int(USACE_MINUTES / self.payload_scale), 1)
+        end = pd.Timestamp.now().floor(f'{minutes}min')
+        times = pd.date_range(end - pd.Timedelta(days=int(params.get('p_last', 2)) * unit),
+                              end, freq=f'{minutes}min')
+
+        pool, depth, phase = self._rng('usace', location).uniform([400, 20, 0], [1000, 80, 365])
+        days = times.to_julian_date().to_numpy()
+        elevation = pool - 0.1 * depth * (1 + np.sin(2 * np.pi * (days + phase) / 365.25))
+        storage = 1000 * depth * (elevation - pool + depth)
+        flood = np.maximum(storage - 1000 * depth * depth, 0)
+
+        def series(description: str, values: np.ndarray) -> Dict:
+            return {'variable': {'variableDescription': description},
+                    'values': [{'value': [
+                        {'dateTime': when.strftime('%Y-%m-%dT%H:%M:%S'), 'value': f"{value:.0f}"}
+                        for when, value in zip(times, values)
+                    ]}]}
+
+        return 200, {
+            'Elev': [[{'time': when.strftime('%d-%b-%Y %H:%M'), 'value': round(float(value), 2)}
+                      for when, value in zip(times, elevation)]],
+            'value': {'timeSeries': [series('Conservation Storage (ac-ft)', storage),
+                                     series('Flood Storage (ac-ft)', flood)]}
+        }
+
+    # Google Sheets and Drive
+
+    def _workbook(self, spreadsheet_id: str) -> Optional[Dict]:
+        """Workbook as {'title', 'sheets': [{'title', 'values'}]} for this revision."""
+        key = (spreadsheet_id, self.revision)
+        with self._lock:
+            if key in self._workbooks:
+                return self._workbooks[key]
+
+        recorded = self._recorded('sheets', spreadsheet_id)
+        if recorded is not None:
+            workbook = json.loads(recorded)
+        elif WORKBOOKS.get(spreadsheet_id) == 'wells':
+            workbook = self._wells_workbook()
+        elif WORKBOOKS.get(spreadsheet_id) == 'quality':
+            workbook = self._quality_workbook()
+        else:
+            return None
+
+        with self._lock:
+            self._workbooks[key] = workbook
+        return workbook
+
+    def _wells_workbook(self) -> Dict:
+        """One worksheet per well: metadata in rows 2-3, readings from row 7."""
+        n_rows = int(WELL_ROWS * self.payload_scale) + self.revision
+        last = pd.Timestamp(date.today()) + pd.Timedelta(days=7 * self.revision)
+        dates = pd.date_range(end=last, periods=n_rows, freq='7D')
+        days = dates.to_julian_date().to_numpy()
+
+        sheets = []
+        for _, well in self.wells.iterrows():
+            site = str(int(well['state_id']))
+            base, swing, phase = self._rng('well', site).uniform([30, 2, 0], [400, 25, 365])
+            depth = (base + swing * np.sin(2 * np.pi * (days + phase) / 365.25)).round(2)
+            metadata = [well.get('location', site), well['dec_long_va'], well['dec_lat_va'],
+                        well.get('elevation', 1500)] + [''] * 10 + [int(well['state_id'])]
+            rows = [[f"Well {site}"], WELL_HEADER, metadata, [], [], ['Date', 'Depth', 'Elevation']]
+            elevation = float(well.get('elevation', 1500))
+            rows += [[when.strftime('%Y-%m-%d'), float(value), round(elevation - value, 2)]
+                     for when, value in zip(dates, depth)]
+            sheets.append({'title': site, 'values': rows})
+        return {'title': 'Well levels', 'sheets': sheets}
+
+    def _quality_workbook(self) -> Dict:
+        """One worksheet of monthly samples per site, newest revision last."""
+        n_months = int(12 * 5 * self.payload_scale)
+        months = pd.date_range(end=pd.Timestamp(date.today()), periods=n_months, freq='MS')
+        rows = [QUALITY_HEADER]
+        for _, site in self.quality_sites.iterrows():
+            site_id = int(float(site['site_id']))
+            rng = self._rng('quality', site_id)
+            for month in months:
+                rows.append(self._sample(site, site_id, month + pd.Timedelta(days=14), rng))
+        # Each revision appends one more sample per site
+        for step in range(1, self.revision + 1):
+            for _, site in self.quality_sites.iterrows():
+                site_id = int(float(site['site_id']))
+                rng = self._rng('quality', site_id, step)
+                rows.append(self._sample(site, site_id, months[-1] + pd.Timedelta(days=14 + step), rng))
+        return {'title': 'Water quality', 'sheets': [{'title': 'Data', 'values': rows}]}
+
+    @staticmethod
+    def _sample(site: pd.Series, site_id: int, when: pd.Timestamp,
+                rng: np.random.Generator) -> List:
+        return [
+            site_id, site.get('name', ''), site.get('basin', ''), site.get('county', ''),
+            site.get('latitude', ''), site.get('longitude', ''), 1805,
+            when.strftime('%Y-%m-%d'), 0.3, rng.choice(['Low', 'Normal', 'High']),
+            round(rng.uniform(6.8, 8.6), 1), round(rng.uniform(300, 700)),
+            round(rng.uniform(4, 11), 1), round(rng.uniform(5, 35), 1),
+            round(rng.uniform(10, 32), 1), round(rng.uniform(1, 400)),
+            round(rng.uniform(0.2, 2), 2), round(rng.uniform(0, 3), 2)
+        ]
+
+    def _drive(self, route: str, params: Dict[str, str]) -> Tuple[int, object]:
+        spreadsheet_id = route.split('/')[4]
+        workbook = self._workbook(spreadsheet_id)
+        if workbook is None:
+            return 404, {'error': {'code': 404, 'message': f"File not found: {spreadsheet_id}"}}
+        return 200, {'id': spreadsheet_id, 'name': workbook['title'],
+                     'modifiedTime': workbook.get('modifiedTime', self.modified_time())}
+
+    def _sheets(self, route: str, params: Dict[str, str]) -> Tuple[int, object]:
+        parts = route.split('/')
+        spreadsheet_id = parts[3].split(':')[0]
+        workbook = self._workbook(spreadsheet_id)
+        if workbook is None:
+            return 404, {'error': {'code': 404,
+                                   'message': f"Requested entity was not found: {spreadsheet_id}"}}
+
+        if len(parts) == 4 and ':' not in parts[3]:
+            return 200, self._spreadsheet(spreadsheet_id, workbook)
+        if len(parts) == 6 and parts[4] == 'values':
+            return 200, self._values(workbook, parts[5], params)
+        if parts[3].endswith(':batchGet') or parts[-1] == 'values:batchGet':
+            ranges = params.get('ranges', [])
+            return 200, {'spreadsheetId': spreadsheet_id,
+                         'valueRanges': [self._values(workbook, r, params) for r in ranges]}
+        raise ValueError(f"Unsupported Sheets request {route}")
+
+    @staticmethod
+    def _spreadsheet(spreadsheet_id: str, workbook: Dict) -> Dict:
+        return {
+            'spreadsheetId': spreadsheet_id,
+            'properties': {'title': workbook['title'], 'locale': 'en_US',
+                           'timeZone': 'America/Chicago',
+                           'defaultFormat': {'verticalAlignment': 'BOTTOM',
+                                             'wrapStrategy': 'OVERFLOW_CELL'}},
+            'sheets': [
+                {'properties': {
+                    'sheetId': index, 'title': sheet['title'], 'index': index,
+                    'sheetType': 'GRID',
+                    'gridProperties': {
+                        'rowCount': max(len(sheet['values']), 1),
+                        'columnCount': max([len(row) for row in sheet['values']] + [1])
+                    }
+                }}
+                for index, sheet in enumerate(workbook['sheets'])
+            ],
+            'namedRanges': []
+        }
+
+    @staticmethod
+    def _values(workbook: Dict, a1_range: str, params: Dict[str, str]) -> Dict:
+        """A values.get response for an A1 range, trimmed like the real API."""
+        match = _A1.match(a1_range)
+        if match is None:
+            raise ValueError(f"Unable to parse range: {a1_range}")
+        title = match.group('sheet')
+        sheets = workbook['sheets']
+        if title:
+            title = title.strip("'").replace("''", "'")
+            sheet = next((s for s in sheets if s['title'] == title), None)
+            if sheet is None:
+                raise ValueError(f"Unable to parse range: {a1_range}")
+        else:
+            sheet = sheets[0]
+        values = sheet['values']
+
+        c1, r1, c2, r2 = match.group('c1', 'r1', 'c2', 'r2')
+        single = match.group('c2') is None and match.group('r2') is None
+        col0 = _column_index(c1) if c1 else 0
+        row0 = int(r1) - 1 if r1 else 0
+        col1 = col0 if single else (_column_index(c2) if c2 else 10 ** 6)
+        row1 = row0 if single else (int(r2) - 1 if r2 else len(values) - 1)
+
+        formatted = params.get('valueRenderOption', 'FORMATTED_VALUE') == 'FORMATTED_VALUE'
+        rows = []
+        for row in values[row0:row1 + 1]:
+            cells = list(row[col0:col1 + 1])
+            while cells and cells[-1] in ('', None):
+                cells.pop()
+            rows.append([str(cell) if formatted else cell for cell in cells])
+        while rows and not rows[-1]:
+            rows.pop()
+
+        result = {'range': a1_range, 'majorDimension': 'ROWS'}
+        if rows:
+            result['values'] = rows
+        return result
+
+    # Server
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Serve on a background thread; returns the base URL."""
+        handler = type('Handler', (FakeRequestHandler,), {'services': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address[:2]
+        self.logger.info(f"Fake services on http://{host}:{port}")
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @staticmethod
+    def environment(base_url: str) -> Dict[str, str]:
+        """Environment variables that point GlobalSetup at the stand-ins."""
+        return {
+            'BOERNE_NWIS_URL': f"{base_url}/nwis/",
+            'BOERNE_USACE_URL': f"{base_url}/a2w/",
+            'BOERNE_SHEETS_URL': f"{base_url}/"
+        }
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    services: FakeServices = None
+
+    def do_GET(self):
+        code, body, _ = self.services.handle(self.path)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.services.logger.debug(format % args)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(
+        description="Local stand-ins for the NWIS, USACE and Google Sheets APIs."
+    )
+    parser.add_argument('--data-dir', default='boerne-water-supply/data/',
+                        help="seed wells and quality sites from this data directory")
+    parser.add_argument('--recordings', help="directory of recorded responses")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--payload-scale', type=float, default=1.0)
+    parser.add_argument('--revision-minutes', type=float, default=60,
+                        help="minutes between new workbook revisions")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    services = FakeServices(
+        Path(args.data_dir), args.recordings, args.latency, args.jitter,
+        args.error_rate, args.payload_scale, args.seed
+    )
+    base_url = services.start(args.host, args.port)
+    for name, value in FakeServices.environment(base_url).items():
+        print(f"export {name}={value}")
+    try:
+        while True:
+            time.sleep(args.revision_minutes * 60)
+            services.advance()
+    except KeyboardInterrupt:
+        services.stop()
@@ -0,0 +1,173 @@
+import os
+import time
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+import importlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import pandas as pd
+from serve1_fake_services import FakeServices
+from serve1_pipeline_daemon import SOURCES
+
+# Fake service each fetching source reads from
+SOURCE_SERVICES = {
+    'streamflow': 'nwis',
+    'reservoirs': 'usace',
+    'groundwater': 'sheets:wells',
+    'quality': 'sheets:quality'
+}
+
+
+class PipelineBenchmark:
+    """Run processors end to end against the local fake services.
+
+    The data directory is copied into a scratch working directory, so
+    published outputs never touch the real tree. Every source's processor
+    is built once (timed as its load), then updated for ``rounds`` rounds;
+    the fake workbooks gain a revision between rounds. Sources run one
+    after another, or all at once with ``concurrent`` to load the services
+    the way the daemon does.
+    """
+
+    def __init__(self, data_dir: Path, sources: List[str], services: FakeServices,
+                 rounds: int = 1, concurrent: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.data_dir = Path(data_dir).resolve()
+        self.sources = sources
+        self.services = services
+        self.rounds = rounds
+        self.concurrent = concurrent
+        self._processors = {}
+
+    def _load(self, name: str) -> Dict:
+        module_name, class_name, _, _ = SOURCES[name]
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module(module_name)
+            self._processors[name] = getattr(module, class_name)()
+            return {'source': name, 'round': 0, 'status': 'loaded',
+                    'seconds': time.perf_counter() - start}
+        except Exception as e:
+            return {'source': name, 'round': 0, 'status': f"failed: {str(e)[:60]}",
+                    'seconds': time.perf_counter() - start}
+
+    def _update(self, name: str, round_number: int) -> Dict:
+        method_name = SOURCES[name][2]
+        start = time.perf_counter()
+        try:
+            published = getattr(self._processors[name], method_name)()
+            status = 'published' if published else 'unchanged'
+        except Exception as e:
+            status = f"failed: {str(e)[:60]}"
+        return {'source': name, 'round': round_number, 'status': status,
+                'seconds': time.perf_counter() - start}
+
+    def _run_all(self, names: List[str], task, *args) -> List[Dict]:
+        """Run ``task`` for each source, measuring the service traffic it caused."""
+        before = json.loads(json.dumps(self.services.stats))
+        if self.concurrent:
+            with ThreadPoolExecutor(max_workers=len(names) or 1) as pool:
+                results = list(pool.map(lambda name: task(name, *args), names))
+        else:
+            results = [task(name, *args) for name in names]
+        after = self.services.stats
+
+        for result in results:
+            service = SOURCE_SERVICES.get(result['source'])
+            now = after.get(service, {})
+            then = before.get(service, {})
+            for field in ('requests', 'errors', 'bytes'):
+                result[field] = now.get(field, 0) - then.get(field, 0)
+        return results
+
+    def run(self) -> pd.DataFrame:
+        """One row per source per round (round 0 is processor loading)."""
+        rows = self._run_all(self.sources, self._load)
+        loaded = [name for name in self.sources if name in self._processors]
+        for round_number in range(1, self.rounds + 1):
+            rows += self._run_all(loaded, self._update, round_number)
+            self.services.advance()
+
+        report = pd.DataFrame(rows)
+        report['MB'] = report['bytes'] / 1e6
+        report['requests_per_s'] = report['requests'] / report['seconds']
+        report['MB_per_s'] = report['MB'] / report['seconds']
+        return report[['source', 'round', 'status', 'seconds', 'requests',
+                       'errors', 'MB', 'requests_per_s', 'MB_per_s']]
+
+
+def run_benchmark(args) -> pd.DataFrame:
+    """Copy the data into a scratch directory, start the fakes and run."""
+    data_dir = Path(args.data_dir).resolve()
+    scratch = Path(tempfile.mkdtemp(prefix='boerne-benchmark-'))
+    shutil.copytree(
+        data_dir, scratch / "boerne-water-supply" / "data",
+        ignore=shutil.ignore_patterns('deltas', 'watermarks', 'warehouse.sqlite', '*.tmp')
+    )
+    services = FakeServices(
+        scratch / "boerne-water-supply" / "data", args.recordings, args.latency,
+        args.jitter, args.error_rate, args.payload_scale, args.seed
+    )
+    cwd = os.getcwd()
+    try:
+        os.environ.update(FakeServices.environment(services.start()))
+        if args.iv:
+            os.environ['BOERNE_STREAMFLOW_IV'] = '1'
+        # Processors resolve the data directory relative to the working directory
+        os.chdir(scratch)
+        benchmark = PipelineBenchmark(
+            data_dir, args.sources, services, args.rounds, args.concurrent
+        )
+        start = time.perf_counter()
+        report = benchmark.run()
+        logging.getLogger(__name__).info(
+            f"Benchmark finished in {time.perf_counter() - start:.1f} s"
+        )
+        return report
+    finally:
+        os.chdir(cwd)
+        services.stop()
+        if args.keep:
+            print(f"Scratch directory kept at {scratch}")
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the processors against local fake services."
+    )
+    parser.add_argument('--data-dir', default='boerne-water-supply/data/')
+    parser.add_argument('--sources', nargs='+', default=list(SOURCE_SERVICES),
+                        choices=list(SOURCES))
+    parser.add_argument('--rounds', type=int, default=2,
+                        help="updates per source; workbooks change between rounds")
+    parser.add_argument('--concurrent', action='store_true',
+                        help="run all sources at the same time")
+    parser.add_argument('--iv', action='store_true',
+                        help="include provisional NWIS instantaneous values")
+    parser.add_argument('--recordings', help="directory of recorded responses")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--payload-scale', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="also write the report to this CSV")
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directory")
+    parser.add_argument('--verbose', action='store_true', help="show processor logs")
+    args = parser.parse_args()
+
+    # Configured before GlobalSetup so processor logs stay quiet by default
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    report = run_benchmark(args)
+    with pd.option_context('display.width', 160, 'display.max_colwidth', 60):
+        print(report.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if args.output:
+        report.to_csv(args.output, index=False)
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import signal
+import logging
+import argparse
+import importlib
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+from global1_bootstrap_bundle import BootstrapBundle
+
+# Source -> (module, processor class, update method, default cadence in seconds)
+SOURCES = {
+    'streamflow': ('use1_streamflow_data', 'StreamflowProcessor',
+                   'update_streamflow_data', 60 * 60),
+    'reservoirs': ('use1_reservoir_data', 'ReservoirDataProcessor',
+                   'update_reservoir_data', 3 * 60 * 60),
+    # Sheets sources skip their reads when the workbook revision is unchanged,
+    # so frequent polls only cost a metadata request
+    'groundwater': ('use1_groundwater_data', 'GroundwaterProcessor',
+                    'update_groundwater_data', 15 * 60),
+    'quality': ('use1_water_quality_data', 'WaterQualityProcessor',
+                'update_water_quality_data', 15 * 60),
+    # Recomputed from the daily precipitation files the R pipeline writes
+    'spi': ('use1_precip_spi', 'PrecipSPIProcessor', 'update_spi_data', 24 * 60 * 60),
+    'lag_response': ('use1_lag_response', 'LagResponseProcessor',
+                     'update_lag_response', 24 * 60 * 60),
+    # Only reassigns when a site registry or region layer changed
+    'site_regions': ('use1_site_regions', 'SiteRegionProcessor',
+                     'update_site_regions', 15 * 60)
+}
+
+# Longest wait before retrying a source whose update failed
+RETRY_DELAY = 15 * 60
+
+# GlobalSetup date settings that processors copy onto themselves
+DATE_SETTINGS = ('today', 'current_year', 'start_date', 'end_date')
+
+STATE_FILE = 'pipeline_daemon_state.json'
+
+
+class PipelineDaemon:
+    """Long-running scheduler that keeps every processor warm.
+
+    Each processor is built once, so its history, julian calendar and
+    climatology table stay in memory between updates. Every source is
+    polled on its own cadence and only that domain is recomputed and
+    published when new data arrives; ``update_date.csv`` is then touched
+    so the query service drops its cached responses, and the first-paint
+    ``bootstrap.json`` is rebuilt. Per-source freshness is written to
+    ``pipeline_daemon_state.json`` after every poll.
+    """
+
+    def __init__(self, data_dir: Path, sources: List[str],
+                 cadences: Optional[Dict[str, int]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.data_dir = Path(data_dir)
+        self.sources = sources
+        self.cadences = {name: SOURCES[name][3] for name in sources}
+        self.cadences.update(cadences or {})
+
+        self.state_path = self.data_dir / STATE_FILE
+        self.state = self._load_state()
+        self._processors = {}
+        self._stop = threading.Event()
+
+    def _load_state(self) -> Dict:
+        """Resume the schedule of a previous daemon run."""
+        if self.state_path.exists():
+            return json.loads(self.state_path.read_text())
+        return {}
+
+    def _save_state(self):
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        tmp_path.write_text(json.dumps(self.state, indent=2))
+        os.replace(tmp_path, self.state_path)
+
+    def _processor(self, name: str):
+        """Build a source's processor on first use and keep it resident."""
+        if name not in self._processors:
+            module_name, class_name, _, _ = SOURCES[name]
+            module = importlib.import_module(module_name)
+            self.logger.info(f"Loading {name} processor")
+            self._processors[name] = getattr(module, class_name)()
+        return self._processors[name]
+
+    @staticmethod
+    def _refresh_dates(processor):
+        """Roll a resident processor's dates forward to the current day.
+
+        ``GlobalSetup`` reads the date once, so a processor kept warm past
+        midnight would otherwise keep fetching and stamping the day it
+        was built.
+        """
+        processor.setup.setup_dates()
+        for setting in DATE_SETTINGS:
+            if hasattr(processor, setting):
+                setattr(processor, setting, getattr(processor.setup, setting))
+
+    def next_due(self, name: str) -> float:
+        """Epoch seconds at which a source should next be polled."""
+        return self.state.get(name, {}).get('next_due', 0)
+
+    def run_source(self, name: str) -> bool:
+        """Poll one source, publishing its domain if new data arrived."""
+        started = time.time()
+        entry = self.state.setdefault(name, {})
+        entry['cadence'] = self.cadences[name]
+        entry['last_attempt'] = datetime.fromtimestamp(started).isoformat(timespec='seconds')
+        published = False
+        try:
+            processor = self._processor(name)
+            self._refresh_dates(processor)
+            published = bool(getattr(processor, SOURCES[name][2])())
+            if published:
+                processor.setup.create_update_date()
+                self._write_bundle()
+                entry['last_published'] = entry['last_attempt']
+            entry['last_success'] = entry['last_attempt']
+            entry['error'] = None
+            entry['next_due'] = started + self.cadences[name]
+            self.logger.info(
+                f"{name}: {'published new data' if published else 'no new data'} "
+                f"in {time.time() - started:.1f}s"
+            )
+        except Exception as e:
+            # Rebuild the processor next time in case its state is stale
+            self._processors.pop(name, None)
+            entry['error'] = str(e)
+            entry['next_due'] = started + min(self.cadences[name], RETRY_DELAY)
+            self.logger.error(f"{name}: update failed: {e}")
+        self._save_state()
+        return published
+
+    def _write_bundle(self):
+        """Rebuild the bootstrap bundle; a failure here does not fail the source."""
+        try:
+            BootstrapBundle(self.data_dir).write()
+        except Exception as e:
+            self.logger.error(f"Bootstrap bundle not rebuilt: {e}")
+
+    def run_pending(self) -> int:
+        """Poll every source that is due; return how many were polled."""
+        due = [name for name in self.sources if self.next_due(name) <= time.time()]
+        for name in sorted(due, key=self.next_due):
+            if self._stop.is_set():
+                break
+            self.run_source(name)
+        return len(due)
+
+    def run_forever(self):
+        """Poll sources on their cadences until stopped."""
+        self.logger.info(
+            "Pipeline daemon started: " + ', '.join(
+                f"{name} every {self.cadences[name] // 60} min" for name in self.sources
+            )
+        )
+        while not self._stop.is_set():
+            self.run_pending()
+            wait = min(self.next_due(name) for name in self.sources) - time.time()
+            self._stop.wait(max(wait, 1))
+        self.logger.info("Pipeline daemon stopped")
+
+    def stop(self, *args):
+        self._stop.set()
+
+
+def _parse_cadences(values: List[str]) -> Dict[str, int]:
+    """Parse ``source=minutes`` overrides."""
+    cadences = {}
+    for value in values:
+        name, minutes = value.split('=')
+        if name not in SOURCES:
+            raise ValueError(f"Unknown source: {name}")
+        cadences[name] = int(float(minutes) * 60)
+    return cadences
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(
+        description="Keep the pipeline warm and update each source on its own cadence."
+    )
+    parser.add_argument('--data-dir', default='boerne-water-supply/data/')
+    parser.add_argument('--sources', nargs='*', choices=list(SOURCES),
+                        default=list(SOURCES))
+    parser.add_argument('--cadence', nargs='*', default=[], metavar='SOURCE=MINUTES',
+                        help="override a source's polling interval")
+    parser.add_argument('--once', action='store_true',
+                        help="poll every due source once and exit")
+    args = parser.parse_args()
+
+    daemon = PipelineDaemon(Path(args.data_dir), args.sources, _parse_cadences(args.cadence))
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+
+    if args.once:
+        daemon.run_pending()
+    else:
+        daemon.run_forever()
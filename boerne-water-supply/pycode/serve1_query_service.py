@@ -0,0 +1,272 @@
+import json
+import logging
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, Optional, Tuple
+
+# Pipeline outputs served per domain, relative to the data directory
+DOMAINS = {
+    'streamflow': {
+        'series': 'streamflow/all_stream_data.csv',
+        'site_col': 'site',
+        'stats': 'streamflow/all_stream_stats.csv',
+        'stats_site_col': 'site',
+        'sites': 'streamflow/all_stream_gauge_sites.geojson',
+        'sites_key': 'site'
+    },
+    'groundwater': {
+        'series': 'gw/all_gw_depth.csv',
+        'site_col': 'site',
+        'stats': 'gw/all_gw_stats.csv',
+        'stats_site_col': 'site',
+        'sites': 'gw/all_gw_sites.geojson',
+        'sites_key': 'site'
+    },
+    'reservoirs': {
+        'series': 'reservoirs/all_reservoir_data.csv',
+        'site_col': 'NIDID',
+        'stats': 'reservoirs/all_reservoir_stats.csv',
+        'stats_site_col': 'site',
+        'sites': 'reservoirs/all_canyon_lake_site.geojson',
+        'sites_key': 'NIDID'
+    },
+    'precipitation': {
+        'series': 'pcp/all_pcp_data.csv',
+        'site_col': 'id',
+        'stats': None,
+        'stats_site_col': None,
+        'sites': 'pcp/all_pcp_sites.geojson',
+        'sites_key': 'id'
+    },
+    'quality': {
+        'series': 'quality/all_water_quality.csv',
+        'site_col': 'site_id',
+        'stats': None,
+        'stats_site_col': None,
+        'sites': None,
+        'sites_key': None
+    }
+}
+
+# Written by GlobalSetup on every pipeline run
+UPDATE_MARKER = 'update_date.csv'
+
+
+class SiteDateIndex:
+    """Rows of one output file sorted and indexed by (site, date)."""
+
+    def __init__(self, path: Path, site_col: str, date_col: Optional[str] = 'date'):
+        df = pd.read_csv(path, dtype={site_col: str})
+        df[site_col] = df[site_col].astype(str)
+
+        if date_col is not None:
+            dates = pd.to_datetime(df[date_col], errors='coerce')
+            df = df.assign(_date=dates).sort_values(
+                [site_col, '_date'], kind='mergesort'
+            ).reset_index(drop=True)
+            self.dates = df.pop('_date').to_numpy()
+            df[date_col] = pd.Series(self.dates).dt.strftime('%Y-%m-%d')
+        else:
+            df = df.sort_values(site_col, kind='mergesort').reset_index(drop=True)
+            self.dates = None
+
+        # Contiguous row range per site
+        sites = df[site_col].to_numpy()
+        starts = np.flatnonzero(np.r_[True, sites[1:] != sites[:-1]]) if len(sites) else []
+        ends = np.r_[starts[1:], len(sites)] if len(sites) else []
+        self.bounds = {sites[s]: (s, e) for s, e in zip(starts, ends)}
+        self.frame = df
+
+    def site_rows(self, site: str, start: Optional[np.datetime64] = None,
+                  end: Optional[np.datetime64] = None) -> pd.DataFrame:
+        """Rows for one site, optionally limited to [start, end]."""
+        if site not in self.bounds:
+            return self.frame.iloc[0:0]
+        lo, hi = self.bounds[site]
+        if self.dates is not None and (start is not None or end is not None):
+            site_dates = self.dates[lo:hi]
+            if start is not None:
+                lo += np.searchsorted(site_dates, start, side='left')
+            if end is not None:
+                hi = self.bounds[site][0] + np.searchsorted(site_dates, end, side='right')
+        return self.frame.iloc[lo:hi]
+
+
+class QueryStore:
+    """Lazily loaded, run-aware view of the pipeline outputs under data/."""
+
+    def __init__(self, data_dir: Path, cache_size: int = 256):
+        self.data_dir = Path(data_dir)
+        self.cache_size = cache_size
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.RLock()
+        self._cache: OrderedDict = OrderedDict()
+        self._indexes: Dict[Tuple[str, str], SiteDateIndex] = {}
+        self._run_marker = None
+
+    def _check_run(self):
+        """Drop cached responses and indexes once a new run is published."""
+        marker_path = self.data_dir / UPDATE_MARKER
+        marker = marker_path.stat().st_mtime_ns if marker_path.exists() else None
+        if marker != self._run_marker:
+            if self._run_marker is not None:
+                self.logger.info("New pipeline run detected, clearing caches")
+            self._cache.clear()
+            self._indexes.clear()
+            self._run_marker = marker
+
+    def _index(self, domain: str, kind: str) -> Optional[SiteDateIndex]:
+        """Load the (site, date) index for a domain's series or stats file."""
+        key = (domain, kind)
+        if key not in self._indexes:
+            config = DOMAINS[domain]
+            if config[kind] is None:
+                return None
+            if kind == 'series':
+                index = SiteDateIndex(self.data_dir / config['series'], config['site_col'])
+            else:
+                index = SiteDateIndex(
+                    self.data_dir / config['stats'], config['stats_site_col'], date_col=None
+                )
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def query(self, route: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        """Answer a request from the LRU cache or the indexed outputs."""
+        with self._lock:
+            self._check_run()
+            cache_key = (route, tuple(sorted(params.items())))
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return self._cache[cache_key]
+
+            response = self._dispatch(route, params)
+            if response[0] == 200:
+                self._cache[cache_key] = response
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return response
+
+    def _dispatch(self, route: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        """Route a request path to its handler."""
+        parts = [part for part in route.split('/') if part]
+
+        if parts == ['update-date']:
+            return self._json(self._update_date())
+        if parts == ['status']:
+            return self._json(self._current_status())
+        if len(parts) == 2 and parts[0] in DOMAINS:
+            domain, endpoint = parts
+            if 'site' not in params:
+                return self._error(400, "Missing required parameter 'site'")
+            if endpoint == 'series':
+                bounds = {}
+                for name in ('start', 'end'):
+                    if params.get(name):
+                        try:
+                            bounds[name] = np.datetime64(params[name], 'D')
+                        except ValueError:
+                            return self._error(
+                                400, f"Invalid '{name}' date {params[name]!r}; use YYYY-MM-DD"
+                            )
+                index = self._index(domain, 'series')
+                rows = index.site_rows(params['site'], bounds.get('start'), bounds.get('end'))
+                return self._json(self._records(rows))
+            if endpoint == 'stats':
+                index = self._index(domain, 'stats')
+                if index is None:
+                    return self._error(404, f"No statistics published for {domain}")
+                return self._json(self._records(index.site_rows(params['site'])))
+        return self._error(404, f"Unknown route: {route}")
+
+    def _update_date(self) -> Dict:
+        """Latest update date written by the pipeline."""
+        update_date = pd.read_csv(self.data_dir / UPDATE_MARKER)
+        return {'today_date': update_date['today_date'].iloc[0]}
+
+    def _current_status(self) -> Dict:
+        """Current status properties for every site in every domain."""
+        status = {}
+        for domain, config in DOMAINS.items():
+            if config['sites'] is None or not (self.data_dir / config['sites']).exists():
+                continue
+            with open(self.data_dir / config['sites']) as f:
+                features = json.load(f)['features']
+            status[domain] = [feature['properties'] for feature in features]
+        return status
+
+    @staticmethod
+    def _records(rows: pd.DataFrame) -> list:
+        """JSON-safe list of row records with NaN as null."""
+        return json.loads(rows.to_json(orient='records'))
+
+    @staticmethod
+    def _json(payload) -> Tuple[int, bytes]:
+        return 200, json.dumps(payload).encode('utf-8')
+
+    @staticmethod
+    def _error(code: int, message: str) -> Tuple[int, bytes]:
+        return code, json.dumps({'error': message}).encode('utf-8')
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """Read-only GET handler backed by a shared QueryStore."""
+
+    store: QueryStore = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            code, body = self.store.query(url.path, params)
+        except Exception as e:
+            self.store.logger.error(f"Error answering {self.path}: {e}")
+            code, body = QueryStore._error(500, str(e))
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.store.logger.debug(format % args)
+
+
+def serve(data_dir: Path, host: str = '127.0.0.1', port: int = 8765,
+          cache_size: int = 256):
+    """Run the query service until interrupted."""
+    QueryRequestHandler.store = QueryStore(data_dir, cache_size)
+    server = ThreadingHTTPServer((host, port), QueryRequestHandler)
+    QueryRequestHandler.store.logger.info(
+        f"Serving {data_dir} on http://{host}:{port}"
+    )
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(
+        description="Read-only time-series query service over pipeline outputs."
+    )
+    parser.add_argument('--data-dir', default='boerne-water-supply/data/')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache-size', type=int, default=256)
+    args = parser.parse_args()
+
+    serve(Path(args.data_dir), args.host, args.port, args.cache_size)
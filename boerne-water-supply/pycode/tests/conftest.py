@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The pipeline modules are flat scripts run from pycode/
+PYCODE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = PYCODE_DIR.parent / "data"
+sys.path.insert(0, str(PYCODE_DIR))
@@ -0,0 +1,28 @@
+import json
+import numpy as np
+import pandas as pd
+from global1_climatology_table import STAT_COLUMNS, ClimatologyTable
+
+
+def stats(value):
+    rows = pd.DataFrame({'site': ['A', 'B'], 'julian': [1, 366]})
+    return rows.assign(**dict.fromkeys(STAT_COLUMNS, value))
+
+
+def test_each_build_commits_through_the_index(tmp_path):
+    path = tmp_path / "stream_climatology.npy"
+    first = ClimatologyTable.build(stats(1.0), path)
+    meta = json.loads(ClimatologyTable.index_path_for(path).read_text())
+    assert (tmp_path / meta['array']).exists() and not path.exists()
+
+    # A rebuild never touches the array an open table maps
+    second = ClimatologyTable.ensure(stats(2.0), path)
+    assert first.envelope('A', 1)['flow50'] == 1.0
+    assert second.envelope('B', 366)['flow50'] == 2.0
+    assert ClimatologyTable(path).lookup(['A', 'C'], [1, 1])['max'].tolist()[0] == 2.0
+    assert np.isnan(ClimatologyTable(path).lookup(['C'], [1])['max'][0])
+
+    # Only the current and previous arrays are kept
+    ClimatologyTable.ensure(stats(3.0), path)
+    assert len(list(tmp_path.glob("stream_climatology.*.npy"))) == 2
+    assert ClimatologyTable.stored_fingerprint(path) == ClimatologyTable.fingerprint_stats(stats(3.0))
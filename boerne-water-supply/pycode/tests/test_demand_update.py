@@ -0,0 +1,42 @@
+import re
+import shutil
+import pandas as pd
+import pytest
+from conftest import DATA_DIR
+from use1_demand_data import DemandDataProcessor
+
+# "TX1300001",2020,60,"Feb-29",63.54
+CUM_ROW = re.compile(r'^"TX\d{7}",\d{4},\d{1,3},"[A-Z][a-z]{2}-\d{1,2}",\d+(\.\d{1,2})?$')
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A scratch data directory holding only the demand domain."""
+    data_dir = tmp_path / "boerne-water-supply/data"
+    shutil.copytree(DATA_DIR / "demand", data_dir / "demand")
+    shutil.copy(DATA_DIR / "utility.geojson", data_dir)
+    monkeypatch.delenv('BOERNE_WAREHOUSE', raising=False)
+    monkeypatch.chdir(tmp_path)
+    return data_dir / "demand"
+
+
+def test_cumulative_demand_matches_the_r_file(workdir):
+    committed_path = DATA_DIR / "demand/all_demand_cum.csv"
+    committed = committed_path.read_text().splitlines()
+
+    assert DemandDataProcessor().update_demand_data()
+
+    # Same header, quoting and the leap-day labels the demand tab filters on
+    published = (workdir / "all_demand_cum.csv").read_text().splitlines()
+    assert published[0] == committed[0]
+    assert all(CUM_ROW.match(line) for line in committed[1:])
+    assert all(CUM_ROW.match(line) for line in published[1:])
+    assert any(line.startswith('"TX1300001",2020,60,"Feb-29",') for line in published)
+
+    # Year-to-date sums of the published daily demand, over the complete
+    # years of the R file; R rounded a few half-cent days the other way
+    keys = ['pwsid', 'year', 'julian', 'date']
+    both = pd.read_csv(committed_path).query('year <= 2021').merge(
+        pd.read_csv(workdir / "all_demand_cum.csv"), on=keys, suffixes=('_r', ''))
+    assert both['year'].nunique() == 21
+    assert (both['demand_mgd'] - both['demand_mgd_r']).abs().max() < 0.1
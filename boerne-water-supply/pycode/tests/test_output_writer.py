@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+import global1_output_writer
+from conftest import DATA_DIR
+from global1_output_writer import write_csv
+
+# Committed R outputs with quoted text, bare dates and numbers, and NA
+R_FILES = {
+    'reservoirs/all_reservoir_stats.csv': dict(
+        dtype={'site': str, 'date': str, 'month': str}, parse_dates=['date2']),
+    'quality/all_water_quality.csv': dict(
+        dtype={'site_id': str, 'name': str, 'flow_severity': str, 'date': str})
+}
+
+
+@pytest.mark.parametrize('arrow', [True, False], ids=['pyarrow', 'pandas'])
+@pytest.mark.parametrize('name', R_FILES)
+def test_written_csv_is_byte_compatible_with_r(name, arrow, tmp_path, monkeypatch):
+    if arrow and global1_output_writer.pa is None:
+        pytest.skip("pyarrow is not installed")
+    if not arrow:
+        monkeypatch.setattr(global1_output_writer, 'pa', None)
+
+    committed = DATA_DIR / name
+    write_csv(pd.read_csv(committed, **R_FILES[name]), tmp_path / "out.csv")
+    assert (tmp_path / "out.csv").read_bytes() == committed.read_bytes()
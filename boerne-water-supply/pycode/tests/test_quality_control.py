@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from global1_quality_control import (
+    QC_CODE, QC_DUPLICATE, QC_MISSING, QC_OUTLIER, QC_RANGE,
+    QualityControl, rolling_median_mad
+)
+
+
+def depths(values, site='5758203', start='2023-01-01'):
+    """Daily groundwater depths for one well."""
+    return pd.DataFrame({
+        'site': site,
+        'date': pd.date_range(start, periods=len(values)),
+        'depth_ft': values
+    })
+
+
+def screen(domain, df, tmp_path):
+    return QualityControl(domain, tmp_path).screen(df)['qc_flag'].to_numpy()
+
+
+def test_missing_values_and_dates(tmp_path):
+    df = depths([50.0, np.nan, 51.0])
+    df.loc[2, 'date'] = pd.NaT
+    assert list(screen('groundwater', df, tmp_path)) == [0, QC_MISSING, QC_MISSING]
+
+
+def test_out_of_range(tmp_path):
+    flags = screen('groundwater', depths([50.0, -2.0, 1600.0]), tmp_path)
+    assert list(flags) == [0, QC_RANGE, QC_RANGE]
+
+
+def test_sentinels_and_qualifier_codes(tmp_path):
+    df = pd.DataFrame({
+        'site': '08171000',
+        'date': pd.date_range('2023-01-01', periods=3),
+        'flow': [120.0, -999999.0, 118.0],
+        'qualifiers': ["['A']", "['P']", "['P', 'Ice']"]
+    })
+    # A sentinel is an invalid code, not also out of range
+    assert list(screen('streamflow', df, tmp_path)) == [0, QC_CODE, QC_CODE]
+
+
+def test_duplicates_keep_the_last_row(tmp_path):
+    df = pd.concat([depths([50.0, 51.0]), depths([50.5], start='2023-01-02')],
+                   ignore_index=True)
+    assert list(screen('groundwater', df, tmp_path)) == [0, QC_DUPLICATE, 0]
+
+
+def test_outliers(tmp_path):
+    values = 50 + np.sin(np.arange(30))
+    values[15] = 150.0
+    flags = screen('groundwater', depths(values), tmp_path)
+    assert flags[15] == QC_OUTLIER
+    assert not np.delete(flags, 15).any()
+
+
+def test_any_passed(tmp_path):
+    qc = QualityControl('groundwater', tmp_path)
+    assert qc.any_passed(qc.screen(depths([50.0, 51.0])))
+    assert not qc.any_passed(qc.screen(depths([-1.0, np.nan])))
+
+
+@pytest.mark.parametrize('window', [9, 14, 15])
+def test_rolling_median_mad_matches_pandas(window):
+    rng = np.random.default_rng(3)
+    values = rng.normal(50, 5, 200)
+    values[rng.random(200) < 0.1] = np.nan
+    groups = np.repeat(['a', 'b'], 100)
+    median, mad = rolling_median_mad(values, groups, window)
+
+    # Windows are centred, so an even window spans window + 1 values
+    width = 2 * (window // 2) + 1
+    rolling = (pd.Series(values).groupby(groups)
+               .rolling(width, center=True, min_periods=5))
+    expected_median = rolling.median().to_numpy()
+    expected_mad = rolling.apply(
+        lambda a: np.nanmedian(np.abs(a - np.nanmedian(a))), raw=True
+    ).to_numpy()
+    np.testing.assert_allclose(median, expected_median)
+    np.testing.assert_allclose(mad, expected_mad)
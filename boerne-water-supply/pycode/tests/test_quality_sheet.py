@@ -0,0 +1,84 @@
+import logging
+from types import SimpleNamespace
+import pytest
+from serve1_fake_services import QUALITY_HEADER
+from use1_water_quality_data import WaterQualityProcessor
+
+
+class Worksheet:
+    """In-memory stand-in for the pygsheets worksheet reads."""
+
+    def __init__(self, rows):
+        self.values = [QUALITY_HEADER] + rows
+        self.first_rows_read = []
+
+    @property
+    def rows(self):
+        return len(self.values)
+
+    @property
+    def cols(self):
+        return len(QUALITY_HEADER)
+
+    def get_values(self, start, end, **kwargs):
+        if start == 'A1':
+            return [self.values[0]]
+        self.first_rows_read.append(start[0])
+        return self.values[start[0] - 1:end[0]]
+
+
+def row(day, conductivity='440'):
+    return ['12600', 'Canyon Lake', 'Guadalupe', 'Comal', 29.9, -98.28, '1805',
+            f'3/{day}/2022', '0.3', 'Normal', '8.1', conductivity, '6.3',
+            '20', '18', '', '0.3', '']
+
+
+@pytest.fixture
+def processor():
+    # Only the sheet read path: no data files or credentials
+    processor = WaterQualityProcessor.__new__(WaterQualityProcessor)
+    processor.logger = logging.getLogger(__name__)
+    processor.monitored_sites = ['12600']
+    processor.spreadsheet_id = 'sheet'
+    processor.check_rows = 5
+    processor.watermark = {}
+    return processor
+
+
+def fetch(processor, worksheet, revision):
+    workbook = type('Workbook', (), {'updated': revision,
+                                     '__getitem__': lambda self, index: worksheet})()
+    client = SimpleNamespace(open_by_key=lambda key: workbook)
+    processor.setup = SimpleNamespace(authorize_sheets=lambda: client)
+    df = processor._fetch_gsheet_data()
+    processor.watermark = processor._pending_watermark
+    return df
+
+
+def test_appended_rows_are_read_from_the_watermark(processor):
+    worksheet = Worksheet([row(day) for day in range(1, 21)])
+    assert len(fetch(processor, worksheet, 'r1')) == 20
+
+    worksheet.values.append(row(21))
+    df = fetch(processor, worksheet, 'r2')
+    assert df['Sample Date'].tolist() == ['3/21/2022']
+    # Only the trailing block of rows already read is reread
+    assert worksheet.first_rows_read[-1] == 21 + 1 - processor.check_rows
+    assert processor.watermark['last_row'] == 22
+    assert not processor.watermark['full_read']
+
+
+def test_edit_in_the_same_revision_as_appended_rows_rereads_everything(processor):
+    worksheet = Worksheet([row(day) for day in range(1, 21)])
+    fetch(processor, worksheet, 'r1')
+
+    worksheet.values[-1] = row(20, conductivity='512')
+    worksheet.values.append(row(21))
+    df = fetch(processor, worksheet, 'r2')
+    assert len(df) == 21
+    assert processor.watermark['full_read']
+    assert df.loc[df['Sample Date'] == '3/20/2022', 'Conductivity (µs/cm)'].tolist() == ['512']
+
+    # The next append is incremental again
+    worksheet.values.append(row(22))
+    assert len(fetch(processor, worksheet, 'r3')) == 1
@@ -0,0 +1,72 @@
+import json
+import shutil
+import pandas as pd
+import pytest
+from conftest import DATA_DIR
+from serve1_fake_services import FakeServices
+from use1_reservoir_data import ReservoirDataProcessor
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A scratch data directory served by the fake USACE CWMS."""
+    other_domains = {'pcp', 'demand', 'gw', 'quality'}
+    shutil.copytree(DATA_DIR, tmp_path / "boerne-water-supply/data",
+                    ignore=lambda path, names: other_domains & set(names))
+    services = FakeServices()
+    for name, value in FakeServices.environment(services.start()).items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv('BOERNE_WAREHOUSE', raising=False)
+    monkeypatch.delenv('BOERNE_RESERVOIR_SITES', raising=False)
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path / "boerne-water-supply/data/reservoirs"
+    services.stop()
+
+
+def canyon_lake(reservoir_dir):
+    return pd.read_csv(reservoir_dir / "all_reservoir_data.csv", parse_dates=['date'])
+
+
+def test_update_extends_the_r_record_with_operating_targets(workdir):
+    before = canyon_lake(workdir)
+
+    # No usace_dams.csv or converted dataset: history comes from the R files
+    assert not (workdir / "usace_dams.csv").exists()
+    assert ReservoirDataProcessor().update_reservoir_data()
+
+    after = canyon_lake(workdir)
+    new_days = after[after['date'] > before['date'].max()]
+    assert len(new_days)
+    assert after['date'].min() == before['date'].min()
+    assert not after.duplicated(['NIDID', 'date']).any()
+    assert new_days[['OT_AF', 'percentStorage']].notna().all().all()
+
+    stats = pd.read_csv(workdir / "all_reservoir_stats.csv")
+    assert len(stats) and stats['flow50'].notna().any()
+
+    # The next run picks up from the published record
+    assert ReservoirDataProcessor().update_reservoir_data() in (True, False)
+    assert len(canyon_lake(workdir)) >= len(after)
+
+
+def test_stats_and_per_reservoir_outputs_use_the_r_layout(workdir, monkeypatch):
+    monkeypatch.setenv('BOERNE_RESERVOIR_SITES', '1')
+    committed = (DATA_DIR / "reservoirs/all_reservoir_stats.csv").read_text().splitlines()
+
+    assert ReservoirDataProcessor().update_reservoir_data()
+
+    published = (workdir / "all_reservoir_stats.csv").read_text().splitlines()
+    assert published[0] == committed[0]
+    stats = pd.read_csv(workdir / "all_reservoir_stats.csv")
+    assert set(stats['site']) == {'TX00004'}
+    this_year = stats.dropna(subset=['date2'])
+    assert len(this_year) and this_year['colorStatus'].notna().all()
+    assert stats.drop(this_year.index)[['status', 'colorStatus']].isna().all().all()
+    assert (this_year['startYr'] == 1990).all()
+
+    manifest = json.loads((workdir / "reservoir_manifest.json").read_text())
+    canyon = next(entry for entry in manifest['reservoirs'] if entry['NIDID'] == 'TX00004')
+    assert (workdir / canyon['series']).exists()
+    site_stats = (workdir / canyon['stats']).read_text().splitlines()
+    assert site_stats[0] == committed[0]
+    assert len(site_stats) == len(published)
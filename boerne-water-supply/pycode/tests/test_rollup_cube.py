@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from global1_rollup_cube import RollupCube
+
+
+def daily(seed=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2021-01-01', '2023-12-31', freq='D')
+    return pd.concat([
+        pd.DataFrame({'pwsid': site, 'date': dates, 'total': rng.gamma(4.0, 0.5, len(dates))})
+        for site in ['TX1300001', 'TX1300002']
+    ], ignore_index=True)
+
+
+def cube_frames(cube_dir, name):
+    cube = RollupCube(cube_dir, name, key='pwsid', value='total')
+    return cube.monthly, cube.annual
+
+
+def test_incremental_updates_equal_a_full_recompute(tmp_path):
+    record = daily()
+    first = record[record['date'] < '2023-07-01']
+    RollupCube(tmp_path, 'demand', key='pwsid', value='total').update(first)
+
+    # A later run, from the persisted cube: new days, a revised day and a
+    # month withdrawn from one utility
+    revised = record.copy()
+    revised.loc[(revised['pwsid'] == 'TX1300001')
+                & (revised['date'] == '2022-03-15'), 'total'] = 40.0
+    revised = revised[~((revised['pwsid'] == 'TX1300002')
+                        & (revised['date'].dt.to_period('M') == '2021-05'))]
+    RollupCube(tmp_path, 'demand', key='pwsid', value='total').update(revised)
+
+    full_dir = tmp_path / "full"
+    full_dir.mkdir()
+    RollupCube(full_dir, 'demand', key='pwsid', value='total').update(revised)
+
+    for incremental, full in zip(cube_frames(tmp_path, 'demand'),
+                                 cube_frames(full_dir, 'demand')):
+        pd.testing.assert_frame_equal(incremental, full)
+    monthly, annual = cube_frames(tmp_path, 'demand')
+    assert len(monthly) == 2 * 36 - 1
+    revised_year = (annual['pwsid'] == 'TX1300001') & (annual['year'] == 2022)
+    assert annual.loc[revised_year, 'max'].item() == 40.0
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from global1_sharded_stats import PERCENTILES, latest_rows, percentile_stats, run_sharded
+
+
+def daily_values(n_sites=12, n_days=400):
+    """A few years of noisy daily values for several sites."""
+    rng = np.random.default_rng(7)
+    dates = pd.date_range('2020-01-01', periods=n_days)
+    df = pd.DataFrame({
+        'site': np.repeat([f"0817{i:04d}" for i in range(n_sites)], n_days),
+        'date': np.tile(dates, n_sites),
+        'flow': rng.gamma(2.0, 30.0, n_sites * n_days)
+    })
+    df['julian'] = df['date'].dt.dayofyear
+    df.loc[rng.random(len(df)) < 0.05, 'flow'] = np.nan
+    return df
+
+
+def stats(df, workers):
+    return run_sharded(df, percentile_stats, 'site', ['site', 'julian'],
+                       workers=workers, value_col='flow')
+
+
+def test_sharded_stats_equal_in_process():
+    df = daily_values()
+    in_process = stats(df, workers=1)
+    assert in_process['site'].nunique() == 12
+    pd.testing.assert_frame_equal(stats(df, workers=2), in_process)
+
+
+def test_sharded_latest_rows_equal_in_process():
+    df = daily_values()
+    latest = [run_sharded(df, latest_rows, 'site', ['site'], workers=workers,
+                          date_col='date') for workers in (1, 2)]
+    pd.testing.assert_frame_equal(latest[1], latest[0])
+    assert (latest[0]['date'] == df['date'].max()).all()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_stats_without_values_are_empty(workers):
+    columns = ['site', 'julian', 'Nobs', 'min'] + list(PERCENTILES) + ['max']
+    empty = daily_values().iloc[:0]
+    no_values = daily_values().assign(flow=np.nan)
+    for df in (empty, no_values):
+        result = stats(df, workers)
+        assert result.empty
+        assert list(result.columns) == columns
+    assert run_sharded(empty, latest_rows, 'site', ['site'], workers=workers,
+                       date_col='date').empty
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+from global1_spi import SPI_LIMIT, compute_spi
+
+
+def daily_precip(seed=7, years=30):
+    """Two sites of daily rain, with whole dry months at the first."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1990-01-01', f'{1989 + years}-12-31', freq='D')
+    frames = []
+    for site, wet in [('dry', 0.15), ('wet', 0.35)]:
+        rain = np.where(rng.random(len(dates)) < wet, rng.gamma(0.8, 0.4, len(dates)), 0.0)
+        if site == 'dry':
+            rain[(dates.month == 7) & (dates.year % 4 == 0)] = 0.0
+        frames.append(pd.DataFrame({'id': site, 'date': dates, 'pcp_in': rain}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def reference_spi(daily, site, scale):
+    """SPI from scipy's maximum-likelihood gamma fit, month by month."""
+    totals = (daily[daily['id'] == site].set_index('date')['pcp_in']
+              .resample('MS').sum().rolling(scale).sum())
+    spi = pd.Series(np.nan, index=totals.index)
+    for month in range(1, 13):
+        sample = totals[totals.index.month == month].dropna()
+        positive = sample[sample > 0]
+        q_zero = 1 - len(positive) / len(sample)
+        shape, _, scale_param = stats.gamma.fit(positive, floc=0)
+        probability = q_zero + (1 - q_zero) * stats.gamma.cdf(sample, shape, scale=scale_param)
+        spi[sample.index] = np.clip(stats.norm.ppf(probability), -SPI_LIMIT, SPI_LIMIT)
+    return spi
+
+
+def test_spi_matches_a_reference_gamma_fit():
+    daily = daily_precip()
+    result = compute_spi(daily, scales=(1, 3, 12)).set_index(['id', 'date'])
+
+    for site in ['dry', 'wet']:
+        for scale in (1, 3, 12):
+            expected = reference_spi(daily, site, scale).dropna()
+            actual = result.loc[site, f'spi_{scale}'].reindex(expected.index)
+            assert actual.notna().all()
+            # Thom's approximation of the gamma shape is within a few
+            # hundredths of the exact fit
+            np.testing.assert_allclose(actual, expected, atol=0.03)
+
+    assert result['spi_1'].between(-SPI_LIMIT, SPI_LIMIT).all()
@@ -0,0 +1,82 @@
+import os
+import shutil
+import pandas as pd
+import pytest
+from conftest import DATA_DIR
+from global1_quality_control import QC_RULES
+from serve1_fake_services import FakeServices
+from use1_streamflow_data import StreamflowProcessor
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A scratch data directory served by the fake NWIS."""
+    other_domains = {'pcp', 'reservoirs', 'demand', 'gw', 'quality'}
+    shutil.copytree(DATA_DIR, tmp_path / "boerne-water-supply/data",
+                    ignore=lambda path, names: other_domains & set(names))
+    services = FakeServices()
+    for name, value in FakeServices.environment(services.start()).items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv('BOERNE_WAREHOUSE', raising=False)
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path / "boerne-water-supply/data/streamflow"
+    services.stop()
+
+
+def published(streamflow_dir):
+    return pd.read_csv(streamflow_dir / "all_stream_data.csv", dtype={'site': str})
+
+
+def test_fresh_runs_never_publish_a_shorter_record(workdir):
+    before = published(workdir)
+
+    # Each run is a fresh processor, as in a new process
+    assert StreamflowProcessor().update_streamflow_data()
+    first = published(workdir)
+    StreamflowProcessor().update_streamflow_data()
+    second = published(workdir)
+
+    assert len(first) > len(before)
+    assert len(second) >= len(first)
+    assert second['date'].max() >= first['date'].max()
+    for data in (first, second):
+        assert not data.duplicated(['site', 'date']).any()
+
+
+def test_update_publishes_data_when_qc_passes_nothing(workdir, monkeypatch):
+    # No flow can pass a range that ends below zero
+    monkeypatch.setitem(QC_RULES['streamflow'], 'max', -1)
+    stats_before = (workdir / "all_stream_stats.csv").read_bytes()
+    before = published(workdir)
+
+    assert StreamflowProcessor().update_streamflow_data()
+
+    assert len(published(workdir)) > len(before)
+    assert (workdir / "all_stream_stats.csv").read_bytes() == stats_before
+
+
+def test_new_gauge_is_fetched_from_the_record_start(workdir):
+    processor = StreamflowProcessor()
+    new_gauge = processor.sites.iloc[[0]].assign(site='08170000', name='New gauge')
+    processor.sites = pd.concat([processor.sites, new_gauge], ignore_index=True)
+
+    assert processor.update_streamflow_data()
+
+    gauge = published(workdir).query("site == '08170000'")
+    assert len(gauge)
+    assert gauge['date'].min() >= processor.setup.start_date
+
+
+def test_published_bytes_do_not_depend_on_the_warehouse(workdir, tmp_path, monkeypatch):
+    twin = tmp_path / "twin"
+    shutil.copytree(tmp_path / "boerne-water-supply", twin / "boerne-water-supply")
+    assert StreamflowProcessor().update_streamflow_data()
+
+    monkeypatch.chdir(twin)
+    monkeypatch.setenv('BOERNE_WAREHOUSE', '1')
+    assert StreamflowProcessor().update_streamflow_data()
+
+    twin_dir = twin / "boerne-water-supply/data/streamflow"
+    for name in ["all_stream_data.csv", "all_stream_stats.csv",
+                 "all_stream_gauge_sites.geojson", "current_sites_status.csv"]:
+        assert (twin_dir / name).read_bytes() == (workdir / name).read_bytes(), name
@@ -0,0 +1,48 @@
+import shutil
+import pandas as pd
+import pytest
+from conftest import DATA_DIR
+from use1_streamflow_data import StreamflowProcessor
+
+# Outputs the rebuild writes besides the data file
+REBUILT_FILES = ["all_stream_stats.csv", "current_sites_status.csv",
+                 "all_stream_gauge_sites.geojson", "streamflow_qa_report.csv"]
+
+
+@pytest.fixture
+def workdirs(tmp_path, monkeypatch):
+    """Two identical data directories holding a few years of the record."""
+    monkeypatch.delenv('BOERNE_WAREHOUSE', raising=False)
+    other_domains = {'pcp', 'reservoirs', 'demand', 'gw', 'quality', 'drought'}
+    first = tmp_path / "streaming/boerne-water-supply/data"
+    shutil.copytree(DATA_DIR, first, ignore=lambda path, names: other_domains & set(names))
+    for name in ["historic_stream_data.csv", "all_stream_data.csv"]:
+        path = first / "streamflow" / name
+        record = pd.read_csv(path, dtype={'site': str})
+        record[record['date'] >= '2019-01-01'].to_csv(path, index=False)
+    second = tmp_path / "in_memory/boerne-water-supply/data"
+    shutil.copytree(first, second)
+    return first.parents[1], second.parents[1]
+
+
+def rebuild(root, monkeypatch, streaming):
+    monkeypatch.chdir(root)
+    assert StreamflowProcessor(load_history=False).rebuild_streamflow_data(streaming)
+    return root / "boerne-water-supply/data/streamflow"
+
+
+def test_streaming_rebuild_matches_the_in_memory_rebuild(workdirs, monkeypatch):
+    # A ceiling this low splits the gauges into several buckets
+    monkeypatch.setenv('BOERNE_REBUILD_MEMORY_MB', '0.2')
+    streamed = rebuild(workdirs[0], monkeypatch, streaming=True)
+    in_memory = rebuild(workdirs[1], monkeypatch, streaming=False)
+
+    for name in REBUILT_FILES:
+        assert (streamed / name).read_bytes() == (in_memory / name).read_bytes(), name
+
+    # Streaming lists gauges in bucket order; the rows are the same
+    keys = ['site', 'date']
+    data = [pd.read_csv(directory / "all_stream_data.csv", dtype={'site': str})
+            .sort_values(keys).reset_index(drop=True) for directory in (streamed, in_memory)]
+    assert data[0]['site'].nunique() > 1
+    pd.testing.assert_frame_equal(data[0], data[1])
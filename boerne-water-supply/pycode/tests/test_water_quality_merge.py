@@ -0,0 +1,57 @@
+import logging
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import DATA_DIR
+from serve1_fake_services import QUALITY_HEADER
+from use1_water_quality_data import WaterQualityProcessor
+
+
+@pytest.fixture
+def processor():
+    # The merge needs no sheet client or data files
+    processor = WaterQualityProcessor.__new__(WaterQualityProcessor)
+    processor.logger = logging.getLogger(__name__)
+    return processor
+
+
+def sample(**values):
+    row = dict.fromkeys(WaterQualityProcessor.merge_keys, np.nan)
+    row.update(site_id='12600', date='2022-03-01', sample_depth=0.3,
+               flow_severity='Normal', name='Canyon Lake')
+    row.update(values)
+    return row
+
+
+@pytest.mark.parametrize('name', ['all_water_quality.csv', 'historic_water_quality.csv'])
+def test_remerge_keeps_published_rows(processor, name):
+    df = pd.read_csv(DATA_DIR / "quality" / name)
+    assert len(processor._merge_samples(df, df.iloc[:0])) == len(df)
+    assert len(processor._merge_samples(df, df)) == len(df)
+
+
+def test_readings_sharing_site_date_and_depth_are_kept(processor):
+    history = pd.DataFrame([sample(ecoli_avg=42.0)])
+    new = pd.DataFrame([sample(conductivity='440', water_temp='21.5')])
+    merged = processor._merge_samples(history, new)
+    assert len(merged) == 2
+    assert merged['ecoli_avg'].notna().sum() == 1
+
+
+def test_sheet_text_row_replaces_same_csv_row(processor):
+    history = pd.DataFrame([sample(date='2022-03-01', conductivity=440)])
+    new = pd.DataFrame([sample(date='3/1/2022', conductivity='440', name='Renamed')])
+    merged = processor._merge_samples(history, new)
+    assert merged['name'].tolist() == ['Renamed']
+    assert merged['conductivity'].tolist() == [440.0]
+
+
+def test_sheet_rows_keep_every_published_column(processor):
+    sheet = pd.DataFrame([dict(zip(QUALITY_HEADER, [
+        '12600', 'Canyon Lake', 'Guadalupe', 'Comal', 29.9, -98.28, '1805',
+        '3/1/2022', '0.3', 'Normal', '8.1', '440', '6.3', '20', '18', '', '0.3', ''
+    ]))])
+    processed = processor._process_quality_data(sheet)
+    published = pd.read_csv(DATA_DIR / "quality/all_water_quality.csv", nrows=0)
+    assert processed.columns.tolist() == published.columns.tolist()
+    assert processed['pH'].tolist() == ['8.1']
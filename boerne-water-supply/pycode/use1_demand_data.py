@@ -1,173 +1,300 @@
-from global0_set_apis_libraries import GlobalSetup
-import pandas as pd
-import geopandas as gpd
-from datetime import datetime
-import numpy as np
-from pathlib import Path
-from google.oauth2.service_account import Credentials
-import pygsheets
-from typing import Union, List, Dict
-
-class DemandDataProcessor:
-    """Process and analyze water demand data for Boerne Water Dashboard."""
-    
-    def __init__(self):
-        """Initialize with global setup configuration."""
-        # Initialize global setup
-        self.setup = GlobalSetup()
-        self.logger = self.setup.logger
-        
-        # Use paths from global setup
-        self.data_dir = self.setup.data_dir
-        self.demand_dir = self.data_dir / "demand"
-        self.demand_dir.mkdir(exist_ok=True)
-        
-        # Use state info from global setup
-        self.state_abb = self.setup.state_abb
-        self.state_fips = self.setup.state_fips
-        
-        # Use date settings from global setup
-        self.today = self.setup.today
-        self.current_year = self.setup.current_year
-        self.start_date = self.setup.start_date
-        self.end_date = self.setup.end_date
-        self.months = self.setup.months
-        
-        # Load utilities data
-        self._load_utility_data()
-        self._load_historical_data()
-        
-    def _load_utility_data(self):
-        """Load utility geojson data."""
-        try:
-            self.utilities = gpd.read_file(self.data_dir / "utility.geojson")
-            self.pwsid_list = self.utilities['pwsid'].unique()
-            self.logger.info("Utility data loaded successfully")
-        except Exception as e:
-            self.logger.error(f"Error loading utility data: {e}")
-            raise
-
-    def _load_historical_data(self):
-        """Load historical demand data using global setup paths."""
-        try:
-            self.old_total_demand = pd.read_csv(
-                self.demand_dir / "historic_total_demand.csv")
-            self.old_demand_by_source = pd.read_csv(
-                self.demand_dir / "historic_demand_by_source.csv")
-            self.old_reclaimed = pd.read_csv(
-                self.demand_dir / "historic_reclaimed_water.csv")
-            self.old_pop = pd.read_csv(
-                self.demand_dir / "historic_pop.csv")
-            self.logger.info("Historical data loaded successfully")
-        except Exception as e:
-            self.logger.error(f"Error loading historical data: {e}")
-            raise
-
-    def process_demand_by_source(self, demand_data: pd.DataFrame) -> pd.DataFrame:
-        """Process demand data by source using global setup utilities."""
-        try:
-            # Use global setup's moving average function for smoothing
-            df = demand_data.copy()
-            
-            # Convert values to MGD
-            mgd_columns = ['groundwater', 'boerne_lake', 'GBRA', 'reclaimed', 'total']
-            df[mgd_columns] = df[mgd_columns].apply(pd.to_numeric, errors='coerce').fillna(0) / 1000
-            
-            # Calculate moving averages using global setup's function
-            for col in mgd_columns:
-                df[f'{col}_ma'] = self.setup.moving_average(df[col].values)
-            
-            # Add julian dates using global setup's calendar
-            df = self.add_julian_dates(df)
-            
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error processing demand by source: {e}")
-            raise
-
-    def add_julian_dates(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Add julian dates using global setup's julian calendar."""
-        try:
-            df['date'] = pd.to_datetime(df['date'])
-            df['year'] = df['date'].dt.year
-            df['day_month'] = df['date'].dt.strftime('%m-%d')
-            
-            # Use global setup's julian reference
-            julian_ref = self.setup.julian_ref
-            
-            def get_julian_day(row):
-                is_leap = pd.Timestamp(row['date']).is_leap_year
-                day_month_col = 'day_month_leap' if is_leap else 'day_month'
-                julian_col = 'julian_index_leap' if is_leap else 'julian_index'
-                
-                return julian_ref.loc[
-                    julian_ref[day_month_col] == row['day_month'], 
-                    julian_col
-                ].iloc[0]
-            
-            df['julian'] = df.apply(get_julian_day, axis=1)
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error adding julian dates: {e}")
-            raise
-
-    def filter_new_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Filter new data using global setup's date settings."""
-        try:
-            return df[
-                (df['year'] >= 2022) & 
-                (df['date'] < self.today)
-            ].copy()
-        except Exception as e:
-            self.logger.error(f"Error filtering new data: {e}")
-            raise
-
-    def calculate_demand_statistics(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate demand statistics using global setup's utilities."""
-        try:
-            # Use global setup's moving average function
-            df['mean_demand'] = self.setup.moving_average(df['total'].values)
-            
-            # Calculate monthly peaks
-            df['peak_demand'] = df.groupby(['pwsid', 'year', 'month'])['total'].transform(
-                lambda x: x.quantile(0.98))
-            
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating statistics: {e}")
-            raise
-
-    def calculate_cumulative_demand(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate cumulative demand using global setup's date handling."""
-        try:
-            df_cum = df.copy()
-            df_cum['cum_demand'] = df_cum.groupby(['pwsid', 'year'])['total'].cumsum()
-            return df_cum
-        except Exception as e:
-            self.logger.error(f"Error calculating cumulative demand: {e}")
-            raise
-
-    def save_processed_data(self, df: pd.DataFrame):
-        """Save processed data using global setup's paths."""
-        try:
-            output_files = {
-                "all_demand_by_source.csv": df,
-                "all_total_demand.csv": df[['pwsid', 'date', 'total', 'mean_demand', 
-                                          'julian', 'month', 'year', 'peak_demand']],
-                "all_demand_cum.csv": self.calculate_cumulative_demand(df)
-            }
-            
-            for filename, data in output_files.items():
-                data.to_csv(self.demand_dir / filename, index=False)
-                self.logger.info(f"Saved {filename} successfully")
-                
-        except Exception as e:
-            self.logger.error(f"Error saving processed data: {e}")
-            raise
-
-if __name__ == "__main__":
-    processor = DemandDataProcessor()
+from global0_set_apis_libraries import GlobalSetup
+from global1_pipeline_stores import PipelineStores
+from global1_output_writer import OutputWriter
+from global1_rollup_cube import RollupCube
+from global1_quality_control import QualityControl
+import pandas as pd
+import geopandas as gpd
+from datetime import datetime
+import numpy as np
+from pathlib import Path
+from google.oauth2.service_account import Credentials
+import pygsheets
+from typing import Union, List, Dict
+
+class DemandDataProcessor:
+    """Process and analyze water demand data for Boerne Water Dashboard."""
+    
+    def __init__(self):
+        """Initialize with global setup configuration."""
+        # Initialize global setup
+        self.setup = GlobalSetup()
+        self.logger = self.setup.logger
+        self.stores = PipelineStores(self.setup.data_dir)
+        
+        # Use paths from global setup
+        self.data_dir = self.setup.data_dir
+        self.demand_dir = self.data_dir / "demand"
+        self.demand_dir.mkdir(exist_ok=True)
+        
+        # Monthly and annual demand aggregates, updated incrementally
+        self.rollup = RollupCube(self.demand_dir, "demand", key='pwsid', value='total')
+        self.qc = QualityControl('demand', self.demand_dir)
+        
+        # Daily demand by source, in MGD, as published and stored
+        self.source_columns = ['date', 'groundwater', 'boerne_lake', 'GBRA', 'reclaimed',
+                               'total', 'pwsid', 'year', 'day_month', 'julian', 'month', 'day']
+        
+        # Use state info from global setup
+        self.state_abb = self.setup.state_abb
+        self.state_fips = self.setup.state_fips
+        
+        # Use date settings from global setup
+        self.today = self.setup.today
+        self.current_year = self.setup.current_year
+        self.start_date = self.setup.start_date
+        self.end_date = self.setup.end_date
+        self.months = self.setup.months
+        
+        # Load utilities data
+        self._load_utility_data()
+        self._load_historical_data()
+        
+    def _load_utility_data(self):
+        """Load utility geojson data."""
+        try:
+            self.utilities = gpd.read_file(self.data_dir / "utility.geojson")
+            self.pwsid_list = self.utilities['pwsid'].unique()
+            self.logger.info("Utility data loaded successfully")
+        except Exception as e:
+            self.logger.error(f"Error loading utility data: {e}")
+            raise
+
+    def _load_historical_data(self):
+        """Load historical demand data using global setup paths."""
+        try:
+            self.old_total_demand = pd.read_csv(
+                self.demand_dir / "historic_total_demand.csv")
+            # Daily demand by source, from the warehouse when enabled. The
+            # historic file ends in 2021; the published file carries every
+            # later day, so outputs are rebuilt from both
+            warehouse = self.stores.warehouse
+            if warehouse is not None and warehouse.has_table('demand_observations'):
+                self.old_demand_by_source = warehouse.load('demand_observations')
+            else:
+                record = [pd.read_csv(self.demand_dir / "historic_demand_by_source.csv")]
+                published = self.demand_dir / "all_demand_by_source.csv"
+                if published.exists():
+                    record.append(pd.read_csv(published))
+                self.old_demand_by_source = self._combine_record(record)
+            self.old_reclaimed = pd.read_csv(
+                self.demand_dir / "historic_reclaimed_water.csv")
+            self.old_pop = pd.read_csv(
+                self.demand_dir / "historic_pop.csv")
+            self.logger.info("Historical data loaded successfully")
+        except Exception as e:
+            self.logger.error(f"Error loading historical data: {e}")
+            raise
+
+    @staticmethod
+    def _combine_record(parts: List[pd.DataFrame]) -> pd.DataFrame:
+        """Concatenate daily by-source frames; later frames win on shared days."""
+        df = pd.concat(parts, ignore_index=True)
+        df['pwsid'] = df['pwsid'].astype(str)
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.drop_duplicates(subset=['pwsid', 'date'], keep='last')
+        return df.sort_values(['pwsid', 'date']).reset_index(drop=True)
+
+    def process_demand_by_source(self, demand_data: pd.DataFrame) -> pd.DataFrame:
+        """Process demand data by source using global setup utilities."""
+        try:
+            # Use global setup's moving average function for smoothing
+            df = demand_data.copy()
+            
+            # Convert values to MGD
+            mgd_columns = ['groundwater', 'boerne_lake', 'GBRA', 'reclaimed', 'total']
+            df[mgd_columns] = df[mgd_columns].apply(pd.to_numeric, errors='coerce').fillna(0) / 1000
+            
+            # Calculate moving averages using global setup's function
+            for col in mgd_columns:
+                df[f'{col}_ma'] = self.setup.moving_average(df[col].values)
+            
+            # Add julian dates using global setup's calendar
+            df = self.add_julian_dates(df)
+            
+            return df
+            
+        except Exception as e:
+            self.logger.error(f"Error processing demand by source: {e}")
+            raise
+
+    def add_julian_dates(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add julian dates plus the month and day the demand outputs carry."""
+        try:
+            df = self.setup.add_julian_dates(df)
+            df['month'] = df['date'].dt.month
+            df['day'] = df['date'].dt.day
+            return df
+            
+        except Exception as e:
+            self.logger.error(f"Error adding julian dates: {e}")
+            raise
+
+    def filter_new_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Filter new data using global setup's date settings."""
+        try:
+            return df[
+                (df['year'] >= 2022) & 
+                (df['date'] < self.today)
+            ].copy()
+        except Exception as e:
+            self.logger.error(f"Error filtering new data: {e}")
+            raise
+
+    def calculate_demand_statistics(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calculate demand statistics using global setup's utilities."""
+        try:
+            period = ['pwsid', 'year', 'month']
+            df = df.sort_values(['pwsid', 'date']).reset_index(drop=True)
+            df['month'] = pd.to_datetime(df['date']).dt.month
+            
+            df['percent_of_total'] = (
+                df['reclaimed'] / df['total'].where(df['total'] > 0) * 100).fillna(0)
+            
+            # Flag placeholder zeros and spikes before aggregating
+            df = self.qc.screen(df)
+            
+            # Seven-day means of total demand and reclaimed water per utility,
+            # over the days that pass QA/QC
+            kept = df[['total', 'reclaimed']].where(df['qc_flag'] == 0, axis=0)
+            by_utility = kept.groupby(df['pwsid'])
+            df['mean_demand'] = by_utility['total'].transform(self.setup.moving_average)
+            df['mean_reclaimed'] = by_utility['reclaimed'].transform(self.setup.moving_average)
+            if not self.qc.any_passed(df):
+                return df.assign(peak_demand=np.nan, peak_reclaimed=np.nan)
+            passed = self.qc.passed(df)
+            
+            # Monthly peaks are the 98th percentile of the days that pass
+            # QA/QC, for both series: total demand from the rollup cube,
+            # reclaimed water in one grouped pass over the same rows
+            monthly, _ = self.rollup.update(passed)
+            peaks = monthly[period + ['p98']].rename(columns={'p98': 'peak_demand'})
+            reclaimed_peaks = (passed.groupby(period)['reclaimed'].quantile(0.98)
+                               .rename('peak_reclaimed').reset_index())
+            peaks = peaks.astype({'pwsid': str, 'year': int, 'month': int}).merge(
+                reclaimed_peaks, on=period, how='outer')
+            
+            df = df.drop(columns=['peak_demand', 'peak_reclaimed'], errors='ignore').merge(
+                peaks, on=period, how='left')
+            
+            return df
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating statistics: {e}")
+            raise
+
+    def calculate_population(self, df: pd.DataFrame = None) -> pd.DataFrame:
+        """Population history plus any newer rows carried with the demand data."""
+        try:
+            pop = self.old_pop[['date', 'clb_pop', 'wsb_pop', 'pwsid']]
+            if df is not None and {'clb_pop', 'wsb_pop'}.issubset(df.columns):
+                new_pop = df.loc[df['year'] >= 2022, ['date', 'clb_pop', 'wsb_pop']].dropna()
+                pop = pd.concat([pop, new_pop.assign(pwsid=pop['pwsid'].iloc[0])])
+            
+            pop = pop.assign(date=pd.to_datetime(pop['date'])).drop_duplicates(
+                subset=['pwsid', 'date'], keep='last').sort_values('date')
+            pop = self.add_julian_dates(pop.reset_index(drop=True))
+            return pop[['date', 'clb_pop', 'wsb_pop', 'year', 'day_month', 'julian',
+                        'month', 'day', 'pwsid']]
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating population: {e}")
+            raise
+
+    def _dashboard_table(self, df: pd.DataFrame, value: str, name: str,
+                         mean: str, peak: str) -> pd.DataFrame:
+        """Daily series in the layout the dashboard tabs read."""
+        dates = pd.to_datetime(df['date'])
+        month_abb = np.array(self.months)[dates.dt.month - 1]
+        return pd.DataFrame({
+            'pwsid': df['pwsid'],
+            'date': month_abb + '-' + dates.dt.day.astype(str),
+            name: df[value].round(2),
+            mean: df[mean].round(2),
+            'julian': dates.dt.dayofyear,
+            'month': dates.dt.month,
+            'monthAbb': month_abb,
+            'year': dates.dt.year,
+            peak: df[peak].round(1),
+            'date2': dates
+        })
+
+    def calculate_cumulative_demand(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Year-to-date demand per utility, in the R pipeline's layout."""
+        try:
+            dates = pd.to_datetime(df['date'])
+            month_abb = np.array(self.months)[dates.dt.month - 1]
+            # Running sums of the published daily demand, as R summed them
+            cum_demand = df['total'].round(2).groupby([df['pwsid'], dates.dt.year]).cumsum()
+            return pd.DataFrame({
+                'pwsid': df['pwsid'],
+                'year': dates.dt.year,
+                'julian': dates.dt.dayofyear,
+                'date': month_abb + '-' + dates.dt.day.astype(str),
+                'demand_mgd': cum_demand.round(2)
+            })
+        except Exception as e:
+            self.logger.error(f"Error calculating cumulative demand: {e}")
+            raise
+
+    def _store_warehouse(self, df: pd.DataFrame):
+        """Upsert this run's demand rows into the warehouse."""
+        warehouse = self.stores.warehouse
+        if warehouse is None:
+            return
+        try:
+            warehouse.upsert('demand_observations', df, ['pwsid', 'date'])
+        except Exception as e:
+            self.logger.error(f"Error storing demand warehouse tables: {e}")
+            raise
+
+    def save_processed_data(self, df: pd.DataFrame):
+        """Save processed data using global setup's paths."""
+        try:
+            reclaimed = self._dashboard_table(
+                df, 'reclaimed', 'reclaimed', 'mean_reclaimed', 'peak_reclaimed')
+            # The R pipeline published julian as text in these two files
+            pop = self.calculate_population(df)
+            output_files = {
+                "all_demand_by_source.csv": df[self.source_columns].astype({'julian': str}),
+                "all_total_demand.csv": self._dashboard_table(
+                    df, 'total', 'demand_mgd', 'mean_demand', 'peak_demand'),
+                "all_demand_cum.csv": self.calculate_cumulative_demand(df),
+                "all_reclaimed_water.csv": reclaimed,
+                "all_reclaimed_percent_of_total.csv": reclaimed.assign(
+                    total=df['total'], percent_of_total=df['percent_of_total']),
+                "all_pop.csv": pop.astype({'julian': str})
+            }
+            
+            with OutputWriter(self.setup.output_workers) as out:
+                for filename, data in output_files.items():
+                    out.csv(data, self.demand_dir / filename)
+            self.logger.info(f"Saved {', '.join(output_files)} successfully")
+            
+            self._store_warehouse(df[self.source_columns])
+            self.stores.deltas.publish('demand')
+                
+        except Exception as e:
+            self.logger.error(f"Error saving processed data: {e}")
+            raise
+
+    def update_demand_data(self) -> bool:
+        """Main method to rebuild every demand output from the daily record.
+        
+        The record is the historic file plus every published day, so a
+        rebuild never publishes a shorter series than the one it replaces.
+        """
+        try:
+            df = self.add_julian_dates(self.old_demand_by_source.copy())
+            df = self.calculate_demand_statistics(df)
+            self.save_processed_data(df)
+            self.logger.info(f"Processed {len(df)} daily demand rows")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error updating demand data: {e}")
+            raise
+
+if __name__ == "__main__":
+    processor = DemandDataProcessor()
     processor.update_demand_data()
\ No newline at end of file
@@ -1,245 +1,435 @@
-import pandas as pd
-import geopandas as gpd
-from datetime import datetime
-import numpy as np
-from pathlib import Path
-from google.oauth2.service_account import Credentials
-import pygsheets
-from typing import Union, List, Dict
-from global0_set_apis_libraries import GlobalSetup
-
-class GroundwaterProcessor:
-    """Process and analyze groundwater data for Boerne Water Dashboard."""
-    
-    def __init__(self):
-        """Initialize with global setup configuration."""
-        self.setup = GlobalSetup()
-        self.logger = self.setup.logger
-        
-        # Paths
-        self.gw_dir = self.setup.data_dir / "gw"
-        self.gw_dir.mkdir(exist_ok=True)
-        
-        # Load initial data
-        self._load_historical_data()
-        
-    def _load_historical_data(self):
-        """Load historical groundwater data and metadata."""
-        try:
-            self.well_metadata = pd.read_csv(self.gw_dir / "well_metadata.csv")
-            self.historic_data = pd.read_csv(self.gw_dir / "historic_gw_depth.csv")
-            self.historic_data['date'] = pd.to_datetime(self.historic_data['date'])
-            self.historic_data['site'] = self.historic_data['site'].astype(str)
-            
-            self.logger.info("Historical groundwater data loaded successfully")
-        except Exception as e:
-            self.logger.error(f"Error loading historical data: {e}")
-            raise
-            
-    def _fetch_gsheet_data(self) -> pd.DataFrame:
-        """Fetch new groundwater data from Google Sheets."""
-        try:
-            gc = pygsheets.authorize(service_account_env_var='GSHEET_SERVICE_ACCOUNT')
-            sheet_id = "1QoaOhrpz6vrSMBc0yc5-i7nhwj2lmsBHZFYOBJc0KVU"
-            sheet = gc.open_by_key(sheet_id)
-            
-            all_well_metadata = pd.DataFrame()
-            all_well_data = pd.DataFrame()
-            
-            # Process each sheet (1-42)
-            for sheet_num in range(1, 43):
-                # Get metadata
-                metadata = sheet[sheet_num-1].get_values('A2:X3', value_render='UNFORMATTED_VALUE')
-                metadata_df = pd.DataFrame(metadata[1:], columns=metadata[0])
-                metadata_df['Long_Va'] = metadata_df.iloc[0, 1]
-                metadata_df['Lat_Va'] = metadata_df.iloc[0, 2]
-                
-                # Get well data
-                data = sheet[sheet_num-1].get_values('A6:C', value_render='UNFORMATTED_VALUE')
-                data_df = pd.DataFrame(data[1:], columns=['date', 'depth_ft', 'elevation'])
-                data_df['State_Number'] = metadata_df.iloc[0, 14]
-                
-                all_well_metadata = pd.concat([all_well_metadata, metadata_df])
-                all_well_data = pd.concat([all_well_data, data_df])
-                
-                self.logger.info(f"Completed sheet {sheet_num} ({sheet_num/42*100:.1f}% complete)")
-                
-            return all_well_metadata, all_well_data
-            
-        except Exception as e:
-            self.logger.error(f"Error fetching Google Sheets data: {e}")
-            raise
-            
-    def process_groundwater_data(self, well_data: pd.DataFrame) -> pd.DataFrame:
-        """Process groundwater data with proper formatting and julian dates."""
-        try:
-            df = well_data.copy()
-            
-            # Rename columns
-            df = df.rename(columns={
-                'State_Number': 'site',
-                'elevation': 'elevation_at_waterlevel'
-            })
-            
-            # Convert types
-            df['site'] = df['site'].astype(str)
-            df['date'] = pd.to_datetime(df['date'])
-            df['depth_ft'] = pd.to_numeric(df['depth_ft'], errors='coerce')
-            
-            # Add julian dates using global setup
-            df['year'] = df['date'].dt.year
-            df['day_month'] = df['date'].dt.strftime('%m-%d')
-            
-            df = self.setup.add_julian_dates(df)
-            
-            # Add agency
-            df['agency'] = 'CCGCD'
-            
-            # Remove missing data
-            df = df.dropna()
-            
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error processing groundwater data: {e}")
-            raise
-            
-    def calculate_statistics(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate groundwater statistics by site and julian day."""
-        try:
-            stats = []
-            
-            for site in df['site'].unique():
-                site_data = df[df['site'] == site]
-                
-                # Calculate stats by julian day
-                site_stats = (site_data.groupby(['site', 'julian'])
-                            .agg({
-                                'depth_ft': [
-                                    'count',
-                                    'min',
-                                    lambda x: np.percentile(x, 10),
-                                    lambda x: np.percentile(x, 25),
-                                    lambda x: np.percentile(x, 50),
-                                    lambda x: np.percentile(x, 75),
-                                    lambda x: np.percentile(x, 90),
-                                    'max'
-                                ]
-                            }).reset_index())
-                
-                stats.append(site_stats)
-                
-            stats_df = pd.concat(stats)
-            
-            # Rename columns
-            stats_df.columns = [
-                'site', 'julian', 'Nobs', 'min', 'flow10', 'flow25',
-                'flow50', 'flow75', 'flow90', 'max'
-            ]
-            
-            return stats_df
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating statistics: {e}")
-            raise
-            
-    def determine_status(self, current: float, stats: pd.Series) -> str:
-        """Determine groundwater status based on percentiles."""
-        if pd.isna(current):
-            return "unknown"
-        elif current <= stats['flow10']:
-            return "Extremely Wet"
-        elif current <= stats['flow25']:
-            return "Very Wet"
-        elif current < stats['flow50']:
-            return "Moderately Wet"
-        elif current < stats['flow75']:
-            return "Moderately Dry"
-        elif current < stats['flow90']:
-            return "Very Dry"
-        else:
-            return "Extremely Dry"
-            
-    def create_geojson(self, df: pd.DataFrame, stats: pd.DataFrame) -> gpd.GeoDataFrame:
-        """Create GeoJSON with current conditions."""
-        try:
-            # Merge current conditions with stats
-            current_conditions = df.merge(
-                stats,
-                on=['site', 'julian'],
-                how='left'
-            )
-            
-            # Add status
-            current_conditions['status'] = current_conditions.apply(
-                lambda row: self.determine_status(row['depth_ft'], row),
-                axis=1
-            )
-            
-            # Create GeoDataFrame
-            gdf = gpd.GeoDataFrame(
-                current_conditions,
-                geometry=gpd.points_from_xy(
-                    self.well_metadata['dec_long_va'],
-                    self.well_metadata['dec_lat_va']
-                ),
-                crs="EPSG:4326"
-            )
-            
-            return gdf
-            
-        except Exception as e:
-            self.logger.error(f"Error creating GeoJSON: {e}")
-            raise
-            
-    def save_outputs(self, df: pd.DataFrame, stats: pd.DataFrame, gdf: gpd.GeoDataFrame):
-        """Save all processed data files."""
-        try:
-            # Save main depth data
-            df.to_csv(self.gw_dir / "all_gw_depth.csv", index=False)
-            
-            # Save monthly averages
-            monthly_avg = (df.groupby(['site', pd.Grouper(key='date', freq='M')])
-                         .agg({'depth_ft': 'mean'})
-                         .reset_index())
-            monthly_avg.to_csv(self.gw_dir / "all_monthly_avg.csv", index=False)
-            
-            # Save statistics
-            stats.to_csv(self.gw_dir / "all_gw_stats.csv", index=False)
-            
-            # Save GeoJSON
-            gdf.to_file(self.gw_dir / "all_gw_sites.geojson", driver='GeoJSON')
-            
-            self.logger.info("All groundwater data files saved successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error saving output files: {e}")
-            raise
-            
-    def update_groundwater_data(self):
-        """Main method to update all groundwater-related data."""
-        try:
-            # Fetch new data
-            well_metadata, well_data = self._fetch_gsheet_data()
-            
-            # Process new data
-            processed_data = self.process_groundwater_data(well_data)
-            
-            # Calculate statistics
-            stats = self.calculate_statistics(processed_data)
-            
-            # Create GeoJSON with current conditions
-            geojson = self.create_geojson(processed_data, stats)
-            
-            # Save all outputs
-            self.save_outputs(processed_data, stats, geojson)
-            
-            self.logger.info("Groundwater data update completed successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error in groundwater update process: {e}")
-            raise
-
-if __name__ == "__main__":
-    processor = GroundwaterProcessor()
+import pandas as pd
+import geopandas as gpd
+from datetime import datetime
+import numpy as np
+from pathlib import Path
+from google.oauth2.service_account import Credentials
+import pygsheets
+from typing import Union, List, Dict, Optional, Tuple
+from global0_set_apis_libraries import GlobalSetup
+from global1_pipeline_stores import PipelineStores
+from global1_climatology_table import ClimatologyTable
+from global1_output_writer import OutputWriter
+from global1_quality_control import QualityControl
+from global1_rollup_cube import RollupCube
+from global1_sharded_stats import latest_rows, percentile_stats, run_sharded
+from global1_watermark_catalog import SOURCE_KEY
+
+class GroundwaterProcessor:
+    """Process and analyze groundwater data for Boerne Water Dashboard."""
+    
+    def __init__(self):
+        """Initialize with global setup configuration."""
+        self.setup = GlobalSetup()
+        self.logger = self.setup.logger
+        self.stores = PipelineStores(self.setup.data_dir)
+        
+        # Paths
+        self.gw_dir = self.setup.data_dir / "gw"
+        self.gw_dir.mkdir(exist_ok=True)
+        self.climatology_path = self.gw_dir / "gw_climatology.npy"
+        self.qc = QualityControl('groundwater', self.gw_dir)
+        
+        # Monthly and annual depth aggregates, updated incrementally
+        self.rollup = RollupCube(self.gw_dir, "gw", value='depth_ft')
+        
+        # Well workbook; its revision and each well's last row read are kept
+        # in the watermark catalog, and the last few readings are re-read
+        # in case they were corrected
+        self.sheet_id = "1QoaOhrpz6vrSMBc0yc5-i7nhwj2lmsBHZFYOBJc0KVU"
+        self.overlap_rows = 2
+        self._pending_marks = None
+        self._full_sites = set()
+        
+        # Depths of the last published update, which incremental reads extend
+        self.depth_data = None
+        
+        # Load initial data
+        self._load_historical_data()
+        
+    def _load_historical_data(self):
+        """Load historical groundwater data and metadata."""
+        try:
+            self.well_metadata = pd.read_csv(self.gw_dir / "well_metadata.csv")
+            self.site_cache = self._build_site_cache()
+            
+            # Historical depths, from the warehouse when enabled
+            warehouse = self.stores.warehouse
+            if warehouse is not None and warehouse.has_table('groundwater_observations'):
+                self.historic_data = warehouse.load('groundwater_observations')
+            else:
+                self.historic_data = pd.read_csv(self.gw_dir / "historic_gw_depth.csv")
+            self.historic_data['date'] = pd.to_datetime(self.historic_data['date'])
+            self.historic_data['site'] = self.historic_data['site'].astype(str)
+            
+            self.logger.info("Historical groundwater data loaded successfully")
+        except Exception as e:
+            self.logger.error(f"Error loading historical data: {e}")
+            raise
+            
+    def _build_site_cache(self) -> gpd.GeoDataFrame:
+        """Build site-keyed well attributes and point geometry once."""
+        try:
+            meta = self.well_metadata.dropna(subset=['state_id'])
+            site_index = pd.Index(
+                meta['state_id'].astype('int64').astype(str), name='site'
+            )
+            
+            cache = gpd.GeoDataFrame(
+                {
+                    'AgencyCd': meta['agency'].to_numpy(),
+                    'SiteName': meta['location'].to_numpy(),
+                    'elevation': meta['elevation'].to_numpy(),
+                    'WellDepth': meta['total_depth'].to_numpy(),
+                    'LocalAquiferName': meta['aquifer'].to_numpy()
+                },
+                geometry=gpd.points_from_xy(meta['dec_long_va'], meta['dec_lat_va']),
+                index=site_index,
+                crs="EPSG:4326"
+            )
+            
+            return cache[~cache.index.duplicated(keep='first')]
+            
+        except Exception as e:
+            self.logger.error(f"Error building well site cache: {e}")
+            raise
+            
+    def _published_depths(self) -> Optional[pd.DataFrame]:
+        """Depths of the last published update, or None to read every row."""
+        if self.depth_data is not None:
+            return self.depth_data
+        path = self.gw_dir / "all_gw_depth.csv"
+        if not self.stores.watermarks.marks('groundwater') or not path.exists():
+            return None
+        depths = pd.read_csv(path, dtype={'site': str})
+        # Files from before this processor lack its columns
+        if not {'elevation_at_waterlevel', 'agency'} <= set(depths.columns):
+            return None
+        depths['date'] = pd.to_datetime(depths['date'])
+        return depths.drop(columns='qc_flag', errors='ignore')
+            
+    def _fetch_gsheet_data(self) -> pd.DataFrame:
+        """Fetch new groundwater data from Google Sheets."""
+        try:
+            gc = self.setup.authorize_sheets()
+            sheet = gc.open_by_key(self.sheet_id)
+            
+            # Skip the 42 worksheet reads when the workbook hasn't changed
+            marks = self.stores.watermarks
+            if sheet.updated == marks.revision('groundwater'):
+                self.logger.info("Groundwater workbook unchanged since last update")
+                return None, None
+            
+            # Wells with a mark only read the rows added since, when there
+            # are published depths to add them to
+            incremental = self._published_depths() is not None
+            self._pending_marks = {SOURCE_KEY: {'revision': sheet.updated}}
+            self._full_sites = set()
+            
+            all_well_metadata = pd.DataFrame()
+            all_well_data = pd.DataFrame()
+            
+            # Process each sheet (1-42)
+            for sheet_num in range(1, 43):
+                metadata_df, data_df = self._fetch_well_sheet(
+                    sheet[sheet_num-1], incremental
+                )
+                
+                all_well_metadata = pd.concat([all_well_metadata, metadata_df])
+                all_well_data = pd.concat([all_well_data, data_df])
+                
+                self.logger.info(f"Completed sheet {sheet_num} ({sheet_num/42*100:.1f}% complete)")
+                
+            return all_well_metadata, all_well_data
+            
+        except Exception as e:
+            self.logger.error(f"Error fetching Google Sheets data: {e}")
+            raise
+            
+    def _fetch_well_sheet(self, worksheet,
+                          incremental: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Read one well's metadata and depth rows from its worksheet.
+        
+        The last sheet row read is recorded as the well's pending mark.
+        """
+        # Get metadata
+        metadata = worksheet.get_values('A2', 'X3', value_render='UNFORMATTED_VALUE')
+        metadata_df = pd.DataFrame(metadata[1:], columns=metadata[0])
+        metadata_df['Long_Va'] = metadata_df.iloc[0, 1]
+        metadata_df['Lat_Va'] = metadata_df.iloc[0, 2]
+        site = str(metadata_df.iloc[0, 14])
+        
+        # Get well data: the rows after the well's mark, or all of them
+        last_row = self.stores.watermarks.get('groundwater', site).get('row')
+        if incremental and last_row:
+            first_row = max(last_row + 1 - self.overlap_rows, 7)
+            data = []
+            if first_row <= worksheet.rows:
+                data = worksheet.get_values(
+                    (first_row, 1), (worksheet.rows, 3),
+                    include_tailing_empty_rows=False,
+                    value_render='UNFORMATTED_VALUE'
+                )
+            last_row = first_row - 1 + len(data)
+        else:
+            data = worksheet.get_values(
+                'A6', (worksheet.rows, 3),
+                include_tailing_empty_rows=False,
+                value_render='UNFORMATTED_VALUE'
+            )[1:]
+            last_row = 6 + len(data)
+            self._full_sites.add(site)
+        data_df = pd.DataFrame(data, columns=['date', 'depth_ft', 'elevation'])
+        data_df['State_Number'] = metadata_df.iloc[0, 14]
+        
+        self._pending_marks[site] = {'row': last_row}
+        return metadata_df, data_df
+            
+    def process_groundwater_data(self, well_data: pd.DataFrame) -> pd.DataFrame:
+        """Process groundwater data with proper formatting and julian dates."""
+        try:
+            df = well_data.copy()
+            
+            # Rename columns
+            df = df.rename(columns={
+                'State_Number': 'site',
+                'elevation': 'elevation_at_waterlevel'
+            })
+            
+            # Convert types
+            df['site'] = df['site'].astype(str)
+            df['date'] = pd.to_datetime(df['date'])
+            df['depth_ft'] = pd.to_numeric(df['depth_ft'], errors='coerce')
+            
+            # Add julian dates using global setup
+            df = self.setup.add_julian_dates(df)
+            
+            # Add agency
+            df['agency'] = 'CCGCD'
+            
+            # Remove missing data
+            df = df.dropna()
+            
+            return df
+            
+        except Exception as e:
+            self.logger.error(f"Error processing groundwater data: {e}")
+            raise
+            
+    def _merge_published(self, new_data: pd.DataFrame) -> pd.DataFrame:
+        """Add incrementally read rows to the published depths.
+        
+        Wells read in full replace their published rows; re-read rows
+        replace the earlier reading of the same day.
+        """
+        try:
+            published = self._published_depths()
+            if published is None:
+                return new_data
+            published = published[~published['site'].isin(self._full_sites)]
+            return (pd.concat([published, new_data], ignore_index=True)
+                    .drop_duplicates(['site', 'date'], keep='last')
+                    .sort_values(['site', 'date'], kind='mergesort')
+                    .reset_index(drop=True))
+            
+        except Exception as e:
+            self.logger.error(f"Error merging groundwater data: {e}")
+            raise
+            
+    def _save_watermarks(self, new_data: pd.DataFrame):
+        """Record the workbook revision and each well's last row and date."""
+        marks = self._pending_marks
+        for site, last_date in new_data.groupby('site')['date'].max().items():
+            marks.setdefault(site, {})['last_date'] = last_date.strftime('%Y-%m-%d')
+        self.stores.watermarks.update('groundwater', marks)
+            
+    def calculate_statistics(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calculate groundwater statistics by site and julian day."""
+        try:
+            return run_sharded(
+                df,
+                percentile_stats,
+                'site',
+                ['site', 'julian'],
+                workers=self.setup.stat_workers,
+                value_col='depth_ft'
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating statistics: {e}")
+            raise
+            
+    def determine_status(self, current: float, stats: pd.Series) -> str:
+        """Determine groundwater status based on percentiles."""
+        if pd.isna(current):
+            return "unknown"
+        elif current <= stats['flow10']:
+            return "Extremely Wet"
+        elif current <= stats['flow25']:
+            return "Very Wet"
+        elif current < stats['flow50']:
+            return "Moderately Wet"
+        elif current < stats['flow75']:
+            return "Moderately Dry"
+        elif current < stats['flow90']:
+            return "Very Dry"
+        else:
+            return "Extremely Dry"
+            
+    def calculate_current_conditions(self, df: pd.DataFrame,
+                                     climatology: ClimatologyTable) -> pd.DataFrame:
+        """Classify the latest observation for each site."""
+        try:
+            # Latest observation per site in a single grouped index operation
+            current = run_sharded(
+                df, latest_rows, 'site', ['site'],
+                workers=self.setup.stat_workers, date_col='date'
+            )
+            
+            # Look up the (site, julian) envelope from the climatology table
+            current = pd.concat(
+                [current, climatology.lookup(current['site'], current['julian'])],
+                axis=1
+            )
+            
+            # Add status
+            current['status'] = current.apply(
+                lambda row: self.determine_status(row['depth_ft'], row),
+                axis=1
+            )
+            
+            return current
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating current conditions: {e}")
+            raise
+            
+    def create_geojson(self, df: pd.DataFrame, climatology: ClimatologyTable) -> gpd.GeoDataFrame:
+        """Create GeoJSON with current conditions."""
+        try:
+            current = self.calculate_current_conditions(df, climatology)
+            current['date'] = current['date'].dt.strftime('%Y-%m-%d')
+            
+            # Attach geometry from the site cache, one row per well
+            gdf = self.site_cache.join(
+                current.set_index('site')[
+                    ['status', 'depth_ft', 'julian', 'flow50', 'date']
+                ],
+                how='inner'
+            ).reset_index()
+            
+            return gdf
+            
+        except Exception as e:
+            self.logger.error(f"Error creating GeoJSON: {e}")
+            raise
+            
+    def save_outputs(self, df: pd.DataFrame, stats: Optional[pd.DataFrame],
+                     gdf: Optional[gpd.GeoDataFrame]):
+        """Save all processed data files.
+        
+        ``stats=None`` (no row passed QA/QC) saves the depths only and keeps
+        the published summaries, stats and status.
+        """
+        try:
+            if stats is None:
+                with OutputWriter(self.setup.output_workers) as out:
+                    out.csv(df, self.gw_dir / "all_gw_depth.csv")
+                self.logger.info("Groundwater depths saved without statistics")
+                return
+            
+            # Monthly averages and annual medians from the rollup cube
+            monthly, annual = self.rollup.update(self.qc.passed(df))
+            
+            monthly_avg = monthly[['site', 'year', 'month']].copy()
+            monthly_avg['date'] = pd.to_datetime(
+                dict(year=monthly['year'], month=monthly['month'], day=1)
+            )
+            monthly_avg['mean_depth_ft'] = monthly['mean'].round(2)
+            monthly_avg['julian'] = monthly_avg['date'].dt.dayofyear
+            monthly_avg['date'] = monthly_avg['date'].dt.strftime('%Y-%m-%d')
+            monthly_avg = monthly_avg[
+                ['site', 'date', 'mean_depth_ft', 'month', 'year', 'julian']
+            ]
+            
+            annual_median = annual[['site', 'year']].copy()
+            annual_median['medianDepth'] = annual['median'].round(2)
+            annual_median['nobsv'] = annual['count']
+            
+            with OutputWriter(self.setup.output_workers) as out:
+                out.csv(df, self.gw_dir / "all_gw_depth.csv")
+                out.csv(monthly_avg, self.gw_dir / "all_monthly_avg.csv")
+                out.csv(annual_median, self.gw_dir / "all_gw_annual.csv")
+                out.csv(stats, self.gw_dir / "all_gw_stats.csv")
+                out.geojson(gdf, self.gw_dir / "all_gw_sites.geojson")
+            
+            self.logger.info("All groundwater data files saved successfully")
+            
+        except Exception as e:
+            self.logger.error(f"Error saving output files: {e}")
+            raise
+            
+    def _store_warehouse(self, df: pd.DataFrame, stats: Optional[pd.DataFrame],
+                         gdf: Optional[gpd.GeoDataFrame]):
+        """Upsert this run's tables into the warehouse."""
+        warehouse = self.stores.warehouse
+        if warehouse is None:
+            return
+        try:
+            warehouse.upsert('groundwater_observations', df, ['site', 'date'])
+            if stats is not None:
+                warehouse.replace('groundwater_stats', stats, ['site', 'julian'])
+                warehouse.replace('groundwater_current', gdf, ['site'])
+            warehouse.replace('groundwater_sites', self.site_cache.reset_index(), ['site'])
+            
+        except Exception as e:
+            self.logger.error(f"Error storing groundwater warehouse tables: {e}")
+            raise
+            
+    def update_groundwater_data(self) -> bool:
+        """Main method to update all groundwater-related data.
+        
+        Returns True when new data was published.
+        """
+        try:
+            # Fetch new data
+            well_metadata, well_data = self._fetch_gsheet_data()
+            if well_data is None:
+                return False
+            
+            # Process new data
+            new_data = self.process_groundwater_data(well_data)
+            processed_data = self._merge_published(new_data)
+            
+            # Flag suspect depths; statistics only use rows that pass
+            processed_data = self.qc.screen(processed_data)
+            stats = geojson = None
+            if self.qc.any_passed(processed_data):
+                passed = self.qc.passed(processed_data)
+                
+                # Calculate statistics
+                stats = self.calculate_statistics(passed)
+                
+                # Persist percentiles as a memory-mapped lookup table
+                climatology = ClimatologyTable.ensure(stats, self.climatology_path)
+                
+                # Create GeoJSON with current conditions
+                geojson = self.create_geojson(passed, climatology)
+            
+            # Save all outputs
+            self.save_outputs(processed_data, stats, geojson)
+            self._store_warehouse(processed_data, stats, geojson)
+            self.stores.deltas.publish('gw')
+            self._save_watermarks(new_data)
+            self.depth_data = processed_data.drop(columns='qc_flag')
+            
+            self.logger.info("Groundwater data update completed successfully")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error in groundwater update process: {e}")
+            raise
+
+if __name__ == "__main__":
+    processor = GroundwaterProcessor()
     processor.update_groundwater_data()
\ No newline at end of file
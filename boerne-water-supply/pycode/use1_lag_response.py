@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from global0_set_apis_libraries import GlobalSetup
+from global1_output_writer import write_csv
+from global1_lag_correlation import daily_matrix, lag_response_table, lagged_correlation
+
+class LagResponseProcessor:
+    """Lagged correlation of rainfall with flow, well levels and lake levels."""
+
+    def __init__(self):
+        """Initialize with global setup and configuration."""
+        self.setup = GlobalSetup()
+        self.logger = self.setup.logger
+
+        # Lags of 0-180 days, each needing 60 overlapping days
+        self.max_lag = 180
+        self.min_overlap = 60
+
+        # Response series: file, site column, value column and a transform
+        # oriented so that rainfall raises the response
+        self.responses = {
+            'streamflow': ("streamflow/all_stream_data.csv", 'site', 'flow', np.log1p),
+            'groundwater': ("gw/all_gw_depth.csv", 'site', 'depth_ft', np.negative),
+            'reservoirs': ("reservoirs/all_reservoir_data.csv", 'NIDID', 'elev_Ft', None)
+        }
+        self.output_path = self.setup.data_dir / "pcp" / "pcp_lag_response.csv"
+
+    def _load(self, filename: str, site_col: str) -> pd.DataFrame:
+        return pd.read_csv(self.setup.data_dir / filename, dtype={site_col: str})
+
+    def calculate_lag_response(self) -> pd.DataFrame:
+        """Lag-response summary for every precipitation station and response site."""
+        try:
+            rainfall = self._load("pcp/all_pcp_data.csv", 'id')
+            series = {
+                domain: self._load(filename, site_col)
+                for domain, (filename, site_col, _, _) in self.responses.items()
+            }
+
+            # One daily calendar covering every series
+            dates = pd.concat(
+                [pd.to_datetime(rainfall['date'])]
+                + [pd.to_datetime(df['date']) for df in series.values()]
+            )
+            calendar = pd.date_range(dates.min(), dates.max(), freq='D')
+            drivers, stations = daily_matrix(rainfall, 'id', 'date', 'pcp_in', calendar)
+
+            tables = []
+            for domain, (_, site_col, value_col, transform) in self.responses.items():
+                df = series[domain]
+                if transform is not None:
+                    df = df.assign(**{value_col: transform(df[value_col])})
+                responses, sites = daily_matrix(df, site_col, 'date', value_col, calendar)
+
+                corr, overlap = lagged_correlation(
+                    drivers, responses, self.max_lag, self.min_overlap
+                )
+                table = lag_response_table(corr, overlap, stations, sites)
+                tables.append(table.assign(domain=domain))
+                self.logger.info(
+                    f"Correlated {len(stations)} precipitation stations with "
+                    f"{len(sites)} {domain} sites"
+                )
+
+            table = pd.concat(tables, ignore_index=True).rename(
+                columns={'driver': 'id', 'response': 'site'}
+            )
+            leading = ['id', 'domain', 'site']
+            return table[leading + [col for col in table.columns if col not in leading]]
+
+        except Exception as e:
+            self.logger.error(f"Error calculating lag response: {e}")
+            raise
+
+    def update_lag_response(self) -> bool:
+        """Main method to recompute and publish the lag-response table."""
+        try:
+            table = self.calculate_lag_response()
+            write_csv(table, self.output_path, precision=3)
+            self.logger.info(f"Saved {len(table)} station pairs to {self.output_path}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error updating lag response: {e}")
+            raise
+
+if __name__ == "__main__":
+    processor = LagResponseProcessor()
+    processor.update_lag_response()
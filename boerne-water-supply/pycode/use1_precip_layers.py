@@ -0,0 +1,314 @@
+import argparse
+import numpy as np
+import geopandas as gpd
+import shapely
+import rasterio
+from rasterio import features, windows
+from rasterio.crs import CRS
+from rasterio.warp import transform_bounds
+from typing import Dict, List, Optional, Tuple
+from global0_set_apis_libraries import GlobalSetup
+from global1_output_writer import OutputWriter
+
+# Map layers built from gridded rasters. 'source' names the raster a layer
+# is read from; bins are (edge, band, color) legend classes. With
+# closed='right' a value belongs to the first bin whose edge it does not
+# exceed; with closed='left' to the last bin whose edge it reaches, and
+# values below the first edge are left unmapped.
+PRECIP_LAYERS = {
+    'pcp_7day_obsv': {
+        # Band 1 of the NWS last-7-days file: observed precipitation (in)
+        'source': 'nws_7day',
+        'band': 1,
+        'closed': 'right',
+        'text_bands': False,
+        'bins': [
+            (0, 0, 'white'), (0.1, 0.1, '#3fc1bf'), (0.25, 0.25, '#87b2c0'),
+            (0.5, 0.5, '#000080'), (1, 1, '#00fc02'), (2, 2, '#316400'),
+            (3, 3, 'yellow'), (4, 4, '#f7e08b'), (5, 5, 'orange'),
+            (6, 6, 'red'), (8, 8, '#9a0000'), (10, 10, '#4e0000'),
+            (15, 15, '#e00079'), (20, 20, '#8e2eff'), (np.inf, 30, '#8e2eff')
+        ]
+    },
+    'pcp_7day_percent_normal': {
+        # Band 4 of the NWS last-7-days file: percent of normal
+        'source': 'nws_7day',
+        'band': 4,
+        'closed': 'right',
+        'text_bands': False,
+        'bins': [
+            (0, 0, 'white'), (5, 5, '#4e0000'), (10, 10, '#9a0000'),
+            (25, 25, 'red'), (50, 50, 'orange'), (75, 75, '#f7e08b'),
+            (90, 90, 'yellow'), (100, 100, '#316400'), (110, 110, '#00fc02'),
+            (125, 125, '#56b000'), (150, 150, '#316400'), (200, 200, '#3fc1bf'),
+            (300, 300, '#000080'), (400, 400, '#8e2eff'), (600, 600, '#e00079'),
+            (np.inf, 800, '#e00079')
+        ]
+    },
+    'qpf1-7dayforecast': {
+        # WPC 7-day quantitative precipitation forecast (in); the map matches
+        # these bands as text
+        'source': 'qpf',
+        'band': 1,
+        'closed': 'left',
+        'text_bands': True,
+        'bins': [
+            (0.01, 0.01, 'lightgray'), (0.1, 0.1, '#228b22'), (0.25, 0.25, '#2cb42c'),
+            (0.5, 0.5, '#000080'), (0.75, 0.75, '#000072'), (1, 1, '#005fbf'),
+            (1.25, 1.25, '#007cfa'), (1.5, 1.5, '#00bfbf'), (1.75, 1.75, '#9370db'),
+            (2, 2, '#663399'), (2.5, 2.5, '#800080'), (3, 3, 'darkred'),
+            (4, 4, 'red'), (5, 5, '#ff4500'), (7, 7, 'orange'),
+            (10, 10, '#8b6313'), (15, 15, '#daa520'), (20, 20, 'yellow')
+        ]
+    }
+}
+
+# Class value of cells outside every bin
+NO_CLASS = 255
+
+# Class boundaries per budgeted vertex above which a raster is sieved
+# further before it is polygonized and simplified at all
+SIEVE_FIRST_RATIO = 20
+
+
+class PrecipLayerBuilder:
+    """Build the precipitation map layers from local gridded rasters.
+
+    Each raster (GeoTIFF, NetCDF or anything else GDAL reads) is read
+    through a window covering the HUC8 extent only, decimated when that
+    window exceeds ``max_cells``. Cells are classified into the legend
+    bins of ``PRECIP_LAYERS``, polygonized and dissolved into one feature
+    per bin, then simplified just enough to fit ``vertex_budget`` vertices
+    per layer. Speckles smaller than ``sieve_cells`` are merged into their
+    neighbours first; the sieve grows when simplification alone cannot
+    meet the budget, and rasters with far more class boundaries than the
+    budget are sieved before any simplifying. A layer runs at most
+    ``max_simplify_passes`` simplify passes across all sieve levels.
+    """
+
+    def __init__(
+        self,
+        vertex_budget: int = 20_000,
+        coord_precision: int = 4,
+        max_cells: int = 2_000_000,
+        sieve_cells: int = 4,
+        max_simplify_passes: int = 40
+    ):
+        """Initialize with global setup and the HUC8 extent."""
+        self.setup = GlobalSetup()
+        self.logger = self.setup.logger
+        self.vertex_budget = vertex_budget
+        self.coord_precision = coord_precision
+        self.max_cells = max_cells
+        self.sieve_cells = sieve_cells
+        self.max_simplify_passes = max_simplify_passes
+
+        # Initialize paths
+        self.pcp_dir = self.setup.data_dir / "pcp"
+        self.pcp_dir.mkdir(exist_ok=True)
+
+        # Layers are cropped to the extent of the HUC8 watersheds (EPSG:4326)
+        self.extent = tuple(
+            gpd.read_file(self.setup.data_dir / "huc8.geojson").to_crs(4326).total_bounds
+        )
+
+    def _read_window(self, path: str, band: int) -> Tuple[np.ndarray, 'rasterio.Affine', object]:
+        """Read one band over the HUC8 extent; missing cells are NaN."""
+        try:
+            with rasterio.open(path) as src:
+                bounds = transform_bounds(
+                    4326, src.crs or CRS.from_epsg(4326), *self.extent, densify_pts=21
+                )
+                window = windows.from_bounds(*bounds, transform=src.transform)
+                (row0, row1), (col0, col1) = window.toranges()
+                row0, col0 = int(np.floor(row0)), int(np.floor(col0))
+                window = windows.Window(
+                    col0, row0, int(np.ceil(col1)) - col0, int(np.ceil(row1)) - row0
+                ).intersection(windows.Window(0, 0, src.width, src.height))
+
+                # Decimate oversized windows at read time
+                factor = max(int(np.ceil(np.sqrt(
+                    window.width * window.height / self.max_cells
+                ))), 1)
+                out_shape = (max(int(window.height) // factor, 1),
+                             max(int(window.width) // factor, 1))
+                values = src.read(band, window=window, out_shape=out_shape,
+                                  masked=True).astype(np.float64)
+                transform = src.window_transform(window) * rasterio.Affine.scale(
+                    window.width / out_shape[1], window.height / out_shape[0]
+                )
+                # CF lat/lon NetCDF grids often carry no CRS
+                crs = src.crs or CRS.from_epsg(4326)
+
+            return values.filled(np.nan), transform, crs
+
+        except Exception as e:
+            self.logger.error(f"Error reading raster {path}: {e}")
+            raise
+
+    @staticmethod
+    def classify(values: np.ndarray, spec: Dict) -> np.ndarray:
+        """Legend bin index of every cell, NO_CLASS where unmapped."""
+        edges = np.array([edge for edge, _, _ in spec['bins']], dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            if spec['closed'] == 'right':
+                classes = np.searchsorted(edges, values, side='left')
+                unmapped = np.isnan(values) | (values < 0)
+            else:
+                classes = np.searchsorted(edges, values, side='right') - 1
+                unmapped = np.isnan(values) | (classes < 0)
+        return np.where(unmapped, NO_CLASS, classes).astype(np.uint8)
+
+    def _polygonize(self, classes: np.ndarray, transform, crs,
+                    spec: Dict) -> gpd.GeoDataFrame:
+        """Dissolve classified cells into one (multi)polygon per bin."""
+        parts: Dict[int, List] = {}
+        for geom, value in features.shapes(classes, mask=classes != NO_CLASS,
+                                           transform=transform, connectivity=4):
+            parts.setdefault(int(value), []).append(shapely.geometry.shape(geom))
+
+        counts = np.bincount(classes[classes != NO_CLASS], minlength=len(spec['bins']))
+        rows = []
+        for index, polygons in sorted(parts.items()):
+            _, band, color = spec['bins'][index]
+            rows.append({
+                'bands': f"{band:g}" if spec['text_bands'] else band,
+                'nbands': int(counts[index]),
+                'colorVal': color,
+                # Same-bin parts from 4-connected polygonizing never overlap
+                'geometry': shapely.multipolygons(polygons)
+            })
+
+        layer = gpd.GeoDataFrame(
+            rows, columns=['bands', 'nbands', 'colorVal', 'geometry'], crs=crs
+        ).to_crs(4326)
+        layer['geometry'] = layer.geometry.clip_by_rect(*self.extent)
+        return layer[~layer.geometry.is_empty].reset_index(drop=True)
+
+    @staticmethod
+    def _boundary_edges(classes: np.ndarray) -> int:
+        """Cell edges between different classes, a cheap gauge of vertices."""
+        return int(np.count_nonzero(classes[:, 1:] != classes[:, :-1])
+                   + np.count_nonzero(classes[1:] != classes[:-1]))
+
+    def _simplify_to_budget(self, layer: gpd.GeoDataFrame, budget: int,
+                            max_passes: int) -> Tuple[gpd.GeoDataFrame, bool, int]:
+        """Simplify with the smallest tolerance that fits the vertex budget.
+
+        Runs at most ``max_passes`` simplify passes, and only bisects when
+        the largest tolerance fits; otherwise a coarser sieve is needed and
+        any further pass would be wasted. Also returns whether the budget
+        was met and the passes run.
+        """
+        geometries = layer.geometry.to_numpy()
+
+        def simplified(tolerance: float) -> np.ndarray:
+            return shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+        def n_vertices(geoms: np.ndarray) -> int:
+            return int(shapely.get_num_coordinates(geoms).sum())
+
+        best, passes = simplified(0), 1
+        if n_vertices(best) > budget and passes < max_passes:
+            # Bisect the tolerance (degrees) on a log scale
+            low, high = 10.0 ** -self.coord_precision, max(
+                self.extent[2] - self.extent[0], self.extent[3] - self.extent[1]
+            ) / 50
+            best, passes = simplified(high), passes + 1
+            fits = n_vertices(best) <= budget
+            while fits and passes < max_passes and high / low >= 1.05:
+                middle = np.sqrt(low * high)
+                candidate, passes = simplified(middle), passes + 1
+                if n_vertices(candidate) <= budget:
+                    high, best = middle, candidate
+                else:
+                    low = middle
+
+        layer = layer.copy()
+        layer['geometry'] = shapely.make_valid(best)
+        layer = layer[~layer.geometry.is_empty].reset_index(drop=True)
+        return layer, n_vertices(best) <= budget, passes
+
+    def build_layer(self, name: str, path: str,
+                    vertex_budget: Optional[int] = None) -> gpd.GeoDataFrame:
+        """Build one layer from a raster file."""
+        try:
+            spec = PRECIP_LAYERS[name]
+            budget = vertex_budget or self.vertex_budget
+            values, transform, crs = self._read_window(path, spec['band'])
+            classes = self.classify(values, spec)
+            mapped = classes != NO_CLASS
+
+            # Each level sieves the one before: GDAL keeps a speck whose
+            # neighbours are all below the size, so a large sieve of the raw
+            # classes leaves noise in place. Sizes stay below the image size.
+            sieve, sieved = self.sieve_cells, classes
+            largest = min(int(mapped.sum()), classes.size - 1)
+            passes = self.max_simplify_passes
+            while True:
+                if 1 < sieve < classes.size:
+                    sieved = features.sieve(sieved, sieve, mask=mapped, connectivity=4)
+                if (sieve < largest and
+                        self._boundary_edges(sieved) > SIEVE_FIRST_RATIO * budget):
+                    sieve = min(2 * sieve, largest)
+                    continue
+                layer, fits, used = self._simplify_to_budget(
+                    self._polygonize(sieved, transform, crs, spec), budget, passes
+                )
+                passes -= used
+                if fits or passes <= 0 or sieve >= largest:
+                    break
+                sieve = min(2 * sieve, largest)
+            if not fits:
+                self.logger.warning(f"{name} does not fit a budget of {budget} vertices")
+
+            n_vertices = int(shapely.get_num_coordinates(layer.geometry.to_numpy()).sum())
+            self.logger.info(
+                f"Built {name}: {len(layer)} bins, {n_vertices} vertices "
+                f"from a {values.shape[1]}x{values.shape[0]} window "
+                f"(sieve {sieve} cells)"
+            )
+            return layer
+
+        except Exception as e:
+            self.logger.error(f"Error building {name} layer: {e}")
+            raise
+
+    def build_layers(self, rasters: Dict[str, str],
+                     budgets: Optional[Dict[str, int]] = None):
+        """Build and save every layer whose source raster is given."""
+        try:
+            budgets = budgets or {}
+            with OutputWriter(self.setup.output_workers) as out:
+                for name, spec in PRECIP_LAYERS.items():
+                    if spec['source'] not in rasters:
+                        continue
+                    layer = self.build_layer(
+                        name, rasters[spec['source']], budgets.get(name)
+                    )
+                    out.shapes(
+                        layer,
+                        self.pcp_dir / f"{name}.geojson",
+                        coord_precision=self.coord_precision
+                    )
+
+            self.logger.info("Precipitation layers saved successfully")
+
+        except Exception as e:
+            self.logger.error(f"Error building precipitation layers: {e}")
+            raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build precipitation map layers from local rasters."
+    )
+    parser.add_argument('--nws-7day', help="NWS last-7-days precipitation GeoTIFF")
+    parser.add_argument('--qpf', help="7-day QPF raster (GeoTIFF or NetCDF)")
+    parser.add_argument('--vertex-budget', type=int, default=20_000,
+                        help="maximum vertices per layer")
+    args = parser.parse_args()
+
+    rasters = {source: path for source, path in
+               (('nws_7day', args.nws_7day), ('qpf', args.qpf)) if path}
+    builder = PrecipLayerBuilder(vertex_budget=args.vertex_budget)
+    builder.build_layers(rasters)
@@ -0,0 +1,105 @@
+import pandas as pd
+from global0_set_apis_libraries import GlobalSetup
+from global1_output_writer import OutputWriter
+from global1_spi import SPI_SCALES, compute_spi
+
+class PrecipSPIProcessor:
+    """Standardized Precipitation Index for every precipitation station."""
+
+    def __init__(self):
+        """Initialize with global setup and configuration."""
+        self.setup = GlobalSetup()
+        self.logger = self.setup.logger
+
+        # Initialize paths
+        self.pcp_dir = self.setup.data_dir / "pcp"
+
+        # A month counts when 80% of its days are reported; each calendar
+        # month needs 10 years of record for its gamma fit
+        self.min_coverage = 0.8
+        self.min_years = 10
+        self.spi_cols = [f'spi_{scale}' for scale in SPI_SCALES]
+
+    def _load_daily_data(self) -> pd.DataFrame:
+        """Daily precipitation from the station and TexMesonet sets."""
+        try:
+            daily = pd.concat([
+                pd.read_csv(self.pcp_dir / filename, dtype={'id': str})
+                for filename in ("all_pcp_data.csv", "texmes_pcp_data.csv")
+                if (self.pcp_dir / filename).exists()
+            ])
+            # Both sets carry some stations; the first file wins
+            return daily.drop_duplicates(['id', 'date'], keep='first')
+
+        except Exception as e:
+            self.logger.error(f"Error loading daily precipitation: {e}")
+            raise
+
+    def calculate_spi(self, daily: pd.DataFrame) -> pd.DataFrame:
+        """Monthly SPI at 1, 3, 6 and 12 months for every station."""
+        try:
+            spi = compute_spi(
+                daily,
+                site_col='id',
+                date_col='date',
+                value_col='pcp_in',
+                min_coverage=self.min_coverage,
+                min_years=self.min_years
+            )
+            self.logger.info(
+                f"Calculated SPI for {spi['id'].nunique()} stations "
+                f"over {len(spi)} station-months"
+            )
+            return spi
+
+        except Exception as e:
+            self.logger.error(f"Error calculating SPI: {e}")
+            raise
+
+    def current_spi(self, spi: pd.DataFrame) -> pd.DataFrame:
+        """Each station's SPI for its latest month with a 1-month value."""
+        latest = (spi.dropna(subset=['spi_1'])
+                  .sort_values(['id', 'date'])
+                  .groupby('id')
+                  .tail(1))
+        latest = latest.assign(spi_date=latest['date'].dt.strftime('%Y-%m'))
+        return latest[['id', 'spi_date'] + self.spi_cols]
+
+    def save_outputs(self, spi: pd.DataFrame):
+        """Save the SPI series and each station's current SPI.
+
+        Current SPI goes to its own file keyed by station ``id``; the
+        station layer (all_pcp_sites.geojson) belongs to the R pipeline and
+        is left as it is.
+        """
+        try:
+            precision = {'pcp_in': 2, **{col: 3 for col in self.spi_cols}}
+            with OutputWriter(self.setup.output_workers) as out:
+                out.csv(spi, self.pcp_dir / "all_pcp_spi.csv", precision=precision)
+                out.csv(
+                    self.current_spi(spi),
+                    self.pcp_dir / "current_pcp_spi.csv",
+                    precision=precision
+                )
+
+            self.logger.info("SPI outputs saved successfully")
+
+        except Exception as e:
+            self.logger.error(f"Error saving SPI outputs: {e}")
+            raise
+
+    def update_spi_data(self) -> bool:
+        """Main method to recompute SPI from the daily history."""
+        try:
+            spi = self.calculate_spi(self._load_daily_data())
+            self.save_outputs(spi)
+            self.logger.info("SPI update completed successfully")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error updating SPI: {e}")
+            raise
+
+if __name__ == "__main__":
+    processor = PrecipSPIProcessor()
+    processor.update_spi_data()
@@ -1,378 +1,676 @@
-from global0_set_apis_libraries import GlobalSetup
-import pandas as pd
-import geopandas as gpd
-import numpy as np
-from pathlib import Path
-import requests
-import json
-from datetime import datetime, timedelta
-from typing import Tuple, List, Dict, Optional
-import logging
-
-
-
-class ReservoirDataProcessor:
-    """Process and analyze USACE reservoir data for Boerne Water Dashboard."""
-    
-    def __init__(self):
-        """Initialize with global setup configuration."""
-        self.setup = GlobalSetup()
-        self.logger = self.setup.logger
-        
-        # Initialize paths - using absolute path
-        self.base_path = Path("C:/Users/Admin/Documents/GitHub/boerne-dashboard-main/boerne-water-supply")
-        self.reservoir_dir = self.base_path / "data/reservoirs"
-        
-        # Verify path exists
-        if not self.reservoir_dir.exists():
-            self.logger.error(f"Directory not found: {self.reservoir_dir}")
-            raise FileNotFoundError(f"Directory not found: {self.reservoir_dir}")
-            
-        self.logger.info(f"Using reservoir directory: {self.reservoir_dir}")
-        
-        # USACE API configuration
-        self.base_url = 'https://water.usace.army.mil/a2w/'
-        self.report_url = "CWMS_CRREL.cwms_data_api.get_report_json?p_location_id="
-        
-        # Texas districts
-        self.tx_districts = ['SWF', 'SWT', 'SWG']
-        
-        # Load initial data
-        self._load_historical_data()
-        
-    def _load_historical_data(self):
-        """Load historical reservoir data and site information."""
-        try:
-            # Load existing data with explicit paths
-            usace_dams_path = self.reservoir_dir / "usace_dams.csv"
-            usace_sites_path = self.reservoir_dir / "usace_sites.geojson"
-            
-            self.logger.info(f"Loading data from: {usace_dams_path}")
-            
-            # Verify files exist
-            if not usace_dams_path.exists():
-                self.logger.error(f"File not found: {usace_dams_path}")
-                raise FileNotFoundError(f"File not found: {usace_dams_path}")
-                
-            if not usace_sites_path.exists():
-                self.logger.error(f"File not found: {usace_sites_path}")
-                raise FileNotFoundError(f"File not found: {usace_sites_path}")
-            
-            # Load data
-            self.old_data = pd.read_csv(usace_dams_path)
-            self.old_data['date'] = pd.to_datetime(self.old_data['date'])
-            
-            # Load site information
-            self.sites = gpd.read_file(usace_sites_path)
-            
-            # Add URL links to sites
-            res_url = "http://water.usace.army.mil/a2w/f?p=100:1:0::::P1_LINK:"
-            self.sites['url_link'] = self.sites['Loc_ID'].apply(
-                lambda x: f"{res_url}{x}-CWMS"
-            )
-            
-            self.logger.info("Historical data and site information loaded successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error loading historical data: {e}")
-            raise
-    def _build_api_url(self, location_id: str) -> str:
-        """Build USACE API URL for data retrieval."""
-        time_amt = 2  # number of weeks
-        time_unit = 'weeks'
-        parameter_url = (
-            f"&p_parameter_type=Stor%3AElev&p_last={time_amt}"
-            f"&p_last_unit={time_unit}&p_unit_system=EN&p_format=JSON"
-        )
-        return f"{self.base_url}{self.report_url}{location_id}{parameter_url}"
-
-    def _fetch_reservoir_data(self, location_id: str) -> Dict:
-        """Fetch data from USACE API for a specific location."""
-        try:
-            url = self._build_api_url(location_id)
-            
-            # Add headers to mimic browser request
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            # Make request with verification disabled
-            response = requests.get(
-                url, 
-                headers=headers,
-                timeout=15000, 
-                verify=False  # Disable SSL verification
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Debug logging
-            self.logger.debug(f"Raw API response for location {location_id}: {str(data)[:200]}")
-            
-            return data
-            
-        except Exception as e:
-            self.logger.error(f"Error fetching data for location {location_id}: {e}")
-            raise
-
-    def _validate_api_response(self, data: Dict, location_id: str) -> bool:
-        """Validate API response structure."""
-        try:
-            if not isinstance(data, dict):
-                self.logger.error(f"Invalid response type for {location_id}: {type(data)}")
-                return False
-                
-            if 'value' not in data:
-                self.logger.error(f"No 'value' key in response for {location_id}")
-                return False
-                
-            if 'timeSeries' not in data['value']:
-                self.logger.error(f"No 'timeSeries' in response for {location_id}")
-                return False
-                
-            time_series = data['value']['timeSeries']
-            if not isinstance(time_series, list) or not time_series:
-                self.logger.error(f"Invalid timeSeries for {location_id}")
-                return False
-                
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Error validating API response: {e}")
-            return False
-        
-    def _process_elevation_data(self, data: Dict) -> pd.DataFrame:
-        """Process elevation data from API response."""
-        try:
-            elev_data = pd.DataFrame(data['Elev'][0])
-            elev_data['date'] = pd.to_datetime(
-                elev_data['time'].str[:11], 
-                format='%d-%b-%Y'
-            )
-            return (elev_data.groupby('date')
-                   .agg({'value': lambda x: round(x.median(), 2)})
-                   .rename(columns={'value': 'elev_Ft'})
-                   .reset_index())
-                   
-        except Exception as e:
-            self.logger.error(f"Error processing elevation data: {e}")
-            raise
-
-    def _process_storage_data(self, data: Dict) -> pd.DataFrame:
-        """Process conservation and flood storage data."""
-        try:
-            # Debug the data structure
-            self.logger.debug(f"Data keys: {data.keys()}")
-            
-            storage_data = []
-            if 'value' in data and 'timeSeries' in data['value']:
-                time_series = data['value']['timeSeries']
-                
-                for series in time_series:
-                    if ('variable' in series and 
-                        'variableDescription' in series['variable']):
-                        
-                        var_desc = series['variable']['variableDescription']
-                        is_conservation = 'Conservation' in var_desc
-                        is_flood = 'Flood' in var_desc
-                        
-                        if (is_conservation or is_flood) and 'values' in series:
-                            for value in series['values'][0]['value']:
-                                try:
-                                    storage_entry = {
-                                        'date': pd.to_datetime(value['dateTime']),
-                                        'storage_AF' if is_conservation else 'fstorage_AF': 
-                                            float(value['value'])
-                                    }
-                                    storage_data.append(storage_entry)
-                                except (ValueError, KeyError) as e:
-                                    self.logger.warning(f"Skipping invalid storage value: {e}")
-                                    continue
-            
-            if storage_data:
-                df = pd.DataFrame(storage_data)
-                # Group by date
-                df = (df.groupby('date')
-                     .agg({
-                         'storage_AF': lambda x: round(x.median(), 0) if 'storage_AF' in df else None,
-                         'fstorage_AF': lambda x: round(x.median(), 0) if 'fstorage_AF' in df else None
-                     })
-                     .reset_index())
-                return df
-            
-            self.logger.warning("No storage data found in API response")
-            return pd.DataFrame()
-            
-        except Exception as e:
-            self.logger.error(f"Error processing storage data: {e}")
-            self.logger.debug(f"Data structure: {data}")
-            raise
-
-    def _fetch_district_data(self, district: str) -> pd.DataFrame:
-        """Fetch and process data for all sites in a district."""
-        try:
-            district_data = []
-            district_sites = self.sites[
-                (self.sites['District'] == district) & 
-                (self.sites['NIDID'].str.contains('TX')) & 
-                (self.sites['Loc_ID'] != '2165051')  # Excluding Truscott Brine Lake
-            ]
-            
-            for _, site in district_sites.iterrows():
-                # Fetch raw data
-                raw_data = self._fetch_reservoir_data(site['Loc_ID'])
-                
-                # Process elevation and storage
-                elev_data = self._process_elevation_data(raw_data)
-                storage_data = self._process_storage_data(raw_data)
-                
-                # Combine data
-                site_data = pd.merge(elev_data, storage_data, on='date')
-                site_data['locid'] = site['Loc_ID']
-                site_data['district'] = district
-                site_data['NIDID'] = site['NIDID']
-                site_data['name'] = site['Name']
-                
-                district_data.append(site_data)
-                
-                self.logger.info(
-                    f"Processed {site['Name']} ({site['Loc_ID']}) in {district}"
-                )
-            
-            return pd.concat(district_data, ignore_index=True)
-            
-        except Exception as e:
-            self.logger.error(f"Error processing district {district}: {e}")
-            raise
-
-    def _add_julian_dates(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Add julian dates using global setup's calendar."""
-        try:
-            df['year'] = df['date'].dt.year
-            df['day_month'] = df['date'].dt.strftime('%m-%d')
-            
-            def get_julian_day(row):
-                is_leap = pd.Timestamp(row['date']).is_leap_year
-                day_month_col = 'day_month_leap' if is_leap else 'day_month'
-                julian_col = 'julian_index_leap' if is_leap else 'julian_index'
-                
-                return self.setup.julian_ref.loc[
-                    self.setup.julian_ref[day_month_col] == row['day_month'], 
-                    julian_col
-                ].iloc[0]
-            
-            df['julian'] = df.apply(get_julian_day, axis=1)
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error adding julian dates: {e}")
-            raise
-
-    def _calculate_statistics(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate reservoir statistics and percentiles."""
-        try:
-            stats = df.groupby(['NIDID', 'julian']).agg({
-                'percentStorage': [
-                    'count',
-                    'min',
-                    lambda x: np.percentile(x, 10),
-                    lambda x: np.percentile(x, 25),
-                    lambda x: np.percentile(x, 50),
-                    lambda x: np.percentile(x, 75),
-                    lambda x: np.percentile(x, 90),
-                    'max'
-                ]
-            }).reset_index()
-            
-            stats.columns = [
-                'NIDID', 'julian', 'Nobs', 'min', 'flow10', 'flow25',
-                'flow50', 'flow75', 'flow90', 'max'
-            ]
-            
-            return stats
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating statistics: {e}")
-            raise
-
-    def determine_status(self, row: pd.Series) -> str:
-        """Determine reservoir status based on percentiles."""
-        if pd.isna(row['percent_storage']):
-            return "unknown"
-        elif row['percent_storage'] <= row['flow10']:
-            return "Extremely Dry"
-        elif row['percent_storage'] <= row['flow25']:
-            return "Very Dry"
-        elif row['percent_storage'] < row['flow50']:
-            return "Moderately Dry"
-        elif row['percent_storage'] < row['flow75']:
-            return "Moderately Wet"
-        elif row['percent_storage'] < row['flow90']:
-            return "Very Wet"
-        else:
-            return "Extremely Wet"
-
-    def update_reservoir_data(self):
-        """Main method to update all reservoir-related data."""
-        try:
-            # Fetch new data for all districts
-            new_data = pd.concat([
-                self._fetch_district_data(district) 
-                for district in self.tx_districts
-            ])
-            
-            # Process new data
-            new_data = self._add_julian_dates(new_data)
-            
-            # Calculate percent storage
-            new_data['percentStorage'] = (
-                new_data['storage_AF'] / new_data['OT_AF'] * 100
-            ).round(2)
-            
-            # Combine with historical data
-            all_data = pd.concat([self.old_data, new_data])
-            
-            # Calculate statistics
-            stats = self._calculate_statistics(all_data)
-            
-            # Save processed data
-            self._save_processed_data(all_data, stats)
-            
-            self.logger.info("Reservoir data update completed successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error updating reservoir data: {e}")
-            raise
-
-    def _save_processed_data(self, data: pd.DataFrame, stats: pd.DataFrame):
-        """Save all processed data files."""
-        try:
-            # Save main data
-            data.to_csv(
-                self.reservoir_dir / "usace_dams.csv", 
-                index=False
-            )
-            
-            # Filter and save Canyon Lake data
-            canyon_lake = data[data['name'] == "Canyon Lake"].copy()
-            canyon_lake.to_csv(
-                self.reservoir_dir / "all_reservoir_data.csv", 
-                index=False
-            )
-            
-            # Save statistics
-            stats.to_csv(
-                self.reservoir_dir / "all_reservoir_stats.csv", 
-                index=False
-            )
-            
-            self.logger.info("All reservoir data files saved successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error saving processed data: {e}")
-            raise
-
-if __name__ == "__main__":
-    processor = ReservoirDataProcessor()
+from global0_set_apis_libraries import GlobalSetup
+from global1_pipeline_stores import PipelineStores
+from global1_climatology_table import ClimatologyTable
+from global1_output_writer import OutputWriter
+from global1_quality_control import QualityControl
+from global1_sharded_stats import latest_rows, percentile_stats, run_sharded
+from global1_spatial_index import get_spatial_index
+from global1_usace_dataset import read_usace_dataset
+import pandas as pd
+import geopandas as gpd
+import numpy as np
+from pathlib import Path
+import os
+import requests
+import json
+from datetime import datetime, timedelta
+from typing import Tuple, List, Dict, Optional
+import logging
+
+
+
+class ReservoirDataProcessor:
+    """Process and analyze USACE reservoir data for Boerne Water Dashboard."""
+    
+    def __init__(self):
+        """Initialize with global setup configuration."""
+        self.setup = GlobalSetup()
+        self.logger = self.setup.logger
+        self.stores = PipelineStores(self.setup.data_dir)
+        
+        # Initialize paths
+        self.reservoir_dir = self.setup.data_dir / "reservoirs"
+        
+        # Verify path exists
+        if not self.reservoir_dir.exists():
+            self.logger.error(f"Directory not found: {self.reservoir_dir}")
+            raise FileNotFoundError(f"Directory not found: {self.reservoir_dir}")
+            
+        self.logger.info(f"Using reservoir directory: {self.reservoir_dir}")
+        self.climatology_path = self.reservoir_dir / "reservoir_climatology.npy"
+        
+        # Partitioned history converted from the district bulk files
+        self.usace_dataset_dir = self.reservoir_dir / "usace_dataset"
+        
+        # The R pipeline's Canyon Lake record, with operating targets; the
+        # bulk files carry none for Texas reservoirs
+        self.record_files = ["historic_reservoir_data.csv", "all_reservoir_data.csv"]
+        self.record_columns = ['NIDID', 'name', 'date', 'elev_Ft', 'storage_AF',
+                               'OT_Ft', 'OT_AF', 'percentStorage']
+        
+        # USACE API configuration
+        self.base_url = self.setup.usace_url
+        self.report_url = "CWMS_CRREL.cwms_data_api.get_report_json?p_location_id="
+        
+        # Reservoirs without a watermark fetch the trailing two weeks; the
+        # rest fetch the days since their mark plus this overlap
+        self.revision_days = 1
+        
+        # Districts with Texas reservoirs; only dams inside a Texas county
+        # are fetched
+        self.tx_districts = ['SWF', 'SWT', 'SWG']
+        
+        # Per-reservoir series, stats and status for every USACE site
+        self.multi_reservoir_outputs = os.environ.get('BOERNE_RESERVOIR_SITES') == '1'
+        self.sites_dir = self.reservoir_dir / "sites"
+        self.qc = QualityControl('reservoirs', self.reservoir_dir)
+        
+        # Load initial data
+        self._load_historical_data()
+        
+    def _load_historical_data(self):
+        """Load historical reservoir data and site information."""
+        try:
+            # Load existing data with explicit paths
+            usace_dams_path = self.reservoir_dir / "usace_dams.csv"
+            usace_sites_path = self.reservoir_dir / "usace_sites.geojson"
+            
+            self.logger.info(f"Loading data from: {usace_dams_path}")
+            
+            # Verify files exist
+            record_paths = [self.reservoir_dir / name for name in self.record_files]
+            if not (usace_dams_path.exists() or self.usace_dataset_dir.exists()
+                    or any(path.exists() for path in record_paths)):
+                self.logger.error(f"File not found: {usace_dams_path}")
+                raise FileNotFoundError(f"File not found: {usace_dams_path}")
+                
+            if not usace_sites_path.exists():
+                self.logger.error(f"File not found: {usace_sites_path}")
+                raise FileNotFoundError(f"File not found: {usace_sites_path}")
+            
+            # Load site information with the county each dam lies in
+            self.sites = gpd.read_file(usace_sites_path)
+            regions = get_spatial_index(self.setup.data_dir).assign(self.sites.geometry)
+            self.sites[['county_fips', 'county']] = regions[['county_fips', 'county']]
+            
+            # Load data, from the warehouse when enabled
+            warehouse = self.stores.warehouse
+            if warehouse is not None and warehouse.has_table('reservoirs_observations'):
+                self.old_data = warehouse.load('reservoirs_observations')
+            elif usace_dams_path.exists():
+                self.old_data = pd.read_csv(usace_dams_path, dtype={'locid': str})
+            else:
+                self.old_data = self._seed_history(record_paths)
+            self.old_data['date'] = pd.to_datetime(self.old_data['date'])
+            
+            # Add URL links to sites
+            res_url = "http://water.usace.army.mil/a2w/f?p=100:1:0::::P1_LINK:"
+            self.sites['url_link'] = self.sites['Loc_ID'].apply(
+                lambda x: f"{res_url}{x}-CWMS"
+            )
+            
+            self.logger.info("Historical data and site information loaded successfully")
+            
+        except Exception as e:
+            self.logger.error(f"Error loading historical data: {e}")
+            raise
+
+    def _seed_history(self, record_paths: List[Path]) -> pd.DataFrame:
+        """First-run history: the converted bulk dataset plus the R record.
+        
+        Only the partitions of the reservoirs fetched are read. Rows of the
+        R Canyon Lake record replace bulk rows of the same day, since only
+        the R record carries operating targets for Texas reservoirs.
+        """
+        frames = []
+        if self.usace_dataset_dir.exists():
+            fetched = self.sites[
+                self.sites['District'].isin(self.tx_districts) & self.sites['county'].notna()
+            ]
+            self.logger.info(f"Loading history from {self.usace_dataset_dir}")
+            frames.append(read_usace_dataset(
+                self.usace_dataset_dir, self.tx_districts, fetched['NIDID']
+            ))
+        for path in record_paths:
+            if path.exists():
+                self.logger.info(f"Loading history from {path}")
+                record = pd.read_csv(path, usecols=self.record_columns)
+                record['date'] = GlobalSetup.parse_dates(record['date'])
+                frames.append(record)
+        
+        history = (pd.concat(frames, ignore_index=True)
+                   .drop_duplicates(['NIDID', 'date'], keep='last'))
+        
+        # Rows from the R record have no district or location id
+        sites = self.sites.drop_duplicates('NIDID').set_index('NIDID')
+        for col, site_col in (('district', 'District'), ('locid', 'Loc_ID')):
+            looked_up = history['NIDID'].map(sites[site_col])
+            history[col] = history[col].fillna(looked_up) if col in history else looked_up
+        return self.setup.add_julian_dates(
+            history.sort_values(['NIDID', 'date']).reset_index(drop=True)
+        )
+
+    def _build_api_url(self, location_id: str, time_amt: int = 2,
+                       time_unit: str = 'weeks') -> str:
+        """Build USACE API URL for the trailing ``time_amt`` period."""
+        parameter_url = (
+            f"&p_parameter_type=Stor%3AElev&p_last={time_amt}"
+            f"&p_last_unit={time_unit}&p_unit_system=EN&p_format=JSON"
+        )
+        return f"{self.base_url}{self.report_url}{location_id}{parameter_url}"
+
+    def _fetch_reservoir_data(self, location_id: str, time_amt: int = 2,
+                              time_unit: str = 'weeks') -> Dict:
+        """Fetch data from USACE API for a specific location."""
+        try:
+            url = self._build_api_url(location_id, time_amt, time_unit)
+            
+            # Add headers to mimic browser request
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            }
+            
+            # Make request with verification disabled
+            response = requests.get(
+                url, 
+                headers=headers,
+                timeout=15000, 
+                verify=False  # Disable SSL verification
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            
+            # Debug logging
+            self.logger.debug(f"Raw API response for location {location_id}: {str(data)[:200]}")
+            
+            return data
+            
+        except Exception as e:
+            self.logger.error(f"Error fetching data for location {location_id}: {e}")
+            raise
+
+    def _validate_api_response(self, data: Dict, location_id: str) -> bool:
+        """Validate API response structure."""
+        try:
+            if not isinstance(data, dict):
+                self.logger.error(f"Invalid response type for {location_id}: {type(data)}")
+                return False
+                
+            if 'value' not in data:
+                self.logger.error(f"No 'value' key in response for {location_id}")
+                return False
+                
+            if 'timeSeries' not in data['value']:
+                self.logger.error(f"No 'timeSeries' in response for {location_id}")
+                return False
+                
+            time_series = data['value']['timeSeries']
+            if not isinstance(time_series, list) or not time_series:
+                self.logger.error(f"Invalid timeSeries for {location_id}")
+                return False
+                
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error validating API response: {e}")
+            return False
+        
+    def _process_elevation_data(self, data: Dict) -> pd.DataFrame:
+        """Process elevation data from API response."""
+        try:
+            elev_data = pd.DataFrame(data['Elev'][0])
+            elev_data['date'] = pd.to_datetime(
+                elev_data['time'].str[:11], 
+                format='%d-%b-%Y'
+            )
+            return (elev_data.groupby('date')
+                   .agg({'value': lambda x: round(x.median(), 2)})
+                   .rename(columns={'value': 'elev_Ft'})
+                   .reset_index())
+                   
+        except Exception as e:
+            self.logger.error(f"Error processing elevation data: {e}")
+            raise
+
+    def _process_storage_data(self, data: Dict) -> pd.DataFrame:
+        """Process conservation and flood storage data."""
+        try:
+            # Debug the data structure
+            self.logger.debug(f"Data keys: {data.keys()}")
+            
+            storage_data = []
+            if 'value' in data and 'timeSeries' in data['value']:
+                time_series = data['value']['timeSeries']
+                
+                for series in time_series:
+                    if ('variable' in series and 
+                        'variableDescription' in series['variable']):
+                        
+                        var_desc = series['variable']['variableDescription']
+                        is_conservation = 'Conservation' in var_desc
+                        is_flood = 'Flood' in var_desc
+                        
+                        if (is_conservation or is_flood) and 'values' in series:
+                            for value in series['values'][0]['value']:
+                                try:
+                                    storage_entry = {
+                                        'date': pd.to_datetime(value['dateTime']),
+                                        'storage_AF' if is_conservation else 'fstorage_AF': 
+                                            float(value['value'])
+                                    }
+                                    storage_data.append(storage_entry)
+                                except (ValueError, KeyError) as e:
+                                    self.logger.warning(f"Skipping invalid storage value: {e}")
+                                    continue
+            
+            if storage_data:
+                df = pd.DataFrame(storage_data)
+                # Group by date
+                df = (df.groupby('date')
+                     .agg({
+                         'storage_AF': lambda x: round(x.median(), 0) if 'storage_AF' in df else None,
+                         'fstorage_AF': lambda x: round(x.median(), 0) if 'fstorage_AF' in df else None
+                     })
+                     .reset_index())
+                return df
+            
+            self.logger.warning("No storage data found in API response")
+            return pd.DataFrame()
+            
+        except Exception as e:
+            self.logger.error(f"Error processing storage data: {e}")
+            self.logger.debug(f"Data structure: {data}")
+            raise
+
+    def _fetch_district_data(self, district: str) -> pd.DataFrame:
+        """Fetch and process data for all sites in a district."""
+        try:
+            district_data = []
+            district_sites = self.sites[
+                (self.sites['District'] == district) & 
+                (self.sites['county'].notna()) & 
+                (self.sites['Loc_ID'] != '2165051')  # Excluding Truscott Brine Lake
+            ]
+            
+            for _, site in district_sites.iterrows():
+                district_data.append(self._fetch_site_data(site, *self._fetch_window(site)))
+            
+            return pd.concat(district_data, ignore_index=True)
+            
+        except Exception as e:
+            self.logger.error(f"Error processing district {district}: {e}")
+            raise
+
+    def _fetch_window(self, site: pd.Series) -> Tuple[int, str]:
+        """Trailing period to request for a reservoir, from its watermark."""
+        start = self.stores.watermarks.fetch_start(
+            'reservoirs', site['NIDID'], self.revision_days
+        )
+        if start is None:
+            return 2, 'weeks'
+        return max((pd.Timestamp(self.setup.today) - start).days + 1, 1), 'days'
+
+    def _fetch_site_data(self, site: pd.Series, time_amt: int = 2,
+                         time_unit: str = 'weeks') -> pd.DataFrame:
+        """Fetch and process elevation and storage for one reservoir."""
+        try:
+            # Fetch raw data
+            raw_data = self._fetch_reservoir_data(site['Loc_ID'], time_amt, time_unit)
+            
+            # Process elevation and storage
+            elev_data = self._process_elevation_data(raw_data)
+            storage_data = self._process_storage_data(raw_data)
+            
+            # Combine data
+            site_data = pd.merge(elev_data, storage_data, on='date')
+            site_data['locid'] = site['Loc_ID']
+            site_data['district'] = site['District']
+            site_data['NIDID'] = site['NIDID']
+            site_data['name'] = site['Name']
+            
+            self.logger.info(
+                f"Processed {site['Name']} ({site['Loc_ID']}) in {site['District']}"
+            )
+            return site_data
+            
+        except Exception as e:
+            self.logger.error(f"Error processing reservoir {site['Loc_ID']}: {e}")
+            raise
+
+    def _calculate_statistics(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calculate reservoir statistics and percentiles."""
+        try:
+            return run_sharded(
+                df,
+                percentile_stats,
+                'NIDID',
+                ['NIDID', 'julian'],
+                workers=self.setup.stat_workers,
+                value_col='percentStorage'
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating statistics: {e}")
+            raise
+
+    def _stats_table(self, data: pd.DataFrame, stats: pd.DataFrame) -> pd.DataFrame:
+        """Percentile statistics in the layout the reservoir chart reads.
+        
+        As the R pipeline wrote it: the statistics by ``site`` and julian
+        day, then the same rows joined to each reservoir's latest year of
+        percent storage, with its status and color.
+        """
+        try:
+            years = data.groupby('NIDID')['year'].agg(
+                startYr='min', endYr='max'
+            ).reset_index()
+            stats = stats.merge(years, on='NIDID', how='left').rename(
+                columns={'NIDID': 'site'}
+            )
+            
+            latest = data[data['year'] == data.groupby('NIDID')['year'].transform('max')]
+            this_year = pd.DataFrame({
+                'site': latest['NIDID'],
+                'julian': latest['julian'],
+                'date2': latest['date'],
+                'date': latest['date'].dt.strftime('%m-%d'),
+                'flow': latest['percentStorage'],
+                'month': np.array(self.setup.months)[latest['date'].dt.month - 1]
+            })
+            current = stats.merge(this_year, on=['site', 'julian'], how='left')
+            
+            # Days without storage this year keep NA status, as in R
+            observed = current[current['flow'].notna()]
+            current['status'] = pd.Series([
+                self.determine_status(row)
+                for _, row in observed.rename(columns={'flow': 'percent_storage'}).iterrows()
+            ], index=observed.index, dtype=object)
+            current['colorStatus'] = current['status'].dropna().map(self.get_status_color)
+            
+            return pd.concat([stats, current], ignore_index=True)[
+                list(stats.columns) + ['date2', 'date', 'flow', 'month', 'status', 'colorStatus']
+            ]
+            
+        except Exception as e:
+            self.logger.error(f"Error building statistics table: {e}")
+            raise
+
+    def determine_status(self, row: pd.Series) -> str:
+        """Determine reservoir status based on percentiles."""
+        if pd.isna(row['percent_storage']):
+            return "unknown"
+        elif row['percent_storage'] <= row['flow10']:
+            return "Extremely Dry"
+        elif row['percent_storage'] <= row['flow25']:
+            return "Very Dry"
+        elif row['percent_storage'] < row['flow50']:
+            return "Moderately Dry"
+        elif row['percent_storage'] < row['flow75']:
+            return "Moderately Wet"
+        elif row['percent_storage'] < row['flow90']:
+            return "Very Wet"
+        else:
+            return "Extremely Wet"
+
+    def get_status_color(self, status: str) -> str:
+        """Get color code for storage status."""
+        color_map = {
+            "Extremely Dry": "darkred",
+            "Very Dry": "red",
+            "Moderately Dry": "orange",
+            "Moderately Wet": "cornflowerblue",
+            "Very Wet": "blue",
+            "Extremely Wet": "navy",
+            "unknown": "gray"
+        }
+        return color_map.get(status, "gray")
+
+    def update_reservoir_data(self) -> bool:
+        """Main method to update all reservoir-related data.
+        
+        Returns True when new data was published. The combined data is
+        kept as the in-memory history for the next update.
+        """
+        try:
+            # Fetch new data for all districts
+            new_data = pd.concat([
+                self._fetch_district_data(district) 
+                for district in self.tx_districts
+            ])
+            
+            # Keep new days and overlap days whose values have since changed
+            new_data = self._new_or_revised(new_data, self.old_data)
+            if new_data.empty:
+                self.logger.info("No new reservoir data")
+                return False
+            
+            # Process new data
+            new_data = self.setup.add_julian_dates(new_data)
+            new_data = self._attach_operating_targets(new_data)
+            
+            # Calculate percent storage
+            new_data['percentStorage'] = (
+                new_data['storage_AF'] / new_data['OT_AF'] * 100
+            ).round(2)
+            
+            # Combine with historical data; fetched days replace known ones
+            keys = pd.MultiIndex.from_frame(new_data[['NIDID', 'date']])
+            kept = ~pd.MultiIndex.from_frame(self.old_data[['NIDID', 'date']]).isin(keys)
+            all_data = pd.concat([self.old_data[kept], new_data], ignore_index=True)
+            
+            # Flag suspect storage values; statistics only use rows that pass
+            all_data = self.qc.screen(all_data)
+            stats = stats_table = None
+            if self.qc.any_passed(all_data):
+                # Calculate statistics
+                passed = self.qc.passed(all_data)
+                stats = self._calculate_statistics(passed)
+                stats_table = self._stats_table(passed, stats)
+                
+                # Persist percentiles as a memory-mapped lookup table
+                climatology = ClimatologyTable.ensure(
+                    stats, self.climatology_path, site_col='NIDID'
+                )
+            
+            # Save processed data
+            self._save_processed_data(all_data, stats_table)
+            if self.multi_reservoir_outputs and stats is not None:
+                self._save_reservoir_outputs(all_data, stats_table, climatology)
+            self._store_warehouse(all_data, stats)
+            self.stores.deltas.publish('reservoirs')
+            self.stores.watermarks.update_dates('reservoirs', new_data, 'NIDID')
+            self.old_data = all_data
+            
+            self.logger.info("Reservoir data update completed successfully")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error updating reservoir data: {e}")
+            raise
+
+    def _new_or_revised(self, fetched: pd.DataFrame,
+                        history: pd.DataFrame) -> pd.DataFrame:
+        """Fetched days missing from the history or changed since.
+
+        The fetch overlaps the last known days, so a partial value for the
+        current day is refreshed once the full day is reported.
+        """
+        fetched = fetched.drop_duplicates(['NIDID', 'date'], keep='last')
+        known = (history.drop_duplicates(['NIDID', 'date'], keep='last')
+                 .set_index(['NIDID', 'date']))
+        index = pd.MultiIndex.from_frame(fetched[['NIDID', 'date']])
+        changed = ~index.isin(known.index)
+        for col in ['elev_Ft', 'storage_AF']:
+            if col not in known.columns:
+                continue
+            previous = known[col].reindex(index).to_numpy(dtype=float)
+            values = fetched[col].to_numpy(dtype=float)
+            changed |= ~np.isclose(values, previous, equal_nan=True)
+        return fetched[changed]
+
+    def _attach_operating_targets(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Attach each reservoir's latest operating targets by day of year."""
+        try:
+            if not {'OT_Ft', 'OT_AF', 'day_month'} <= set(self.old_data.columns):
+                self.logger.warning("No operating targets in historical data")
+                return df
+            
+            targets = (self.old_data.dropna(subset=['OT_AF'])
+                       .sort_values('date')
+                       .drop_duplicates(['NIDID', 'day_month'], keep='last')
+                       [['NIDID', 'day_month', 'OT_Ft', 'OT_AF']])
+            
+            return (df.drop(columns=['OT_Ft', 'OT_AF'], errors='ignore')
+                    .merge(targets, on=['NIDID', 'day_month'], how='left'))
+            
+        except Exception as e:
+            self.logger.error(f"Error attaching operating targets: {e}")
+            raise
+
+    def _calculate_current_conditions(
+        self,
+        data: pd.DataFrame,
+        climatology: ClimatologyTable
+    ) -> pd.DataFrame:
+        """Classify the latest percent storage for each reservoir."""
+        try:
+            current = run_sharded(
+                self.qc.passed(data),
+                latest_rows,
+                'NIDID',
+                ['NIDID'],
+                workers=self.setup.stat_workers,
+                date_col='date'
+            )
+            current = current.rename(columns={'percentStorage': 'percent_storage'})
+            
+            # Look up the (NIDID, julian) envelope from the climatology table
+            current = pd.concat(
+                [current, climatology.lookup(current['NIDID'], current['julian'])],
+                axis=1
+            )
+            current['status'] = current.apply(self.determine_status, axis=1)
+            
+            return current
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating current conditions: {e}")
+            raise
+
+    def _save_reservoir_outputs(
+        self,
+        data: pd.DataFrame,
+        stats: pd.DataFrame,
+        climatology: ClimatologyTable
+    ):
+        """Save per-reservoir series and stats, site status and a manifest."""
+        try:
+            self.sites_dir.mkdir(exist_ok=True)
+            
+            series_cols = [
+                col for col in
+                ['date', 'elev_Ft', 'storage_AF', 'percentStorage', 'qc_flag']
+                if col in data.columns
+            ]
+            data = data.sort_values(['NIDID', 'date'])
+            series_by_site = dict(tuple(data.groupby('NIDID')))
+            stats_by_site = dict(tuple(stats.groupby('site')))
+            
+            current = self._calculate_current_conditions(data, climatology)
+            
+            # Current status for every USACE site, with or without data
+            sites_status = self.sites[['District', 'Name', 'NIDID', 'Loc_ID', 'geometry']].merge(
+                current[['NIDID', 'status', 'percent_storage', 'julian', 'flow50', 'date']],
+                on='NIDID',
+                how='left'
+            )
+            sites_status['status'] = sites_status['status'].fillna('unknown')
+            
+            manifest = {
+                'generated': self.setup.today.strftime('%Y-%m-%d'),
+                'status': 'all_reservoir_sites.geojson',
+                'reservoirs': []
+            }
+            with OutputWriter(self.setup.output_workers) as out:
+                out.geojson(
+                    sites_status, self.reservoir_dir / "all_reservoir_sites.geojson"
+                )
+                for _, site in sites_status.iterrows():
+                    nidid = site['NIDID']
+                    entry = {
+                        'NIDID': nidid,
+                        'name': site['Name'],
+                        'district': site['District'],
+                        'status': site['status']
+                    }
+                    
+                    if nidid in series_by_site:
+                        series = series_by_site[nidid][series_cols]
+                        out.csv(series, self.sites_dir / f"{nidid}.csv", precision=2)
+                        entry.update({
+                            'series': f"sites/{nidid}.csv",
+                            'start': series['date'].iloc[0].strftime('%Y-%m-%d'),
+                            'end': series['date'].iloc[-1].strftime('%Y-%m-%d'),
+                            'nobs': len(series)
+                        })
+                    
+                    if nidid in stats_by_site:
+                        out.csv(stats_by_site[nidid], self.sites_dir / f"{nidid}_stats.csv")
+                        entry['stats'] = f"sites/{nidid}_stats.csv"
+                    
+                    manifest['reservoirs'].append(entry)
+            
+            # Every file listed in the manifest now exists; swap it in whole
+            manifest_path = self.reservoir_dir / "reservoir_manifest.json"
+            tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, manifest_path)
+            
+            self.logger.info(
+                f"Saved outputs for {len(manifest['reservoirs'])} reservoirs"
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error saving per-reservoir outputs: {e}")
+            raise
+
+    def _store_warehouse(self, data: pd.DataFrame, stats: Optional[pd.DataFrame]):
+        """Upsert this run's tables into the warehouse."""
+        warehouse = self.stores.warehouse
+        if warehouse is None:
+            return
+        try:
+            warehouse.upsert('reservoirs_observations', data, ['NIDID', 'date'])
+            if stats is not None:
+                warehouse.replace('reservoirs_stats', stats, ['NIDID', 'julian'])
+            warehouse.replace('reservoirs_sites', self.sites, ['Loc_ID'])
+            
+        except Exception as e:
+            self.logger.error(f"Error storing reservoir warehouse tables: {e}")
+            raise
+
+    def _save_processed_data(self, data: pd.DataFrame, stats: Optional[pd.DataFrame]):
+        """Save all processed data files; ``stats=None`` keeps the stats file.
+        
+        ``stats`` is the published table from ``_stats_table``.
+        """
+        try:
+            # Main data, Canyon Lake data and statistics
+            canyon_lake = data[data['name'] == "Canyon Lake"]
+            with OutputWriter(self.setup.output_workers) as out:
+                out.csv(data, self.reservoir_dir / "usace_dams.csv")
+                out.csv(canyon_lake, self.reservoir_dir / "all_reservoir_data.csv")
+                if stats is not None:
+                    out.csv(stats, self.reservoir_dir / "all_reservoir_stats.csv")
+            
+            self.logger.info("All reservoir data files saved successfully")
+            
+        except Exception as e:
+            self.logger.error(f"Error saving processed data: {e}")
+            raise
+
+if __name__ == "__main__":
+    processor = ReservoirDataProcessor()
     processor.update_reservoir_data()
\ No newline at end of file
@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+import pandas as pd
+import geopandas as gpd
+from typing import Dict
+from global0_set_apis_libraries import GlobalSetup
+from global1_output_writer import write_csv
+from global1_spatial_index import REGION_COLUMNS, REGION_LAYERS, get_spatial_index
+
+# Site registries: domain -> file, site id column and, for tables, the
+# longitude/latitude columns
+SITE_REGISTRIES = {
+    'streamflow': {'path': 'streamflow/stream_gauge_sites.geojson', 'id': 'site'},
+    'reservoirs': {'path': 'reservoirs/usace_sites.geojson', 'id': 'NIDID'},
+    'groundwater': {'path': 'gw/well_metadata.csv', 'id': 'state_id',
+                    'xy': ('dec_long_va', 'dec_lat_va')},
+    'quality': {'path': 'quality/water_quality_sites.geojson', 'id': 'site_id'},
+    'pcp': {'path': 'pcp/all_pcp_locations_metadata.csv', 'id': 'id',
+            'xy': ('longitude', 'latitude')}
+}
+
+class SiteRegionProcessor:
+    """Assign every registered site to its HUC6, HUC8, county and watershed."""
+
+    def __init__(self):
+        """Initialize with global setup and configuration."""
+        self.setup = GlobalSetup()
+        self.logger = self.setup.logger
+
+        # Initialize paths
+        self.output_path = self.setup.data_dir / "site_regions.csv"
+        self.state_path = self.setup.data_dir / "site_regions_state.json"
+
+    def _fingerprints(self) -> Dict[str, str]:
+        """Content hash of every site registry and region layer."""
+        paths = ([spec['path'] for spec in SITE_REGISTRIES.values()]
+                 + [spec['path'] for spec in REGION_LAYERS.values()])
+        return {
+            path: hashlib.sha1((self.setup.data_dir / path).read_bytes()).hexdigest()
+            for path in paths
+            if (self.setup.data_dir / path).exists()
+        }
+
+    def _load_sites(self, domain: str) -> gpd.GeoSeries:
+        """Point locations of a registry, indexed by site id."""
+        spec = SITE_REGISTRIES[domain]
+        path = self.setup.data_dir / spec['path']
+        if 'xy' in spec:
+            table = pd.read_csv(path).dropna(subset=[spec['id'], *spec['xy']])
+            x_col, y_col = spec['xy']
+            sites = gpd.GeoDataFrame(
+                table, geometry=gpd.points_from_xy(table[x_col], table[y_col]),
+                crs="EPSG:4326"
+            )
+        else:
+            sites = gpd.read_file(path).dropna(subset=[spec['id']])
+
+        # Numeric ids read as floats (12600.0) are published as integers
+        ids = sites[spec['id']]
+        if pd.api.types.is_float_dtype(ids):
+            ids = ids.astype('int64')
+        sites.index = pd.Index(ids.astype(str), name='site')
+        return sites.geometry[~sites.index.duplicated(keep='first')]
+
+    def calculate_site_regions(self) -> pd.DataFrame:
+        """Region columns for every site of every registry."""
+        try:
+            index = get_spatial_index(self.setup.data_dir)
+            tables = []
+            for domain, spec in SITE_REGISTRIES.items():
+                if not (self.setup.data_dir / spec['path']).exists():
+                    self.logger.warning(f"No {domain} site registry at {spec['path']}")
+                    continue
+                sites = self._load_sites(domain)
+                regions = index.assign(sites).reset_index()
+                tables.append(regions.assign(domain=domain))
+                self.logger.info(f"Assigned regions to {len(sites)} {domain} sites")
+
+            return pd.concat(tables, ignore_index=True)[['domain', 'site'] + REGION_COLUMNS]
+
+        except Exception as e:
+            self.logger.error(f"Error assigning site regions: {e}")
+            raise
+
+    def update_site_regions(self, force: bool = False) -> bool:
+        """Main method to reassign sites when a registry or layer changes.
+
+        Returns True when ``site_regions.csv`` was rewritten.
+        """
+        try:
+            fingerprints = self._fingerprints()
+            if (not force and self.output_path.exists() and self.state_path.exists()
+                    and json.loads(self.state_path.read_text()) == fingerprints):
+                self.logger.info("Site registries unchanged; skipping region assignment")
+                return False
+
+            regions = self.calculate_site_regions()
+            write_csv(regions, self.output_path)
+
+            tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+            tmp_path.write_text(json.dumps(fingerprints, indent=2))
+            os.replace(tmp_path, self.state_path)
+
+            self.logger.info(f"Saved regions for {len(regions)} sites to {self.output_path}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error updating site regions: {e}")
+            raise
+
+if __name__ == "__main__":
+    processor = SiteRegionProcessor()
+    processor.update_site_regions(force=True)
@@ -1,310 +1,641 @@
-import pandas as pd
-import geopandas as gpd
-import numpy as np
-from pathlib import Path
-import requests
-from datetime import datetime, timedelta
-import json
-from typing import Dict, List, Optional, Tuple
-from global0_set_apis_libraries import GlobalSetup
-
-class StreamflowProcessor:
-    """Process and analyze USGS streamflow data for Boerne Water Dashboard."""
-    
-    def __init__(self):
-        """Initialize with global setup and configuration."""
-        self.setup = GlobalSetup()
-        self.logger = self.setup.logger
-        
-        # USGS configurations
-        self.parameter_code = '00060'  # discharge in cubic feet per second
-        self.statistic_code = '00003'  # mean
-        self.service = 'dv'  # daily values
-        
-        # Initialize paths
-        self.streamflow_dir = self.setup.data_dir / "streamflow"
-        self.streamflow_dir.mkdir(exist_ok=True)
-        
-        # Load initial data
-        self._load_historical_data()
-        
-    def _load_historical_data(self):
-        """Load historical streamflow data and site information."""
-        try:
-            # Load site information
-            self.sites = gpd.read_file(
-                self.streamflow_dir / "stream_gauge_sites.geojson"
-            )[['site', 'name', 'huc8', 'startYr', 'endYr', 
-               'nYears', 'geometry', 'ws_watershed']]
-            
-            # Load site metadata
-            self.site_metadata = pd.read_csv(
-                self.streamflow_dir / "stream_gauge_metadata.csv"
-            )
-            
-            # Load historical flow data
-            self.historic_data = pd.read_csv(
-                self.streamflow_dir / "historic_stream_data.csv",
-                dtype={'site': str}
-            )
-            self.historic_data['date'] = pd.to_datetime(
-                self.historic_data['date']
-            )
-            
-            self.logger.info("Historical data loaded successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error loading historical data: {e}")
-            raise
-            
-    def _fetch_nwis_data(self, site: str, start_date: str, 
-                        end_date: str) -> pd.DataFrame:
-        """Fetch data from USGS NWIS web service."""
-        try:
-            url = (
-                f"https://waterservices.usgs.gov/nwis/dv/"
-                f"?format=json&sites={site}"
-                f"&startDT={start_date}&endDT={end_date}"
-                f"&parameterCd={self.parameter_code}"
-                f"&statCd={self.statistic_code}"
-            )
-            
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract time series data
-            if 'value' in data['value']['timeSeries'][0]:
-                values = data['value']['timeSeries'][0]['values'][0]['value']
-                df = pd.DataFrame(values)
-                df['site'] = site
-                df['datetime'] = pd.to_datetime(df['dateTime'])
-                df['value'] = pd.to_numeric(df['value'])
-                return df
-            
-            return pd.DataFrame()
-            
-        except Exception as e:
-            self.logger.error(f"Error fetching NWIS data for site {site}: {e}")
-            raise
-            
-    def _calculate_rolling_average(self, df: pd.DataFrame, 
-                                 window: int = 7) -> pd.DataFrame:
-        """Calculate rolling average using global setup's moving average."""
-        try:
-            df = df.copy()
-            df['roll_mean'] = df.groupby('site')['value'].transform(
-                lambda x: self.setup.moving_average(x, window)
-            )
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating rolling average: {e}")
-            raise
-            
-    def _calculate_flow_statistics(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate flow statistics by site and julian day."""
-        try:
-            stats = []
-            
-            for site in df['site'].unique():
-                site_data = df[df['site'] == site]
-                
-                site_stats = site_data.groupby(['site', 'julian']).agg({
-                    'roll_mean': [
-                        'count',
-                        'min',
-                        lambda x: np.percentile(x, 10),
-                        lambda x: np.percentile(x, 25),
-                        lambda x: np.percentile(x, 50),
-                        lambda x: np.percentile(x, 75),
-                        lambda x: np.percentile(x, 90),
-                        'max'
-                    ]
-                }).reset_index()
-                
-                site_stats.columns = [
-                    'site', 'julian', 'Nobs', 'min', 'flow10',
-                    'flow25', 'flow50', 'flow75', 'flow90', 'max'
-                ]
-                
-                # Add year information
-                site_stats['startYr'] = site_data['year'].min()
-                site_stats['endYr'] = site_data['year'].max()
-                
-                stats.append(site_stats)
-            
-            return pd.concat(stats, ignore_index=True)
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating flow statistics: {e}")
-            raise
-
-    def determine_status(self, row: pd.Series) -> str:
-        """Determine streamflow status based on percentiles."""
-        if pd.isna(row['flow']):
-            return "unknown"
-        elif row['flow'] <= row['flow10']:
-            return "Extremely Dry"
-        elif row['flow'] <= row['flow25']:
-            return "Very Dry"
-        elif row['flow'] < row['flow50']:
-            return "Moderately Dry"
-        elif row['flow'] < row['flow75']:
-            return "Moderately Wet"
-        elif row['flow'] < row['flow90']:
-            return "Very Wet"
-        else:
-            return "Extremely Wet"
-
-    def get_status_color(self, status: str) -> str:
-        """Get color code for flow status."""
-        color_map = {
-            "Extremely Dry": "darkred",
-            "Very Dry": "red",
-            "Moderately Dry": "orange",
-            "Moderately Wet": "cornflowerblue",
-            "Very Wet": "blue",
-            "Extremely Wet": "navy",
-            "unknown": "gray"
-        }
-        return color_map.get(status, "gray")
-
-    def update_streamflow_data(self):
-        """Main method to update all streamflow-related data."""
-        try:
-            # Get latest data for each site
-            new_data = []
-            for site in self.sites['site'].unique():
-                last_date = self.historic_data[
-                    self.historic_data['site'] == site
-                ]['date'].max()
-                
-                site_data = self._fetch_nwis_data(
-                    site,
-                    (last_date + timedelta(days=1)).strftime('%Y-%m-%d'),
-                    self.setup.today.strftime('%Y-%m-%d')
-                )
-                
-                if not site_data.empty:
-                    new_data.append(site_data)
-            
-            if new_data:
-                new_data = pd.concat(new_data, ignore_index=True)
-                
-                # Process new data
-                new_data['julian'] = new_data['datetime'].dt.dayofyear
-                new_data['year'] = new_data['datetime'].dt.year
-                new_data = self._calculate_rolling_average(new_data)
-                
-                # Combine with historical data
-                combined_data = pd.concat(
-                    [self.historic_data, new_data], 
-                    ignore_index=True
-                )
-                
-                # Calculate statistics
-                stats = self._calculate_flow_statistics(combined_data)
-                
-                # Calculate current conditions
-                current_conditions = self._calculate_current_conditions(
-                    combined_data,
-                    stats
-                )
-                
-                # Save results
-                self._save_processed_data(
-                    combined_data,
-                    stats,
-                    current_conditions
-                )
-                
-            self.logger.info("Streamflow data update completed successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error updating streamflow data: {e}")
-            raise
-
-    def _calculate_current_conditions(
-        self, 
-        data: pd.DataFrame, 
-        stats: pd.DataFrame
-    ) -> pd.DataFrame:
-        """Calculate current conditions for each site."""
-        try:
-            # Get most recent data for each site
-            current = data.loc[data.groupby('site')['datetime'].idxmax()]
-            
-            # Merge with statistics
-            conditions = current.merge(
-                stats,
-                on=['site', 'julian'],
-                how='left'
-            )
-            
-            # Determine status
-            conditions['status'] = conditions.apply(
-                self.determine_status,
-                axis=1
-            )
-            conditions['color'] = conditions['status'].map(
-                self.get_status_color
-            )
-            
-            return conditions
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating current conditions: {e}")
-            raise
-
-    def _save_processed_data(
-        self, 
-        data: pd.DataFrame,
-        stats: pd.DataFrame,
-        current: pd.DataFrame
-    ):
-        """Save all processed streamflow data."""
-        try:
-            # Save main streamflow data
-            data.to_csv(
-                self.streamflow_dir / "all_stream_data.csv",
-                index=False
-            )
-            
-            # Save statistics
-            stats.to_csv(
-                self.streamflow_dir / "all_stream_stats.csv",
-                index=False
-            )
-            
-            # Update sites GeoJSON with current conditions
-            sites_with_conditions = self.sites.merge(
-                current[['site', 'status', 'flow', 'flow50']],
-                on='site',
-                how='left'
-            )
-            sites_with_conditions.to_file(
-                self.streamflow_dir / "all_stream_gauge_sites.geojson",
-                driver='GeoJSON'
-            )
-            
-            # Save current status by watershed
-            current_status = current.merge(
-                self.sites[['site', 'huc8', 'ws_watershed']],
-                on='site',
-                how='left'
-            )
-            current_status.to_csv(
-                self.streamflow_dir / "current_sites_status.csv",
-                index=False
-            )
-            
-            self.logger.info("All streamflow data files saved successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error saving processed data: {e}")
-            raise
-
-if __name__ == "__main__":
-    processor = StreamflowProcessor()
-    processor.update_streamflow_data()
\ No newline at end of file
+import os
+import pandas as pd
+import geopandas as gpd
+import numpy as np
+from pathlib import Path
+import requests
+from datetime import datetime, timedelta
+import json
+import argparse
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+from global0_set_apis_libraries import GlobalSetup
+from global1_pipeline_stores import PipelineStores
+from global1_climatology_table import ClimatologyTable
+from global1_nwis_stream import IvDownsampler
+from global1_output_writer import CsvAppender, OutputWriter
+from global1_quality_control import QC_FLAG_NAMES, QualityControl
+from global1_sharded_stats import latest_rows, percentile_stats, run_sharded
+from global1_spatial_index import get_spatial_index
+from global1_streaming_rebuild import FrameAccumulator, MemoryBudget, site_chunks
+
+class StreamflowProcessor:
+    """Process and analyze USGS streamflow data for Boerne Water Dashboard."""
+    
+    def __init__(self, load_history: bool = True):
+        """Initialize with global setup and configuration.
+        
+        A processor only used for a streaming rebuild can skip loading the
+        history with ``load_history=False``; it is loaded on first update.
+        """
+        self.setup = GlobalSetup()
+        self.logger = self.setup.logger
+        self.stores = PipelineStores(self.setup.data_dir)
+        
+        # USGS configurations
+        self.parameter_code = '00060'  # discharge in cubic feet per second
+        self.statistic_code = '00003'  # mean
+        self.service = 'dv'  # daily values
+        
+        # Trailing days of provisional daily values re-fetched each update,
+        # since NWIS may still revise them
+        self.revision_days = 3
+        
+        # Provisional daily means from 15-minute instantaneous values, for
+        # the days the daily-values service has not published yet
+        self.use_iv = os.environ.get('BOERNE_STREAMFLOW_IV') == '1'
+        self.iv_days = 7
+        self.hourly_hours = 72
+        self.hourly_data = None
+        
+        # Columns of the daily record; working columns are recomputed
+        self.record_columns = ['site', 'date', 'julian', 'flow', 'source']
+        
+        # Initialize paths
+        self.streamflow_dir = self.setup.data_dir / "streamflow"
+        self.streamflow_dir.mkdir(exist_ok=True)
+        self.climatology_path = self.streamflow_dir / "stream_climatology.npy"
+        self.qc = QualityControl('streamflow', self.streamflow_dir)
+        
+        # Load initial data
+        self.historic_data = None
+        self._load_historical_data(load_history)
+        
+    def _load_historical_data(self, load_history: bool = True):
+        """Load historical streamflow data and site information."""
+        try:
+            # Load site information; HUC8 and watershed come from the
+            # gauge locations, so new gauges need no hand-filled columns
+            sites = gpd.read_file(self.streamflow_dir / "stream_gauge_sites.geojson")
+            regions = get_spatial_index(self.setup.data_dir).assign(sites.geometry)
+            for col in ['huc8', 'ws_watershed']:
+                sites[col] = (regions[col].fillna(sites[col]) if col in sites
+                              else regions[col])
+            self.sites = sites[['site', 'name', 'huc8', 'startYr', 'endYr',
+                                'nYears', 'geometry', 'ws_watershed']]
+            
+            # Load site metadata
+            self.site_metadata = pd.read_csv(
+                self.streamflow_dir / "stream_gauge_metadata.csv"
+            )
+            
+            if not load_history:
+                return
+            
+            # Load historical flow data, from the warehouse when enabled
+            warehouse = self.stores.warehouse
+            if (warehouse is not None
+                    and warehouse.has_table('streamflow_observations')):
+                self.historic_data = warehouse.load(
+                    'streamflow_observations',
+                    parse_dates=['date']
+                )
+            else:
+                self.historic_data = self._read_record()
+            
+            # 'dv' rows are published daily values, 'iv' rows provisional
+            if 'source' not in self.historic_data.columns:
+                self.historic_data['source'] = 'dv'
+            
+            self.logger.info("Historical data loaded successfully")
+            
+        except Exception as e:
+            self.logger.error(f"Error loading historical data: {e}")
+            raise
+            
+    def _read_record(self) -> pd.DataFrame:
+        """The published daily record, or the historic file before the first publish.
+        
+        The published file runs well past the historic one, which ends in
+        February 2022, so updates must build on it or they would republish
+        the shorter series.
+        """
+        path = self.streamflow_dir / "all_stream_data.csv"
+        if not path.exists():
+            path = self.streamflow_dir / "historic_stream_data.csv"
+        df = pd.read_csv(path, dtype={'site': str})
+        
+        # Working columns a run may have published are recomputed
+        df = df[[col for col in self.record_columns if col in df.columns]]
+        df['date'] = pd.to_datetime(df['date'])
+        self.logger.info(f"Loaded {len(df)} streamflow rows from {path.name}")
+        return df
+            
+    def _fetch_nwis_data(self, site: str, start_date: str, 
+                        end_date: str) -> pd.DataFrame:
+        """Fetch data from USGS NWIS web service."""
+        try:
+            url = (
+                f"{self.setup.nwis_url}dv/"
+                f"?format=json&sites={site}"
+                f"&startDT={start_date}&endDT={end_date}"
+                f"&parameterCd={self.parameter_code}"
+                f"&statCd={self.statistic_code}"
+            )
+            
+            response = requests.get(url)
+            response.raise_for_status()
+            data = response.json()
+            
+            # Extract time series data (empty before a gauge's record starts)
+            time_series = data['value']['timeSeries']
+            if time_series and time_series[0]['values'][0]['value']:
+                values = time_series[0]['values'][0]['value']
+                df = pd.DataFrame(values)
+                df['site'] = site
+                df['datetime'] = pd.to_datetime(df['dateTime'])
+                df['value'] = pd.to_numeric(df['value'])
+                return df
+            
+            return pd.DataFrame()
+            
+        except Exception as e:
+            self.logger.error(f"Error fetching NWIS data for site {site}: {e}")
+            raise
+            
+    def _fetch_nwis_iv(self, sites: List[str], 
+                       start_date: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Fetch instantaneous values for all sites as daily and hourly means.
+        
+        The response is streamed through an IvDownsampler, so the raw
+        15-minute series is never held in memory.
+        """
+        try:
+            url = (
+                f"{self.setup.nwis_url}iv/"
+                f"?format=json&sites={','.join(sites)}"
+                f"&startDT={start_date}"
+                f"&parameterCd={self.parameter_code}"
+            )
+            
+            with requests.get(url, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                downsampler = IvDownsampler(self.hourly_hours).consume(response.raw)
+            
+            self.logger.info(
+                f"Downsampled {downsampler.n_points} instantaneous values "
+                f"for {len(sites)} sites"
+            )
+            return downsampler.daily(), downsampler.hourly()
+            
+        except Exception as e:
+            self.logger.error(f"Error fetching NWIS instantaneous values: {e}")
+            raise
+            
+    def _new_or_revised(self, fetched: pd.DataFrame,
+                        history: pd.DataFrame) -> pd.DataFrame:
+        """Fetched daily values missing from the history or changed since."""
+        known = (history.drop_duplicates(['site', 'date'], keep='last')
+                 .set_index(['site', 'date'])['flow'])
+        previous = known.reindex(
+            pd.MultiIndex.from_frame(fetched[['site', 'date']])
+        ).to_numpy(dtype=float)
+        values = fetched['value'].to_numpy(dtype=float)
+        changed = np.isnan(previous) | ~np.isclose(values, previous, equal_nan=True)
+        return fetched[changed]
+        
+    def _provisional_days(self, new_data: List[pd.DataFrame],
+                          history: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Provisional daily rows for days without a published daily value."""
+        published = pd.concat(
+            [history[['site', 'date']]] + [df[['site', 'date']] for df in new_data]
+        )
+        last_dv = published.groupby('site')['date'].max()
+        start = max(
+            last_dv.min() + timedelta(days=1),
+            pd.Timestamp(self.setup.today) - timedelta(days=self.iv_days)
+        )
+        
+        daily, hourly = self._fetch_nwis_iv(
+            list(self.sites['site'].unique()),
+            start.strftime('%Y-%m-%d')
+        )
+        
+        # Daily values supersede provisional ones
+        covered = daily['site'].map(last_dv)
+        daily = daily[covered.isna() | (daily['datetime'] > covered)].copy()
+        daily['date'] = daily['datetime']
+        return daily, hourly
+            
+    def _calculate_rolling_average(self, df: pd.DataFrame, 
+                                 window: int = 7) -> pd.DataFrame:
+        """Add a per-site ``roll_mean`` column to ``df`` in place."""
+        try:
+            df['roll_mean'] = df.groupby('site')['value'].transform(
+                lambda x: self.setup.moving_average(x, window)
+            )
+            return df
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating rolling average: {e}")
+            raise
+            
+    def _calculate_flow_statistics(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calculate flow statistics by site and julian day."""
+        try:
+            stats = run_sharded(
+                df,
+                percentile_stats,
+                'site',
+                ['site', 'julian'],
+                workers=self.setup.stat_workers,
+                value_col='roll_mean'
+            )
+            
+            # Add year information
+            years = df.groupby('site')['year'].agg(
+                startYr='min', endYr='max'
+            ).reset_index()
+            
+            return stats.merge(years, on='site', how='left')
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating flow statistics: {e}")
+            raise
+
+    def determine_status(self, row: pd.Series) -> str:
+        """Determine streamflow status based on percentiles."""
+        if pd.isna(row['flow']):
+            return "unknown"
+        elif row['flow'] <= row['flow10']:
+            return "Extremely Dry"
+        elif row['flow'] <= row['flow25']:
+            return "Very Dry"
+        elif row['flow'] < row['flow50']:
+            return "Moderately Dry"
+        elif row['flow'] < row['flow75']:
+            return "Moderately Wet"
+        elif row['flow'] < row['flow90']:
+            return "Very Wet"
+        else:
+            return "Extremely Wet"
+
+    def get_status_color(self, status: str) -> str:
+        """Get color code for flow status."""
+        color_map = {
+            "Extremely Dry": "darkred",
+            "Very Dry": "red",
+            "Moderately Dry": "orange",
+            "Moderately Wet": "cornflowerblue",
+            "Very Wet": "blue",
+            "Extremely Wet": "navy",
+            "unknown": "gray"
+        }
+        return color_map.get(status, "gray")
+
+    def update_streamflow_data(self) -> bool:
+        """Main method to update all streamflow-related data.
+        
+        Returns True when new data was published. The combined data is
+        kept as the in-memory history for the next update.
+        """
+        try:
+            if self.historic_data is None:
+                self._load_historical_data()
+            
+            # Provisional rows are rebuilt on every update
+            history = self.historic_data[self.historic_data['source'] == 'dv']
+            
+            # Fetch each site from its watermark, less the revision overlap
+            new_data = []
+            history_last = history.groupby('site')['date'].max()
+            for site in self.sites['site'].unique():
+                start = self.stores.watermarks.fetch_start(
+                    'streamflow', site, self.revision_days
+                )
+                last_date = history_last.get(site)
+                if last_date is not None and (
+                        start is None
+                        or start > last_date + timedelta(days=1)):
+                    # Sites without a mark, or marked past the history that
+                    # was loaded, start after their history so no gap opens
+                    start = last_date + timedelta(days=1 - self.revision_days)
+                elif start is None:
+                    # New gauges with neither start from the record's start
+                    start = pd.Timestamp(self.setup.start_date)
+                
+                site_data = self._fetch_nwis_data(
+                    site,
+                    start.strftime('%Y-%m-%d'),
+                    self.setup.today.strftime('%Y-%m-%d')
+                )
+                
+                if not site_data.empty:
+                    new_data.append(
+                        site_data.assign(date=site_data['datetime'], source='dv')
+                    )
+            
+            # Overlap days only count when NWIS revised them
+            if new_data:
+                fetched = self._new_or_revised(pd.concat(new_data, ignore_index=True), history)
+                new_data = [fetched] if not fetched.empty else []
+            
+            if self.use_iv:
+                provisional, self.hourly_data = self._provisional_days(
+                    new_data, history
+                )
+                if not provisional.empty:
+                    new_data.append(provisional.assign(source='iv'))
+            
+            if not new_data:
+                self.logger.info("No new streamflow data")
+                return False
+            
+            new_data = pd.concat(new_data, ignore_index=True)
+            
+            # Revised days replace their earlier values
+            revised = pd.MultiIndex.from_frame(new_data[['site', 'date']])
+            history = history[
+                ~pd.MultiIndex.from_frame(history[['site', 'date']]).isin(revised)
+            ]
+            
+            # Process new data
+            new_data['flow'] = new_data['value']
+            new_data['julian'] = new_data['datetime'].dt.dayofyear
+            new_data['year'] = new_data['datetime'].dt.year
+            new_data = self._calculate_rolling_average(new_data)
+            
+            # Combine with historical data
+            combined_data = pd.concat(
+                [history, new_data], 
+                ignore_index=True
+            )
+            
+            # Flag suspect values; statistics only use rows that pass
+            combined_data = self.qc.screen(combined_data)
+            stats = current_conditions = None
+            if self.qc.any_passed(combined_data):
+                passed = self.qc.passed(combined_data)
+                
+                # Calculate statistics
+                stats = self._calculate_flow_statistics(passed)
+                
+                # Persist percentiles as a memory-mapped lookup table
+                climatology = ClimatologyTable.ensure(
+                    stats,
+                    self.climatology_path
+                )
+                
+                # Calculate current conditions
+                current_conditions = self._calculate_current_conditions(
+                    passed,
+                    climatology
+                )
+            
+            # Save results
+            self._save_processed_data(
+                combined_data,
+                stats,
+                current_conditions
+            )
+            self._store_warehouse(
+                combined_data,
+                stats,
+                current_conditions
+            )
+            self.stores.deltas.publish('streamflow')
+            self.stores.watermarks.update_dates(
+                'streamflow', new_data[new_data['source'] == 'dv'], 'site'
+            )
+            self.historic_data = combined_data
+            
+            self.logger.info("Streamflow data update completed successfully")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error updating streamflow data: {e}")
+            raise
+
+    def _prepare_history(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Columns of new daily values for record rows of whole sites.
+        
+        Rows repeating a site and day keep the last copy, which is the
+        published one when the historic file is read first.
+        """
+        df['date'] = pd.to_datetime(df['date'])
+        df = (df.sort_values(['site', 'date'], kind='mergesort')
+              .drop_duplicates(subset=['site', 'date'], keep='last')
+              .reset_index(drop=True))
+        df['datetime'] = df['date']
+        df['value'] = df['flow']
+        df['year'] = df['date'].dt.year
+        df['source'] = df['source'].fillna('dv') if 'source' in df.columns else 'dv'
+        return self._calculate_rolling_average(df)
+
+    def rebuild_streamflow_data(self, streaming: bool = True) -> bool:
+        """Recompute every streamflow output from the full daily record.
+        
+        The record is the historic file plus the published data file,
+        which carries every later day and wins on shared days. With
+        ``streaming`` it is read a group of gauges at a time under the
+        ``BOERNE_REBUILD_MEMORY_MB`` ceiling and each group's rows are
+        screened, summarized and appended to the data file before the
+        next is read; otherwise it is processed as one group. Statistics,
+        current conditions and the QA report are the same either way;
+        streaming lists gauges in bucket order in the data file. The data
+        file and the warehouse observations are replaced together, or not
+        at all.
+        
+        Streamflow is the only domain with a streaming rebuild; the other
+        domains' records are a few thousand rows per site and rebuild in
+        memory.
+        """
+        try:
+            paths = [self.streamflow_dir / "historic_stream_data.csv"]
+            if (self.streamflow_dir / "all_stream_data.csv").exists():
+                paths.append(self.streamflow_dir / "all_stream_data.csv")
+            budget = MemoryBudget(self.setup.rebuild_memory_mb) if streaming else None
+            chunks = site_chunks(paths, 'site', budget, self.record_columns,
+                                 dtype={'site': str})
+            
+            stats = FrameAccumulator(['site', 'julian'])
+            latest = FrameAccumulator(['site'])
+            counts = {f'n_{name}': 'sum'
+                      for name in ['obs', 'passed', *QC_FLAG_NAMES.values()]}
+            report = FrameAccumulator(
+                ['site'], dict(counts, first_date='min', last_date='max')
+            )
+            warehouse = self.stores.warehouse
+            
+            # The data file and warehouse rows only replace the old ones if
+            # every stage succeeds
+            transaction = warehouse.transaction() if warehouse else nullcontext()
+            with transaction, CsvAppender(
+                    self.streamflow_dir / "all_stream_data.csv") as data_file:
+                if warehouse is not None:
+                    warehouse.clear('streamflow_observations')
+                for chunk in chunks:
+                    chunk = self.qc.screen(self._prepare_history(chunk), save_report=False)
+                    passed = self.qc.passed(chunk)
+                    report.add(self.qc.summarize(chunk))
+                    stats.add(self._calculate_flow_statistics(passed))
+                    latest.add(latest_rows(passed, 'site', 'datetime'))
+                    
+                    data_file.append(chunk[self.record_columns])
+                    if warehouse is not None:
+                        warehouse.upsert('streamflow_observations', chunk, ['site', 'date'])
+                    self.logger.info(
+                        f"Rebuilt {chunk['site'].nunique()} gauges ({len(chunk)} rows)"
+                    )
+                
+                report.result().to_csv(self.qc.report_path, index=False)
+                latest = latest.result()
+                if latest.empty:
+                    self.logger.warning(
+                        "QA/QC passed no streamflow rows; skipping statistics and status"
+                    )
+                    stats = current_conditions = None
+                else:
+                    stats = stats.result()
+                    climatology = ClimatologyTable.ensure(stats, self.climatology_path)
+                    current_conditions = self._calculate_current_conditions(
+                        latest,
+                        climatology
+                    )
+                self._save_processed_data(None, stats, current_conditions)
+                self._store_warehouse(None, stats, current_conditions)
+            
+            self.stores.deltas.publish('streamflow')
+            self.logger.info(f"Streamflow rebuild wrote {data_file.rows} rows")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error rebuilding streamflow data: {e}")
+            raise
+
+    def _calculate_current_conditions(
+        self, 
+        data: pd.DataFrame, 
+        climatology: ClimatologyTable
+    ) -> pd.DataFrame:
+        """Calculate current conditions for each site."""
+        try:
+            # Get most recent data for each site
+            current = run_sharded(
+                data,
+                latest_rows,
+                'site',
+                ['site'],
+                workers=self.setup.stat_workers,
+                date_col='datetime'
+            )
+            
+            # Look up the (site, julian) envelope from the climatology table
+            envelope = climatology.lookup(current['site'], current['julian'])
+            conditions = pd.concat(
+                [current.drop(columns=envelope.columns, errors='ignore'), envelope],
+                axis=1
+            )
+            
+            # Determine status
+            conditions['status'] = conditions.apply(
+                self.determine_status,
+                axis=1
+            )
+            conditions['color'] = conditions['status'].map(
+                self.get_status_color
+            )
+            
+            return conditions
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating current conditions: {e}")
+            raise
+
+    def _save_processed_data(
+        self, 
+        data: Optional[pd.DataFrame],
+        stats: Optional[pd.DataFrame],
+        current: Optional[pd.DataFrame]
+    ):
+        """Save all processed streamflow data.
+        
+        ``data=None`` keeps the data file, and ``stats=None`` (no row
+        passed QA/QC) keeps the stats and status files.
+        """
+        try:
+            with OutputWriter(self.setup.output_workers) as out:
+                if data is not None:
+                    out.csv(data[self.record_columns],
+                            self.streamflow_dir / "all_stream_data.csv")
+                if stats is not None:
+                    # Current status by watershed
+                    current_status = current.merge(
+                        self.sites[['site', 'huc8', 'ws_watershed']],
+                        on='site',
+                        how='left'
+                    )
+                    out.csv(stats, self.streamflow_dir / "all_stream_stats.csv")
+                    out.geojson(
+                        self._sites_with_conditions(current),
+                        self.streamflow_dir / "all_stream_gauge_sites.geojson"
+                    )
+                    out.csv(current_status,
+                            self.streamflow_dir / "current_sites_status.csv")
+                if self.hourly_data is not None:
+                    out.csv(
+                        self.hourly_data,
+                        self.streamflow_dir / "recent_stream_hourly.csv",
+                        date_format='%Y-%m-%d %H:%M'
+                    )
+            
+            self.logger.info("All streamflow data files saved successfully")
+            
+        except Exception as e:
+            self.logger.error(f"Error saving processed data: {e}")
+            raise
+
+    def _sites_with_conditions(self, current: pd.DataFrame) -> gpd.GeoDataFrame:
+        """Join current conditions, and the day they are for, onto the gauge sites."""
+        return self.sites.merge(
+            current[['site', 'status', 'flow', 'flow50', 'julian', 'date']],
+            on='site',
+            how='left'
+        )
+
+    def _store_warehouse(
+        self,
+        data: Optional[pd.DataFrame],
+        stats: Optional[pd.DataFrame],
+        current: Optional[pd.DataFrame]
+    ):
+        """Upsert this run's tables into the warehouse."""
+        warehouse = self.stores.warehouse
+        if warehouse is None:
+            return
+        try:
+            if data is not None:
+                # 'datetime' already holds the raw NWIS 'dateTime' stamp
+                warehouse.upsert(
+                    'streamflow_observations',
+                    data.drop(columns='dateTime', errors='ignore'),
+                    ['site', 'date']
+                )
+            if stats is not None:
+                warehouse.replace('streamflow_stats', stats, ['site', 'julian'])
+                warehouse.replace(
+                    'streamflow_current',
+                    self._sites_with_conditions(current),
+                    ['site']
+                )
+            warehouse.replace('streamflow_sites', self.sites, ['site'])
+            
+        except Exception as e:
+            self.logger.error(f"Error storing streamflow warehouse tables: {e}")
+            raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the streamflow outputs.")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="recompute every output from the historic record")
+    parser.add_argument('--in-memory', action='store_true',
+                        help="rebuild with the whole history loaded at once")
+    args = parser.parse_args()
+    
+    if args.rebuild:
+        processor = StreamflowProcessor(load_history=False)
+        processor.rebuild_streamflow_data(streaming=not args.in_memory)
+    else:
+        processor = StreamflowProcessor()
+        processor.update_streamflow_data()
\ No newline at end of file
@@ -1,171 +1,469 @@
-import pandas as pd
-import geopandas as gpd
-from pathlib import Path
-import pygsheets
-from datetime import datetime
-from typing import List, Dict
-from global0_set_apis_libraries import GlobalSetup
-
-class WaterQualityProcessor:
-    """Process water quality monitoring data for Boerne Water Dashboard.
-    
-    Originally created by Vianey Rueda (March 2022)
-    Converted to Python and enhanced for the current system.
-    """
-    
-    def __init__(self):
-        """Initialize with global setup configuration."""
-        self.setup = GlobalSetup()
-        self.logger = self.setup.logger
-        
-        # Initialize paths
-        self.quality_dir = self.setup.data_dir / "quality"
-        self.quality_dir.mkdir(exist_ok=True)
-        
-        # Monitoring site IDs
-        self.monitored_sites = [
-            "12600", "15126", "20823", "80186", "80230", 
-            "80904", "80966", "81596", "81641", "81671", "81672"
-        ]
-        
-        # Column mappings for data cleanup
-        self.column_mappings = {
-            'Name': 'site_id',
-            'Description': 'name',
-            'Basin': 'basin',
-            'County': 'county',
-            'Latitude': 'latitude',
-            'Longitude': 'longitude',
-            'TCEQ Stream Segment': 'stream_segment',
-            'Sample Date': 'date',
-            'Sample Depth (m)': 'sample_depth',
-            'Flow Severity': 'flow_severity',
-            'Conductivity (µs/cm)': 'conductivity',
-            'Dissolved Oxygent (mg/L)': 'dissolved_oxygen',
-            'Air Temperature (°C)': 'air_temp',
-            'Water Temperature (°C)': 'water_temp',
-            'E. Coli Average': 'ecoli_avg',
-            'Secchi Disk Transparency (m)': 'secchi_disk_transparency',
-            'Nitrate-Nitrogen (ppm or mg/L)': 'nitrate_nitrogen'
-        }
-        
-        self._load_historical_data()
-        
-    def _load_historical_data(self):
-        """Load historical water quality data and monitoring sites."""
-        try:
-            # Load historical data
-            self.historic_data = pd.read_csv(
-                self.quality_dir / "historic_water_quality.csv"
-            )
-            
-            # Load monitoring sites
-            self.monitoring_sites = gpd.read_file(
-                self.quality_dir / "water_quality_sites.geojson"
-            )
-            
-            self.logger.info("Historical water quality data loaded successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error loading historical data: {e}")
-            raise
-            
-    def _fetch_gsheet_data(self) -> pd.DataFrame:
-        """Fetch new water quality data from Google Sheets."""
-        try:
-            # Initialize Google Sheets client
-            gc = pygsheets.authorize(service_account_env_var='GSHEET_SERVICE_ACCOUNT')
-            
-            # Open spreadsheet and get data
-            spreadsheet_id = "1JAQLzSpbU2nMVb4Pe1XUA2lxU3a1XcY4oUYS8UhIaiA"
-            sheet = gc.open_by_key(spreadsheet_id)
-            worksheet = sheet[0]
-            
-            # Get data and convert to DataFrame
-            data = worksheet.get_all_records()
-            df = pd.DataFrame(data)
-            
-            # Filter for monitored sites
-            df = df[df['Name'].isin(self.monitored_sites)]
-            
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error fetching Google Sheets data: {e}")
-            raise
-            
-    def _process_quality_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Process and clean water quality data."""
-        try:
-            # Rename columns
-            df = df.rename(columns=self.column_mappings)
-            
-            # Convert date column
-            df['date'] = pd.to_datetime(df['date'])
-            
-            # Add year column
-            df['year'] = df['date'].dt.year
-            
-            # Sort data
-            df = df.sort_values(['site_id', 'date'])
-            
-            # Remove unnecessary columns
-            columns_to_keep = [
-                'site_id', 'name', 'basin', 'county', 'latitude', 
-                'longitude', 'stream_segment', 'date', 'sample_depth',
-                'flow_severity', 'conductivity', 'dissolved_oxygen',
-                'air_temp', 'water_temp', 'ecoli_avg',
-                'secchi_disk_transparency', 'nitrate_nitrogen', 'year'
-            ]
-            df = df[columns_to_keep]
-            
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error processing quality data: {e}")
-            raise
-            
-    def update_water_quality_data(self):
-        """Main method to update water quality data."""
-        try:
-            # Fetch new data
-            new_data = self._fetch_gsheet_data()
-            
-            # Process new data
-            processed_data = self._process_quality_data(new_data)
-            
-            # Filter for recent data (2022 onwards)
-            new_data = processed_data[
-                processed_data['year'] >= 2022
-            ].copy()
-            
-            # Combine with historical data
-            combined_data = pd.concat(
-                [self.historic_data, new_data],
-                ignore_index=True
-            )
-            
-            # Save updated data
-            self._save_processed_data(combined_data)
-            
-            self.logger.info("Water quality data update completed successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error updating water quality data: {e}")
-            raise
-            
-    def _save_processed_data(self, df: pd.DataFrame):
-        """Save processed water quality data."""
-        try:
-            output_path = self.quality_dir / "all_water_quality.csv"
-            df.to_csv(output_path, index=False)
-            
-            self.logger.info(f"Water quality data saved to {output_path}")
-            
-        except Exception as e:
-            self.logger.error(f"Error saving processed data: {e}")
-            raise
-
-if __name__ == "__main__":
-    processor = WaterQualityProcessor()
-    processor.update_water_quality_data()
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from pathlib import Path
+import pygsheets
+from datetime import datetime
+from typing import List, Dict
+from global0_set_apis_libraries import GlobalSetup
+from global1_pipeline_stores import PipelineStores
+from global1_output_writer import write_csv
+from global1_watermark_catalog import SOURCE_KEY
+
+class WaterQualityProcessor:
+    """Process water quality monitoring data for Boerne Water Dashboard.
+    
+    Originally created by Vianey Rueda (March 2022)
+    Converted to Python and enhanced for the current system.
+    """
+    
+    # A visit's E. coli and field readings share site, date and depth,
+    # so a fetched row only replaces a known row with the same readings
+    merge_keys = [
+        'site_id', 'date', 'sample_depth', 'flow_severity', 'pH',
+        'conductivity', 'dissolved_oxygen', 'air_temp', 'water_temp',
+        'ecoli_avg', 'secchi_disk_transparency', 'nitrate_nitrogen'
+    ]
+    
+    # Sheet headers and the published columns they map to
+    column_mappings = {
+        'Name': 'site_id',
+        'Description': 'name',
+        'Basin': 'basin',
+        'County': 'county',
+        'Latitude': 'latitude',
+        'Longitude': 'longitude',
+        'TCEQ Stream Segment': 'stream_segment',
+        'Sample Date': 'date',
+        'Sample Depth (m)': 'sample_depth',
+        'Flow Severity': 'flow_severity',
+        'pH': 'pH',
+        'Conductivity (µs/cm)': 'conductivity',
+        'Dissolved Oxygent (mg/L)': 'dissolved_oxygen',
+        'Air Temperature (°C)': 'air_temp',
+        'Water Temperature (°C)': 'water_temp',
+        'E. Coli Average': 'ecoli_avg',
+        'Secchi Disk Transparency (m)': 'secchi_disk_transparency',
+        'Nitrate-Nitrogen (ppm or mg/L)': 'nitrate_nitrogen'
+    }
+    
+    def __init__(self):
+        """Initialize with global setup configuration."""
+        self.setup = GlobalSetup()
+        self.logger = self.setup.logger
+        self.stores = PipelineStores(self.setup.data_dir)
+        
+        # Initialize paths
+        self.quality_dir = self.setup.data_dir / "quality"
+        self.quality_dir.mkdir(exist_ok=True)
+        
+        # Volunteer monitoring spreadsheet and its ingestion watermark, kept
+        # in the watermark catalog (older runs kept it in watermark_path)
+        self.spreadsheet_id = "1JAQLzSpbU2nMVb4Pe1XUA2lxU3a1XcY4oUYS8UhIaiA"
+        self.watermark_path = self.quality_dir / "quality_sheet_watermark.json"
+        self.watermark = self._load_watermark()
+        self._pending_watermark = None
+        
+        # Rows before the watermark reread on every revision; an edit there
+        # changes their checksum and triggers a full read
+        self.check_rows = 20
+        
+        # Samples from this year on come from the monitoring sheet
+        self.first_sheet_year = 2022
+        
+        # Parameters summarized per site and their exceedance thresholds
+        # (a sample exceeds when below 'min' or above 'max')
+        self.summary_parameters = [
+            'conductivity', 'dissolved_oxygen', 'ecoli_avg', 'nitrate_nitrogen',
+            'pH', 'water_temp', 'air_temp', 'secchi_disk_transparency'
+        ]
+        self.thresholds = {
+            'dissolved_oxygen': {'min': 5.0},
+            'ecoli_avg': {'max': 126.0},
+            'nitrate_nitrogen': {'max': 10.0},
+            'pH': {'min': 6.5, 'max': 9.0},
+            'water_temp': {'max': 33.9}
+        }
+        
+        # Monitoring site IDs
+        self.monitored_sites = [
+            "12600", "15126", "20823", "80186", "80230", 
+            "80904", "80966", "81596", "81641", "81671", "81672"
+        ]
+        
+        self._load_historical_data()
+        
+    def _load_historical_data(self):
+        """Load historical water quality data and monitoring sites."""
+        try:
+            # Load historical data, from the warehouse when enabled
+            warehouse = self.stores.warehouse
+            if warehouse is not None and warehouse.has_table('quality_observations'):
+                self.historic_data = warehouse.load('quality_observations').drop(
+                    columns='sample_copy'
+                )
+            elif self.watermark and (self.quality_dir / "all_water_quality.csv").exists():
+                # Incremental runs build on the previously published rows
+                self.historic_data = pd.read_csv(
+                    self.quality_dir / "all_water_quality.csv"
+                )
+            else:
+                self.historic_data = pd.read_csv(
+                    self.quality_dir / "historic_water_quality.csv"
+                )
+            
+            # Load monitoring sites
+            self.monitoring_sites = gpd.read_file(
+                self.quality_dir / "water_quality_sites.geojson"
+            )
+            
+            self.logger.info("Historical water quality data loaded successfully")
+            
+        except Exception as e:
+            self.logger.error(f"Error loading historical data: {e}")
+            raise
+            
+    def _load_watermark(self) -> Dict:
+        """Load the last ingested sheet row and revision time, if any."""
+        try:
+            watermark = self.stores.watermarks.get('quality')
+            if watermark:
+                return {'last_row': watermark['row'], 'updated': watermark['revision'],
+                        'header': watermark['header'],
+                        'checksum': watermark.get('checksum')}
+            if self.watermark_path.exists():
+                with open(self.watermark_path) as f:
+                    return json.load(f)
+            return {}
+        except Exception as e:
+            self.logger.error(f"Error loading sheet watermark: {e}")
+            raise
+            
+    def _save_watermark(self):
+        """Persist the watermark of the rows ingested by this run."""
+        try:
+            if self._pending_watermark is None:
+                return
+            self.stores.watermarks.update('quality', {SOURCE_KEY: {
+                'row': self._pending_watermark['last_row'],
+                'revision': self._pending_watermark['updated'],
+                'header': self._pending_watermark['header'],
+                'checksum': self._pending_watermark['checksum']
+            }})
+            self.watermark = self._pending_watermark
+            self.logger.info(
+                f"Sheet watermark saved at row {self.watermark['last_row']}"
+            )
+        except Exception as e:
+            self.logger.error(f"Error saving sheet watermark: {e}")
+            raise
+            
+    def _read_rows(self, worksheet, header: List[str], first_row: int) -> List[List]:
+        """Ranged read of all non-empty rows from ``first_row`` down."""
+        if first_row > worksheet.rows:
+            return []
+        rows = worksheet.get_values(
+            (first_row, 1), (worksheet.rows, len(header)),
+            include_tailing_empty_rows=False,
+            value_render=pygsheets.ValueRenderOption.UNFORMATTED_VALUE,
+            date_time_render_option=pygsheets.DateTimeRenderOption.FORMATTED_STRING
+        )
+        return [
+            (list(row) + [''] * len(header))[:len(header)]
+            for row in rows
+            if any(str(value).strip() for value in row)
+        ]
+            
+    @staticmethod
+    def _checksum(rows: List[List]) -> str:
+        """Digest of sheet rows as read, to detect later edits."""
+        return hashlib.sha1(json.dumps(rows, default=str).encode()).hexdigest()
+            
+    def _fetch_gsheet_data(self) -> pd.DataFrame:
+        """Fetch water quality rows added to Google Sheets since the watermark."""
+        try:
+            # Initialize Google Sheets client
+            gc = self.setup.authorize_sheets()
+            
+            # Open spreadsheet and check its revision time
+            sheet = gc.open_by_key(self.spreadsheet_id)
+            worksheet = sheet[0]
+            updated = sheet.updated
+            
+            if self.watermark and updated == self.watermark.get('updated'):
+                self.logger.info("Water quality sheet unchanged since last run")
+                self._pending_watermark = None
+                return pd.DataFrame(columns=self.watermark['header'])
+            
+            header = worksheet.get_values('A1', (1, worksheet.cols))[0]
+            header = [name for name in header if str(name).strip()]
+            
+            # Ranged read of appended rows, with a trailing block of the rows
+            # already read; a new header means start over
+            last_row = self.watermark.get('last_row', 1)
+            if header != self.watermark.get('header'):
+                last_row = 1
+            first_row = max(last_row + 1 - self.check_rows, 2)
+            rows = self._read_rows(worksheet, header, first_row)
+            known, rows = rows[:last_row + 1 - first_row], rows[last_row + 1 - first_row:]
+            
+            edited = self._checksum(known) != self.watermark.get('checksum')
+            if last_row > 1 and (not rows or edited):
+                # Modified without new rows, or with rows already read
+                # changed, means in-place edits, so reread everything and
+                # let the keyed merge absorb the changes
+                self.logger.info("Sheet edited in place, rereading all rows")
+                rows = self._read_rows(worksheet, header, 2)
+                known = []
+                new_last_row = 1 + len(rows)
+            else:
+                new_last_row = last_row + len(rows)
+            
+            self._pending_watermark = {
+                'last_row': new_last_row,
+                'updated': updated,
+                'header': header,
+                'checksum': self._checksum((known + rows)[-self.check_rows:]),
+                'full_read': new_last_row == 1 + len(rows)
+            }
+            self.logger.info(f"Fetched {len(rows)} sheet rows after row {last_row}")
+            
+            df = pd.DataFrame(rows, columns=header)
+            
+            # Filter for monitored sites
+            df = df[df['Name'].astype(str).isin(self.monitored_sites)]
+            
+            return df
+            
+        except Exception as e:
+            self.logger.error(f"Error fetching Google Sheets data: {e}")
+            raise
+            
+    def _process_quality_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Process and clean water quality data."""
+        try:
+            # Rename columns
+            df = df.rename(columns=self.column_mappings)
+            
+            # Convert date column
+            df['date'] = pd.to_datetime(df['date'])
+            
+            # Add year column
+            df['year'] = df['date'].dt.year
+            
+            # Sort data
+            df = df.sort_values(['site_id', 'date'])
+            
+            # Remove unnecessary columns
+            columns_to_keep = [
+                'site_id', 'name', 'basin', 'county', 'latitude', 
+                'longitude', 'stream_segment', 'date', 'sample_depth',
+                'flow_severity', 'pH', 'conductivity', 'dissolved_oxygen',
+                'air_temp', 'water_temp', 'ecoli_avg',
+                'secchi_disk_transparency', 'nitrate_nitrogen', 'year'
+            ]
+            df = df[columns_to_keep]
+            
+            return df
+            
+        except Exception as e:
+            self.logger.error(f"Error processing quality data: {e}")
+            raise
+            
+    def update_water_quality_data(self) -> bool:
+        """Main method to update water quality data.
+        
+        Returns True when new data was published. The combined data is
+        kept as the in-memory history for the next update.
+        """
+        try:
+            # Fetch new data
+            new_data = self._fetch_gsheet_data()
+            if self._pending_watermark is None:
+                return False
+            
+            # Process new data
+            processed_data = self._process_quality_data(new_data)
+            
+            # Filter for recent data (sheet years)
+            new_data = processed_data[
+                processed_data['year'] >= self.first_sheet_year
+            ].copy()
+            
+            # A full read restates every sheet row, edited ones included,
+            # so it replaces the sheet years of the history
+            historic = self.historic_data
+            if self._pending_watermark['full_read']:
+                years = GlobalSetup.parse_dates(historic['date']).dt.year
+                historic = historic[years < self.first_sheet_year]
+            
+            # Combine with historical data
+            combined_data = self._merge_samples(historic, new_data)
+            
+            # Save updated data and the per-site parameter summary
+            self._save_processed_data(combined_data)
+            self._save_summary(self.calculate_summary(combined_data))
+            self._store_warehouse(combined_data)
+            self.stores.deltas.publish('quality')
+            self._save_watermark()
+            self.stores.watermarks.update_dates('quality', combined_data, 'site_id')
+            self.historic_data = combined_data
+            
+            self.logger.info("Water quality data update completed successfully")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error updating water quality data: {e}")
+            raise
+            
+    def _normalize_samples(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Give sheet and CSV rows the same site, date and reading values."""
+        df = df.copy()
+        df['site_id'] = df['site_id'].astype(str).str.replace(
+            r'\.0$', '', regex=True
+        )
+        df['date'] = GlobalSetup.parse_dates(df['date']).dt.strftime('%Y-%m-%d')
+        
+        # Sheet cells arrive as text; keep any that are not numbers as is
+        for col in self.merge_keys[2:]:
+            if col in df.columns and col != 'flow_severity':
+                raw = df[col].replace('', np.nan)
+                values = pd.to_numeric(raw, errors='coerce').astype(float)
+                df[col] = values.where(values.notna(), raw)
+        return df
+            
+    def _merge_samples(self, historic: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+        """Merge new samples into history.
+        
+        A new row replaces every history row with the same ``merge_keys``
+        values; all other rows are kept, so merging never drops a
+        measurement (history's own repeated rows included).
+        """
+        try:
+            historic = self._normalize_samples(historic)
+            new = self._normalize_samples(new)
+            
+            def sample_hash(df):
+                return pd.util.hash_pandas_object(
+                    df.reindex(columns=self.merge_keys).astype(str), index=False
+                )
+            
+            known = sample_hash(historic).isin(sample_hash(new))
+            combined = pd.concat([historic[~known], new], ignore_index=True)
+            return combined.sort_values(
+                ['site_id', 'date'], kind='mergesort'
+            ).reset_index(drop=True)
+            
+        except Exception as e:
+            self.logger.error(f"Error merging water quality samples: {e}")
+            raise
+            
+    def _store_warehouse(self, df: pd.DataFrame):
+        """Upsert this run's tables into the warehouse."""
+        warehouse = self.stores.warehouse
+        if warehouse is None:
+            return
+        try:
+            # The merged frame is the whole record, so it replaces the table;
+            # 'sample_copy' numbers rows repeated verbatim in the record
+            df = df.assign(
+                site_id=df['site_id'].astype(str),
+                date=pd.to_datetime(df['date']),
+                sample_copy=df.groupby(
+                    self.merge_keys, dropna=False, sort=False
+                ).cumcount()
+            )
+            warehouse.replace(
+                'quality_observations', df, self.merge_keys + ['sample_copy']
+            )
+            warehouse.replace(
+                'quality_sites',
+                self.monitoring_sites.assign(
+                    site_id=self.monitoring_sites['site_id'].astype(int).astype(str)
+                ),
+                ['site_id']
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error storing water quality warehouse tables: {e}")
+            raise
+            
+    def calculate_summary(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Summarize each site x parameter per year and for the full record."""
+        try:
+            parameters = [p for p in self.summary_parameters if p in df.columns]
+            
+            # Long format: one row per sample value
+            long = df.assign(
+                site_id=df['site_id'].astype(str),
+                date=GlobalSetup.parse_dates(df['date'])
+            ).melt(
+                id_vars=['site_id', 'date'],
+                value_vars=parameters,
+                var_name='parameter'
+            )
+            long['value'] = pd.to_numeric(long['value'], errors='coerce')
+            long = long.dropna(subset=['value', 'date'])
+            long['period'] = long['date'].dt.year.astype(str)
+            
+            # Exceedance flags from the configured thresholds
+            low = long['parameter'].map(
+                {p: t.get('min', np.nan) for p, t in self.thresholds.items()})
+            high = long['parameter'].map(
+                {p: t.get('max', np.nan) for p, t in self.thresholds.items()})
+            long['exceeds'] = (long['value'] < low) | (long['value'] > high)
+            
+            # Stack a full-record copy so one groupby covers every period
+            long = pd.concat(
+                [long, long.assign(period='all')], ignore_index=True
+            ).sort_values('date', kind='mergesort')
+            grouped = long.groupby(['site_id', 'parameter', 'period'])
+            
+            summary = grouped['value'].agg(['count', 'min', 'median', 'max', 'mean'])
+            quantiles = grouped['value'].quantile([0.1, 0.25, 0.75, 0.9]).unstack()
+            quantiles.columns = ['p10', 'p25', 'p75', 'p90']
+            summary = summary.join(quantiles)
+            summary['latest_value'] = grouped['value'].last()
+            summary['latest_date'] = grouped['date'].last().dt.strftime('%Y-%m-%d')
+            summary['exceedances'] = grouped['exceeds'].sum().astype(int)
+            
+            summary = summary.rename(columns={'median': 'p50'}).round(3).reset_index()
+            return summary[[
+                'site_id', 'parameter', 'period', 'count', 'min', 'p10', 'p25',
+                'p50', 'p75', 'p90', 'max', 'mean', 'latest_value',
+                'latest_date', 'exceedances'
+            ]]
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating water quality summary: {e}")
+            raise
+            
+    def _save_summary(self, summary: pd.DataFrame):
+        """Save the water quality summary cube."""
+        try:
+            output_path = self.quality_dir / "water_quality_summary.csv"
+            write_csv(summary, output_path)
+            
+            self.logger.info(f"Water quality summary saved to {output_path}")
+            
+        except Exception as e:
+            self.logger.error(f"Error saving water quality summary: {e}")
+            raise
+            
+    def _save_processed_data(self, df: pd.DataFrame):
+        """Save processed water quality data."""
+        try:
+            output_path = self.quality_dir / "all_water_quality.csv"
+            write_csv(df, output_path)
+            
+            self.logger.info(f"Water quality data saved to {output_path}")
+            
+        except Exception as e:
+            self.logger.error(f"Error saving processed data: {e}")
+            raise
+
+if __name__ == "__main__":
+    processor = WaterQualityProcessor()
+    processor.update_water_quality_data()
@@ -45,12 +45,14 @@ createBlankSummary();
 
 //Load Data and get correct########################################################
 function createCurrentSummary(myUtility){
-   d3.csv("data/link_pwsid_watershed.csv").then(function(pwsid_huc){
+   loadFirstPaint("data/link_pwsid_watershed.csv", function(b) { return b.watersheds; }).then(function(pwsid_huc){
     var selectedHucs = pwsid_huc.filter(function(d){return d.utility_name === myUtility; });
     var filterHucName = selectedHucs.map(function(d){return d.ws_watershed; });
     
   //load in streams
-  d3.csv("data/streamflow/current_sites_status.csv").then(function(hucStatus){
+  loadFirstPaint("data/streamflow/current_sites_status.csv", function(b) {
+    return bundleStatus(b, 'streamflow');
+  }).then(function(hucStatus){
     //filter based on selectedHucs - array of names
     var filteredHuc = hucStatus.filter(function(d) {
     return filterHucName.indexOf(d.ws_watershed) !== -1 ;
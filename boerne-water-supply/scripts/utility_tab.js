@@ -42,7 +42,7 @@ function myUtilityInfo(myUtility){
     
       
      //load data 
-     d3.csv("data/basic_info.csv").then(function(dataCSV){
+     loadFirstPaint("data/basic_info.csv", function(b) { return b.utilities; }).then(function(dataCSV){
      var selectData = dataCSV.filter(function(d) {return d.pwsid === myUtilityID; });
      //console.log(dataCSV); console.log(selectData);
      var myUtilityWebsite = selectData[0].utility_website; 